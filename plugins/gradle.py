@@ -1,20 +1,140 @@
+import re
+from dataclasses import dataclass
 from logging import Logger
 from pathlib import Path
+from typing import Optional
 
+from mpyl.run_plan import RunPlan
 from mpyl.steps import Step, Meta, ArtifactType, Input, Output
 from mpyl.steps.models import input_to_artifact, ArchiveSpec
-from mpyl.utilities.junit import to_test_suites, sum_suites, JunitTestSpec
-from mpyl.utilities.subprocess import custom_check_output
+from mpyl.utilities.junit import summarize_test_results, JunitTestSpec
+from mpyl.utilities.logging import LogCapture
+from mpyl.utilities.subprocess import run_command
 
+TASK_FAILURE_PATTERN = re.compile(r"Execution failed for task '(:.+):[^:]+'")
 
-def run_gradle(logger: Logger, target: Path, task: str) -> Output:
-    project = str(target).replace("/", ":")
-    return custom_check_output(
-        logger=logger, command=f"./gradlew {project}:{task} --no-daemon --info"
+
+@dataclass(frozen=True)
+class GradleResult:
+    """The outcome of a single gradle invocation for one or more projects"""
+
+    success: bool
+    failed_projects: frozenset[str]
+    """Projects to which a failed task could be attributed"""
+    unattributed_failure: bool
+    """A task failed that does not belong to any of the projects in the invocation, e.g. in a shared module. With
+    `--continue` gradle skips the tasks that depend on it, so none of the projects can be considered built."""
+    log_tail: str
+
+    def succeeded_for(self, gradle_project: str) -> bool:
+        return self.success or (
+            not self.unattributed_failure and gradle_project not in self.failed_projects
+        )
+
+
+class GradleResults:
+    """
+    The outcomes of the gradle invocations of a step, by project name. The outcomes are scoped to the run plan, so
+    that the outcome for a project that was part of an invocation, but not executed afterwards, is not used in a later
+    run.
+    """
+
+    def __init__(self) -> None:
+        self._run_plan: Optional[RunPlan] = None
+        self._results: dict[str, GradleResult] = {}
+
+    def for_run(self, run_plan: RunPlan) -> dict[str, GradleResult]:
+        """:return: the outcomes of the invocations of the run with `run_plan` that have not been taken yet"""
+        if self._run_plan is not run_plan:
+            self._run_plan = run_plan
+            self._results = {}
+        return self._results
+
+
+def to_gradle_project(target: Path) -> str:
+    return ":" + str(target).strip("/").replace("/", ":")
+
+
+def run_gradle(
+    logger: Logger, targets: list[Path], task: str, info: bool = False
+) -> GradleResult:
+    """
+    Runs `task` for all `targets` in a single invocation on the gradle daemon. With `--continue`, the tasks of the
+    other projects still run when one of them fails, and the failures are attributed from the output of gradle.
+    """
+    command = ["./gradlew"]
+    command += [f"{to_gradle_project(target)}:{task}" for target in targets]
+    command += ["--daemon", "--parallel", "--continue"]
+    if info:
+        command.append("--info")
+
+    logger.info(f"Executing: '{' '.join(command)}'")
+    with LogCapture.for_task(logger, f"gradle {task}") as log_capture:
+        try:
+            success = run_command(logger, command, None, log_capture).success
+        except FileNotFoundError:
+            logger.warning(f"{command[0]}: file not found")
+            success = False
+
+    failed: set[str] = set()
+    if not success and log_capture.log_file and log_capture.log_file.exists():
+        with open(log_capture.log_file, encoding="utf-8") as log_file:
+            failed = {
+                match.group(1)
+                for line in log_file
+                if (match := TASK_FAILURE_PATTERN.search(line))
+            }
+    return GradleResult(
+        success=success,
+        failed_projects=frozenset(failed),
+        unattributed_failure=not success
+        and (not failed or not failed.issubset(map(to_gradle_project, targets))),
+        log_tail=log_capture.tail_message(),
     )
 
 
-class BuildGradle(Step):
+class GradleStep(Step):
+    """
+    Runs a gradle task for all projects in the stage that use this step, in one invocation on a shared daemon, the
+    first time the step is executed. The results are attributed back to the projects in their own executions.
+    `--info` logging is only enabled when the console log level is DEBUG.
+    """
+
+    def __init__(
+        self, logger: Logger, meta: Meta, task: str, produced_artifact: ArtifactType
+    ) -> None:
+        super().__init__(
+            logger,
+            meta,
+            produced_artifact=produced_artifact,
+            required_artifact=ArtifactType.NONE,
+        )
+        self._task = task
+        self._results = GradleResults()
+
+    def run_task(self, step_input: Input) -> GradleResult:
+        execution = step_input.project_execution
+        run_plan = step_input.run_properties.run_plan
+        results = self._results.for_run(run_plan)
+        if execution.name not in results:
+            executions = [execution] + [
+                other
+                for other in run_plan.get_executions_for_step(
+                    self.meta.stage, self.meta.name
+                )
+                if other.name not in results and other.name != execution.name
+            ]
+            result = run_gradle(
+                self._logger,
+                [e.project.root_path for e in executions],
+                self._task,
+                info=step_input.run_properties.console.log_level == "DEBUG",
+            )
+            results |= {e.name: result for e in executions}
+        return results.pop(execution.name)
+
+
+class BuildGradle(GradleStep):
     def __init__(self, logger: Logger) -> None:
         super().__init__(
             logger,
@@ -24,8 +144,8 @@ class BuildGradle(Step):
                 version="0.0.1",
                 stage="build",
             ),
+            task="bootJar",
             produced_artifact=ArtifactType.ARCHIVE,
-            required_artifact=ArtifactType.NONE,
         )
 
     def execute(self, step_input: Input) -> Output:
@@ -33,7 +153,8 @@ class BuildGradle(Step):
         self._logger.info(f"Building project {execution.name}")
         path = execution.project.root_path
 
-        run_outcome = run_gradle(self._logger, path, "bootJar")
+        run_outcome = self.run_task(step_input)
+        success = run_outcome.succeeded_for(to_gradle_project(path))
 
         archive_path = path / "build" / "libs" / f"{path.name}.jar"
         artifact = input_to_artifact(
@@ -43,13 +164,15 @@ class BuildGradle(Step):
         )
 
         return Output(
-            success=run_outcome.success,
-            message=f"Built {execution.name}",
+            success=success,
+            message=f"Built {execution.name}"
+            if success
+            else f"Failed to build {execution.name}\n{run_outcome.log_tail}",
             produced_artifact=artifact,
         )
 
 
-class TestGradle(Step):
+class TestGradle(GradleStep):
     def __init__(self, logger: Logger) -> None:
         super().__init__(
             logger,
@@ -59,8 +182,8 @@ class TestGradle(Step):
                 version="0.0.1",
                 stage="test",
             ),
+            task="test",
             produced_artifact=ArtifactType.JUNIT_TESTS,
-            required_artifact=ArtifactType.NONE,
         )
 
     def execute(self, step_input: Input) -> Output:
@@ -68,14 +191,14 @@ class TestGradle(Step):
         self._logger.info(f"Testing project {execution.name}")
         path = execution.project.root_path
 
-        run_outcome = run_gradle(self._logger, path, "test")
+        run_outcome = self.run_task(step_input)
 
         test_spec = JunitTestSpec(
-            test_output_path=f"{step_input.project_execution.project.root_path}build/test-results/test",
+            test_output_path=f"{path / 'build' / 'test-results' / 'test'}",
             test_results_url=None,
         )
-        test_spec.test_results_summary = sum_suites(
-            to_test_suites(Path(test_spec.test_output_path))
+        test_spec.test_results_summary = summarize_test_results(
+            Path(test_spec.test_output_path)
         )
 
         artifact = input_to_artifact(
@@ -85,7 +208,7 @@ class TestGradle(Step):
         )
 
         return Output(
-            success=run_outcome.success,
+            success=run_outcome.succeeded_for(to_gradle_project(path)),
             message=f"Tested {execution.name}",
             produced_artifact=artifact,
         )
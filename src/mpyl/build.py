@@ -5,8 +5,9 @@ import json
 import logging
 import os
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Union, Optional
+from typing import Iterable, Union, Optional
 
 from jsonschema import ValidationError
 from rich.console import Console
@@ -20,12 +21,21 @@ from .reporting.formatting.markdown import (
     run_result_to_markdown,
 )
 from .reporting.targets import Reporter
-from .steps import deploy
+from .project import Project, Stage
+from .project_execution import ProjectExecution
+from .steps import build, deploy
 from .steps.collection import StepsCollection
+from .steps.deploy.k8s.clients import close_api_clients
+from .steps.deploy.k8s.cluster import get_cluster_config_for_project
+from .steps.deploy.k8s.deploy_config import DeployConfig, get_namespace
 from .steps.models import Output, RunProperties
 from .steps.run import RunResult
 from .steps.run_properties import construct_run_properties
 from .steps.executor import ExecutionException, StepResult, Executor
+from .utilities.docker import clear_registry_sessions
+from .utilities.docker.compose import close_compose_stacks, stop_compose_stacks
+from .utilities.docker.push_queue import close_push_queue, failed_pushes
+from .utilities.sbt import shutdown_sbt_server
 
 
 def print_status(
@@ -171,6 +181,25 @@ def run_build(
 ):
     try:
         for stage, project_executions in accumulator.run_plan.selected_plan.items():
+            max_concurrent = (
+                _max_concurrent_deploys(accumulator.run_properties)
+                if stage.name == deploy.STAGE_NAME
+                else 1
+            )
+            if max_concurrent > 1:
+                if not _deploy_concurrently(
+                    logger=logger,
+                    stage=stage,
+                    project_executions=project_executions,
+                    executor=executor,
+                    accumulator=accumulator,
+                    reporter=reporter,
+                    dry_run=dry_run,
+                    max_concurrent=max_concurrent,
+                ):
+                    return accumulator
+                continue
+
             for project_execution in project_executions:
                 if project_execution.cached:
                     logger.info(
@@ -191,6 +220,8 @@ def run_build(
                     logger.warning(f"{stage} failed for {project_execution.name}")
                     return accumulator
 
+            _append_failed_pushes(accumulator, failed_pushes())
+            stop_compose_stacks(logger)
             if accumulator.failed_results:
                 logger.warning(f"One of the builds failed at Stage {stage.name}")
                 return accumulator
@@ -198,3 +229,118 @@ def run_build(
     except ExecutionException as exc:
         accumulator.exception = exc
         return accumulator
+    finally:
+        _append_failed_pushes(accumulator, close_push_queue())
+        close_compose_stacks(logger)
+        close_api_clients()
+        clear_registry_sessions()
+        shutdown_sbt_server(logger)
+
+
+def _max_concurrent_deploys(run_properties: RunProperties) -> int:
+    if "kubernetes" not in run_properties.config:
+        return 1
+    return DeployConfig.from_config(run_properties.config).max_concurrent_deploys
+
+
+def _deploy_target(run_properties: RunProperties, project: Project) -> tuple[str, str]:
+    """:return: the cluster context and namespace the project is deployed to"""
+    try:
+        context = get_cluster_config_for_project(run_properties, project).context
+    except (KeyError, ValueError, StopIteration):
+        context = ""
+    return context, get_namespace(run_properties, project)
+
+
+def _deploy_concurrently(  # pylint: disable=too-many-arguments, too-many-locals
+    logger: logging.Logger,
+    stage: Stage,
+    project_executions: Iterable[ProjectExecution],
+    executor: Executor,
+    accumulator: RunResult,
+    reporter: Optional[Reporter],
+    dry_run: bool,
+    max_concurrent: int,
+) -> bool:
+    """
+    Deploys up to `max_concurrent` projects at the same time, using the kubernetes clients of the run. The first
+    deploy to a namespace of a cluster completes before the other deploys to that namespace start, so that the
+    namespace is only created once. After a failed deploy, no new deploys are started, but the ones in progress are
+    awaited.
+    :return: False if one of the deploys failed
+    """
+    executions_per_target: dict[tuple[str, str], list[ProjectExecution]] = {}
+    for project_execution in sorted(
+        project_executions, key=lambda e: (e.name, e.project.path)
+    ):
+        if project_execution.cached:
+            logger.info(
+                f"Skipping {project_execution.name} for stage {stage.name} because it is cached"
+            )
+            accumulator.append(
+                StepResult(
+                    stage=stage,
+                    project=project_execution.project,
+                    output=Output(success=True, message="This step was cached"),
+                )
+            )
+            continue
+        target = _deploy_target(accumulator.run_properties, project_execution.project)
+        executions_per_target.setdefault(target, []).append(project_execution)
+
+    failed = False
+    exception: Optional[ExecutionException] = None
+    with ThreadPoolExecutor(
+        max_workers=max_concurrent, thread_name_prefix="deploy"
+    ) as pool:
+        in_progress: dict[Future, tuple[str, str]] = {
+            pool.submit(executor.execute, stage.name, executions[0], dry_run): target
+            for target, executions in executions_per_target.items()
+        }
+        waiting = {
+            target: executions[1:]
+            for target, executions in executions_per_target.items()
+        }
+        while in_progress:
+            done, _ = wait(in_progress, return_when=FIRST_COMPLETED)
+            for future in done:
+                target = in_progress.pop(future)
+                try:
+                    result: StepResult = future.result()
+                except ExecutionException as exc:
+                    exception = exception or exc
+                    continue
+                accumulator.append(result)
+                if reporter:
+                    reporter.send_report(accumulator)
+                if not result.output.success:
+                    logger.warning(f"{stage} failed for {result.project.name}")
+                    failed = True
+                if not failed and exception is None:
+                    for project_execution in waiting.pop(target, []):
+                        in_progress[
+                            pool.submit(
+                                executor.execute, stage.name, project_execution, dry_run
+                            )
+                        ] = target
+    if exception:
+        raise exception
+    return not failed
+
+
+def _append_failed_pushes(accumulator: RunResult, failures: dict[str, str]):
+    if not failures:
+        return
+    stage = accumulator.run_properties.to_stage(build.STAGE_NAME)
+    projects = {
+        project_execution.name: project_execution.project
+        for project_execution in accumulator.run_plan.get_all_projects()
+    }
+    for project_name, message in failures.items():
+        accumulator.append(
+            StepResult(
+                stage=stage,
+                project=projects[project_name],
+                output=Output(success=False, message=message),
+            )
+        )
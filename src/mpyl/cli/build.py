@@ -1,6 +1,7 @@
 """Commands related to build"""
 
 import asyncio
+import os
 import pickle
 import shutil
 import sys
@@ -31,6 +32,7 @@ from .commands.build.artifacts import prepare_artifacts_repo, branch_name
 from ..artifacts.build_artifacts import (
     ManifestPathTransformer,
     BuildCacheTransformer,
+    PathTransformer,
     ArtifactType,
 )
 from ..build import print_status, run_mpyl
@@ -43,6 +45,12 @@ from ..constants import (
 from ..project import load_project, Target
 from ..run_plan import RunPlan
 from ..steps.deploy.k8s.deploy_config import DeployConfig
+from ..steps.deploy.k8s.render import (
+    CHANGED_MANIFESTS_FILE_NAME,
+    changed_manifests_file,
+    render_projects,
+    read_changed_manifests,
+)
 from ..steps.models import RunProperties
 from ..steps.run_properties import construct_run_properties
 from ..utilities.github import GithubConfig, get_token
@@ -416,13 +424,21 @@ def pull(obj: CliContext, tag: str, pr: int, path: Path):
     "folders or k8s manifests to be deployed by ArgoCD",
     required=True,
 )
+@click.option(
+    "--changed-only",
+    is_flag=True,
+    default=False,
+    help="Only push the k8s manifests that changed in the last `render`, as listed in "
+    f"{RUN_ARTIFACTS_FOLDER}/{CHANGED_MANIFESTS_FILE_NAME} at the root of the repository",
+)
 @click.pass_obj
-def push(
+def push(  # pylint: disable=too-many-arguments
     obj: CliContext,
     tag: Optional[str],
     pr: Optional[int],
     path: Path,
     artifact_type: ArtifactType,
+    changed_only: bool,
 ):
     run_properties = construct_run_properties(
         config=obj.config,
@@ -452,6 +468,10 @@ def push(
         github = obj.config["vcs"]["argoGithub"]
         github_config = GithubConfig.from_github_config(github=github)
 
+    project_paths = obj.repo.find_projects()
+    if changed_only:
+        project_paths = __with_changed_manifests(project_paths, transformer)
+
     build_artifacts.push(
         branch=branch_name(
             identifier=target_branch,
@@ -460,13 +480,80 @@ def push(
         ),
         revision=obj.repo.get_sha,
         repository_url=obj.repo.remote_url if obj.repo.remote_url else "",
-        project_paths=obj.repo.find_projects(),
+        project_paths=project_paths,
         path_transformer=transformer,
         run_properties=run_properties,
         github_config=github_config,
     )
 
 
+@artifacts.command(
+    help="Render the k8s manifests of all projects to be deployed by ArgoCD, "
+    "without running their deploy steps"
+)
+@click.option("--tag", "-t", type=click.STRING, help="Tag to render", required=False)
+@click.option(
+    "--filter",
+    "-f",
+    "filter_",
+    type=click.STRING,
+    help="Filter based on filepath",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="Number of processes to render in",
+)
+@click.pass_obj
+def render(obj: CliContext, tag: Optional[str], filter_: Optional[str], workers: int):
+    all_projects = {
+        load_project(Path(""), Path(project_path), strict=False, safe=True)
+        for project_path in obj.repo.find_projects()
+    }
+    run_properties = construct_run_properties(
+        config=obj.config,
+        properties=obj.run_properties,
+        cli_parameters=MpylCliParameters(tag=tag),
+        run_plan=RunPlan.empty(),
+        all_projects=all_projects,
+    )
+    selected = sorted(
+        (p for p in all_projects if filter_ is None or filter_ in p.path),
+        key=lambda p: p.path,
+    )
+    results = render_projects(selected, run_properties, workers)
+
+    for result in results:
+        if result.error:
+            obj.console.print(f"❌ {result.project_path}: {result.error}")
+        for changed_file in result.changed_files:
+            obj.console.print(f"📝 {changed_file}")
+    changed = sum(len(result.changed_files) for result in results)
+    obj.console.print(
+        f"Rendered {len(results)} projects, {changed} files changed, "
+        f"listed in {changed_manifests_file()}"
+    )
+    if any(result.error for result in results):
+        sys.exit(1)
+
+
+def __with_changed_manifests(
+    project_paths: list[str], transformer: PathTransformer
+) -> list[str]:
+    try:
+        changed = read_changed_manifests()
+    except FileNotFoundError as exc:
+        raise click.ClickException(str(exc)) from exc
+    return [
+        project_path
+        for project_path in project_paths
+        if transformer.transform_for_read(project_path) in changed
+    ]
+
+
 def __get_target_branch(
     run_properties: RunProperties, tag: Optional[str], pr: Optional[int]
 ) -> str:
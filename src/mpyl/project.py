@@ -460,6 +460,16 @@ class Build:
         return Build(args=BuildArgs.from_config(values.get("args", {})))
 
 
+@dataclass(frozen=True)
+class Test:
+    __test__ = False
+    shards: int
+
+    @staticmethod
+    def from_config(values: dict):
+        return Test(shards=values.get("shards", 1))
+
+
 @dataclass(frozen=True)
 class Deployment:
     cluster: Optional[TargetProperty[str]]
@@ -508,6 +518,7 @@ class Project:
     build: Optional[Build]
     deployment: Optional[Deployment]
     dependencies: Optional[Dependencies]
+    test: Optional[Test] = None
 
     OVERRIDE_TOKEN = "-override-"
 
@@ -598,6 +609,10 @@ class Project:
     def test_report_path(self) -> Path:
         return Path(self.root_path) / "target/test-reports"
 
+    @property
+    def test_shards(self) -> int:
+        return self.test.shards if self.test else 1
+
     @staticmethod
     def from_config(values: dict, project_path: Path):
         docker_config = values.get("docker")
@@ -616,6 +631,7 @@ class Project:
             dependencies=(
                 Dependencies.from_config(dependencies) if dependencies else None
             ),
+            test=Test.from_config(test) if (test := values.get("test")) else None,
         )
 
 
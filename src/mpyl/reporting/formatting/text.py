@@ -6,7 +6,7 @@ from typing import cast
 
 from ...steps.models import ArtifactType
 from ...steps.run import RunResult
-from ...utilities.junit import to_test_suites, sum_suites, JunitTestSpec
+from ...utilities.junit import suite_summaries, sum_suites, JunitTestSpec
 
 
 def to_string(run_result: RunResult) -> str:
@@ -25,9 +25,9 @@ def to_string(run_result: RunResult) -> str:
 
 
 def to_test_report(artifact: JunitTestSpec) -> str:
-    """Gather the test suites and their results."""
+    """Gather the test suites and their results, from the summaries that were persisted by the test step if present"""
     test_result = []
-    suites = to_test_suites(Path(artifact.test_output_path))
+    suites = suite_summaries(Path(artifact.test_output_path))
     total_tests = sum_suites(suites)
     test_result.append(f"{total_tests} \n\n")
     for suite in suites:
@@ -81,3 +81,20 @@ class RunPlan:
         if use_full_plan:
             return find_stage(self.full_plan)
         return find_stage(self.selected_plan)
+
+    def get_executions_for_step(
+        self, stage_name: str, step_name: str
+    ) -> list[ProjectExecution]:
+        """
+        :return: the uncached executions in `stage_name` of the projects that use `step_name` for it, sorted by name.
+        Steps that process several projects at once use this to find the projects to combine.
+        """
+        return sorted(
+            (
+                execution
+                for execution in self.get_projects_for_stage_name(stage_name)
+                if not execution.cached
+                and execution.project.stages.for_stage(stage_name) == step_name
+            ),
+            key=lambda execution: execution.name,
+        )
@@ -12,6 +12,14 @@ The `tester` stage needs to run the unittests and write the results (
 in [Junit XML format](https://llg.cubic.org/docs/junit/))
 to a folder named `$WORKDIR/target/test-reports/`.
 
+When `docker.build.combineTestTarget` is enabled, the `builder` and `tester` targets of projects that use
+`mpyl.steps.test.dockertest.TestDocker` are built in a single BuildKit session. The test reports are exported from
+the `tester` stage straight to the host, where they are picked up in the test stage.
+
+When `docker.build.contentTags` is enabled, images are also tagged with the hash of the project's content. If the
+registry already holds an image with that tag, the build is skipped and
+`mpyl.steps.build.post_docker_build.AfterBuildDocker` only adds the tag of the current run to the existing image.
+
 #### Example Dockerfile-mpl
 ```docker
 .. include:: ../../../../tests/projects/service/deployment/Dockerfile-mpl
@@ -25,11 +33,14 @@ from .post_docker_build import AfterBuildDocker
 from .. import Step, Meta
 from ..models import Input, Output, ArtifactType, input_to_artifact
 from . import STAGE_NAME
-from ...constants import RUN_ARTIFACTS_FOLDER
+from ..test import STAGE_NAME as TEST_STAGE_NAME
+from ..test.dockertest import DOCKER_TEST_STEP_NAME
 from ...utilities import replace_pr_number
+from ...utilities.logging import LogCapture
 from ...utilities.docker import (
     DockerConfig,
     build,
+    build_with_test_reports,
     docker_image_tag,
     docker_file_path,
     login,
@@ -37,9 +48,11 @@ from ...utilities.docker import (
     registry_for_project,
     get_default_build_args,
     full_image_path_for_project,
+    manifest_exists,
+    prepare_build_context,
+    CONTEXT_BYTES_METRIC,
 )
-
-DOCKER_IGNORE_DEFAULT = ["**/target/*", f"**/{RUN_ARTIFACTS_FOLDER}/*"]
+from ...utilities.docker.content import content_image_tag
 
 
 class BuildDocker(Step):
@@ -57,7 +70,7 @@ class BuildDocker(Step):
             after=AfterBuildDocker(logger=logger),
         )
 
-    def execute(self, step_input: Input) -> Output:
+    def execute(self, step_input: Input) -> Output:  # pylint: disable=too-many-locals
         docker_config: DockerConfig = DockerConfig.from_dict(
             step_input.run_properties.config
         )
@@ -77,10 +90,12 @@ class BuildDocker(Step):
             # log in to registry, because we may need to pull in a base image
             login(logger=self._logger, registry_config=docker_registry_config)
 
-        with open(".dockerignore", "w+", encoding="utf-8") as ignore_file:
-            contents = "\n".join(DOCKER_IGNORE_DEFAULT)
-            ignore_file.write(contents)
-
+        project = step_input.project_execution.project
+        combine_test_target = bool(
+            docker_config.combine_test_target
+            and docker_config.test_target
+            and project.stages.for_stage(TEST_STAGE_NAME) == DOCKER_TEST_STEP_NAME
+        )
         build_args: dict[str, str] = get_default_build_args(
             full_image_path_for_project(step_input),
             step_input.project_execution.project.maintainer,
@@ -115,19 +130,72 @@ class BuildDocker(Step):
                 for arg in build_config.args.credentials
             }
 
-        success = build(
-            logger=self._logger,
-            root_path=docker_config.root_folder,
-            file_path=dockerfile,
-            image_tag=image_tag,
-            target=build_target,
-            registry_config=docker_registry_config,
-            build_args=build_args,
+        content_image = (
+            content_image_tag(step_input, docker_config, build_args)
+            if docker_config.content_tags
+            else None
+        )
+        if (
+            content_image
+            and not step_input.dry_run
+            and not combine_test_target
+            and manifest_exists(self._logger, docker_registry_config, content_image)
+        ):
+            return Output(
+                success=True,
+                message=f"Reused {content_image} for {step_input.project_execution.name}",
+                produced_artifact=input_to_artifact(
+                    artifact_type=ArtifactType.DOCKER_IMAGE,
+                    step_input=step_input,
+                    spec=DockerImageSpec(
+                        image=image_tag, content_image=content_image, in_registry=True
+                    ),
+                ),
+            )
+
+        context_bytes = prepare_build_context(
+            self._logger, step_input.project_execution.project, docker_config
+        )
+        metrics = (
+            {CONTEXT_BYTES_METRIC: context_bytes} if context_bytes is not None else None
+        )
+
+        versioning = (
+            None if step_input.dry_run else step_input.run_properties.versioning
+        )
+        log_capture = LogCapture(
+            self._logger, project.target_path / f"{STAGE_NAME}.log"
         )
+        if combine_test_target and docker_config.test_target:
+            success = build_with_test_reports(
+                logger=self._logger,
+                root_path=docker_config.root_folder,
+                file_path=dockerfile,
+                image_tag=image_tag,
+                target=build_target,
+                test_target=docker_config.test_target,
+                test_report_path=project.test_report_path,
+                registry_config=docker_registry_config,
+                build_args=build_args,
+                versioning=versioning,
+                log_capture=log_capture,
+            )
+        else:
+            success = build(
+                logger=self._logger,
+                root_path=docker_config.root_folder,
+                file_path=dockerfile,
+                image_tag=image_tag,
+                target=build_target,
+                registry_config=docker_registry_config,
+                build_args=build_args,
+                versioning=versioning,
+                log_capture=log_capture,
+            )
         artifact = input_to_artifact(
             artifact_type=ArtifactType.DOCKER_IMAGE,
             step_input=step_input,
-            spec=DockerImageSpec(image=image_tag),
+            spec=DockerImageSpec(image=image_tag, content_image=content_image),
         )
 
         if success:
@@ -135,10 +203,13 @@ class BuildDocker(Step):
                 success=True,
                 message=f"Built {step_input.project_execution.name}",
                 produced_artifact=artifact,
+                metrics=metrics,
             )
 
         return Output(
             success=False,
-            message=f"Failed to build docker image for {step_input.project_execution.name}",
+            message=f"Failed to build docker image for {step_input.project_execution.name}\n"
+            f"{log_capture.tail_message()}",
             produced_artifact=None,
+            metrics=metrics,
         )
@@ -1,5 +1,11 @@
 """ Pushes the artifact created in the build stage to the docker registry for any build step that has
-ArtifactType.DOCKER_IMAGE as `mpyl.steps.models.ArtifactType`."""
+ArtifactType.DOCKER_IMAGE as `mpyl.steps.models.ArtifactType`.
+
+If the image has a content-addressed tag, that tag is added in the registry after the push. If the build was skipped
+because the registry already holds the content-addressed image, only the tag of the current run is added to it.
+
+With `docker.push.background` the push is handed to `mpyl.utilities.docker.push_queue` and the step completes right
+away."""
 
 from logging import Logger
 
@@ -12,7 +18,9 @@ from ...utilities.docker import (
     DockerImageSpec,
     push_to_registry,
     registry_for_project,
+    retag_in_registry,
 )
+from ...utilities.docker.push_queue import push_queue
 
 
 class AfterBuildDocker(Step):
@@ -30,7 +38,8 @@ class AfterBuildDocker(Step):
         )
 
     def execute(self, step_input: Input) -> Output:
-        image_name = step_input.as_spec(DockerImageSpec).image
+        spec = step_input.as_spec(DockerImageSpec)
+        image_name = spec.image
         self._logger.debug(f"Image to publish: {image_name}")
 
         properties = step_input.run_properties
@@ -55,7 +64,38 @@ class AfterBuildDocker(Step):
                 produced_artifact=artifact,
             )
 
-        push_to_registry(self._logger, docker_registry, image_name)
+        def push():
+            if spec.content_image and spec.in_registry:
+                retag_in_registry(
+                    self._logger, docker_registry, spec.content_image, image_name
+                )
+                return
+            push_to_registry(self._logger, docker_registry, image_name)
+            if spec.content_image:
+                retag_in_registry(
+                    self._logger, docker_registry, image_name, spec.content_image
+                )
+
+        if docker_config.push.background:
+            push_queue(docker_config.push.max_concurrent).submit(
+                self._logger,
+                step_input.project_execution.name,
+                full_image_path,
+                push,
+            )
+            return Output(
+                success=True,
+                message=f"Queued push of {full_image_path}",
+                produced_artifact=artifact,
+            )
+
+        push()
+        if spec.content_image and spec.in_registry:
+            return Output(
+                success=True,
+                message=f"Tagged {docker_registry_path(docker_registry, spec.content_image)} as {full_image_path}",
+                produced_artifact=artifact,
+            )
 
         return Output(
             success=True,
@@ -1,7 +1,12 @@
 """ Step that builds a docker image from a project in a multi-project sbt. Assumes that the
 [sbt-docker](https://github.com/marcuslonnberg/sbt-docker) plugin is present.
+
+When `sbt.batchProjects` is enabled, the images of all projects in the build stage that use this step are built in a
+single sbt invocation, the first time the step is executed. The outcome is attributed to each project from the error
+summary of sbt.
 """
 
+import dataclasses
 from logging import Logger
 
 from .post_docker_build import AfterBuildDocker
@@ -14,8 +19,14 @@ from ...steps.models import (
     input_to_artifact,
 )
 from ...utilities.docker import docker_image_tag, DockerImageSpec
-from ...utilities.sbt import SbtConfig
-from ...utilities.subprocess import custom_check_output
+from ...utilities.sbt import (
+    SbtBatchResult,
+    SbtBatchResults,
+    SbtConfig,
+    run_sbt,
+    run_sbt_batch,
+    to_batch_command,
+)
 
 
 class BuildSbt(Step):
@@ -33,18 +44,24 @@ class BuildSbt(Step):
             required_artifact=ArtifactType.NONE,
             after=AfterBuildDocker(logger=logger),
         )
+        self._batch_results = SbtBatchResults()
 
     def execute(self, step_input: Input) -> Output:
         image_name = docker_image_tag(step_input)
-        command = self._construct_sbt_command(step_input, image_name)
+        config = SbtConfig.from_config(config=step_input.run_properties.config)
+        if config.batch_projects:
+            batch_result = self._batch_result(step_input, config)
+            success = batch_result.succeeded_for(step_input.project_execution.name)
+            log_tail = batch_result.log_tail
+        else:
+            command = self._construct_sbt_command(step_input, image_name)
+            output = run_sbt(self.logger, config, config.build_with_client, command)
+            success, log_tail = output.success, output.message
 
-        output = custom_check_output(
-            logger=self.logger, command=command, use_print=True
-        )
         artifact = input_to_artifact(
             ArtifactType.DOCKER_IMAGE, step_input, DockerImageSpec(image=image_name)
         )
-        if output.success:
+        if success:
             return Output(
                 success=True,
                 message=f"Built {step_input.project_execution.name}",
@@ -53,10 +70,39 @@ class BuildSbt(Step):
 
         return Output(
             success=False,
-            message=f"Failed to build sbt project for {step_input.project_execution.name}",
+            message=f"Failed to build sbt project for {step_input.project_execution.name}\n{log_tail}",
             produced_artifact=None,
         )
 
+    def _batch_result(self, step_input: Input, config: SbtConfig) -> SbtBatchResult:
+        """Builds all projects of the stage that have not been built yet, and returns the outcome for this one"""
+        name = step_input.project_execution.name
+        batch_results = self._batch_results.for_run(step_input.run_properties.run_plan)
+        if name not in batch_results:
+            executions = [step_input.project_execution] + [
+                execution
+                for execution in step_input.run_properties.run_plan.get_executions_for_step(
+                    STAGE_NAME, self.meta.name
+                )
+                if execution.name not in batch_results and execution.name != name
+            ]
+            names = [execution.name for execution in executions]
+            settings = [
+                f"{execution.name} / docker / imageNames := "
+                f'Seq(ImageName("{docker_image_tag(dataclasses.replace(step_input, project_execution=execution))}"))'
+                for execution in executions
+            ]
+            result = run_sbt_batch(
+                logger=self.logger,
+                config=config,
+                client_mode=config.build_with_client,
+                project_names=names,
+                sbt_commands=to_batch_command(names, "docker", settings),
+                task_name=f"sbt {STAGE_NAME}",
+            )
+            batch_results |= {execution_name: result for execution_name in names}
+        return batch_results.pop(name)
+
     @staticmethod
     def _construct_sbt_command(step_input: Input, image_name: str):
         commands: list[str] = [
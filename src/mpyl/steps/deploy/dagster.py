@@ -7,7 +7,6 @@ from pathlib import Path
 from typing import List
 
 import yaml
-from kubernetes import config, client
 
 from . import STAGE_NAME
 from .k8s import (
@@ -18,9 +17,12 @@ from .k8s import (
     update_config_map_field,
     get_version_of_deployment,
 )
+from .k8s import clients
 from .k8s.chart import ChartBuilder
 from .k8s.cluster import get_cluster_config_for_project
+from .k8s.deploy_config import DeployConfig
 from .k8s.helm import write_chart
+from .k8s.rollout import RolloutTracker, Workload
 from .k8s.resources.dagster import to_user_code_values, to_grpc_server_entry, Constants
 from .. import Step, Meta, ArtifactType, Input, Output
 from ...utilities.dagster import DagsterConfig
@@ -72,9 +74,8 @@ class DeployDagster(Step):
         dagster_config: DagsterConfig = DagsterConfig.from_dict(properties.config)
         dagster_deploy_results = []
 
-        config.load_kube_config(context=context)
-        core_api = client.CoreV1Api()
-        apps_api = client.AppsV1Api()
+        core_api = clients.core_api(context)
+        apps_api = clients.apps_api(context)
 
         dagster_version = get_version_of_deployment(
             apps_api=apps_api,
@@ -182,6 +183,15 @@ class DeployDagster(Step):
                         f"Successfully added {user_code_name_to_deploy} to dagster's workspace.yaml"
                     )
 
+                    tracker = (
+                        RolloutTracker(
+                            self._logger,
+                            clients.dynamic_api(context),
+                            dagster_config.base_namespace,
+                        )
+                        if DeployConfig.from_config(properties.config).await_rollout
+                        else None
+                    )
                     # restarting ui and daemon
                     rollout_restart_output = rollout_restart_deployment(
                         self._logger,
@@ -201,4 +211,15 @@ class DeployDagster(Step):
                         )
                         dagster_deploy_results.append(rollout_restart_output)
                         self._logger.info(rollout_restart_output.message)
+                        if rollout_restart_output.success and tracker:
+                            dagster_deploy_results.append(
+                                tracker.await_rollout(
+                                    [
+                                        Workload("Deployment", dagster_config.daemon),
+                                        Workload(
+                                            "Deployment", dagster_config.webserver
+                                        ),
+                                    ]
+                                )
+                            )
         return self.__evaluate_results(dagster_deploy_results)
@@ -1,22 +1,25 @@
 """Kubernetes deployment related helper methods"""
 
 import datetime
-import os
+import re
 from dataclasses import dataclass
 from logging import Logger
 from pathlib import Path
 from typing import Optional
 
 import yaml as dict_to_yaml_str
-from kubernetes import config, client
+from kubernetes import client
 from kubernetes.client import V1ConfigMap, ApiException, V1Deployment
 from ruamel.yaml import yaml_object, YAML
 
+from .apply import ChartApplier
+from .rollout import RolloutTracker, to_workloads
+from . import clients
 from .deploy_config import DeployConfig, DeployAction, get_namespace
 from .helm import write_helm_chart, GENERATED_WARNING
 from ...deploy.k8s.resources import CustomResourceDefinition
 from ...models import RunProperties, input_to_artifact, ArtifactType, ArtifactSpec
-from ....project import ProjectName, Target
+from ....project import ProjectName, Target, Project
 from ....steps import Input, Output
 from ....steps.deploy.k8s import helm
 from ....steps.deploy.k8s.cluster import (
@@ -24,12 +27,15 @@ from ....steps.deploy.k8s.cluster import (
     ClusterConfig,
     get_cluster_config_for_project,
 )
-from ....steps.deploy.k8s.resources import to_yaml
-from ....utilities import replace_pr_number
+from ....steps.deploy.k8s.resources import to_yaml, chart_to_yaml
+from ....utilities import replace_pr_number, write_if_changed
 from ....utilities.repo import RepoConfig
 
 yaml = YAML()
 
+REVISION_LINE = re.compile(r"^ *revision: .*\n?", re.MULTILINE)
+"""The `revision` of the deployment details and of the labels of the resources, which changes with every commit"""
+
 
 @yaml_object(yaml)
 @dataclass
@@ -92,11 +98,10 @@ def upsert_namespace(
     run_properties: RunProperties,
     cluster_config: ClusterConfig,
 ) -> None:
-    config.load_kube_config(context=cluster_config.context)
     logger.info(
         f"Deploying target {run_properties.target} and k8s context {cluster_config.context}"
     )
-    api = client.CoreV1Api()
+    api = clients.core_api(cluster_config.context)
 
     meta_data = get_namespace_metadata(
         namespace=namespace, cluster_config=cluster_config, project_id=project_id
@@ -121,27 +126,74 @@ def upsert_namespace(
         logger.info(f"Found namespace {namespace}")
 
 
+def is_release_unchanged(
+    logger: Logger,
+    helm_chart: helm.HelmChart,
+    release_name: str,
+    namespace: str,
+    cluster_config: ClusterConfig,
+) -> bool:
+    try:
+        deployed_hash = helm.deployed_manifest_hash(
+            clients.core_api(cluster_config.context), release_name, namespace
+        )
+    except (ApiException, KeyError, OSError, ValueError) as exc:
+        logger.warning(f"Could not read the deployed revision of {release_name}: {exc}")
+        return False
+    return deployed_hash == helm_chart.manifest_hash
+
+
 def render_manifests(chart: dict[str, CustomResourceDefinition]):
     result = f"{GENERATED_WARNING}\n"
-    for name, template_content in sorted(chart.items()):
-        manifest = render_crd(name, template_content)
-        result += manifest
+    for name, template_content in sorted(chart_to_yaml(chart).items()):
+        result += render_template(name, template_content)
     return result
 
 
+def render_template(name: str, template_content: str):
+    return f"---\n# {name}\n{template_content}"
+
+
 def render_crd(name: str, crd: CustomResourceDefinition):
-    return f"---\n# {name}\n{to_yaml(crd)}"
+    return render_template(name, to_yaml(crd))
+
+
+def to_deployment_details(run_properties: RunProperties) -> str:
+    cluster = (
+        "test"
+        if run_properties.target in (Target.PULL_REQUEST_BASE, Target.PULL_REQUEST)
+        else run_properties.target.name.lower()
+    )  # Can't re-use get_argo_folder_name function for now because of circular imports
+    return (
+        f"cluster: {cluster}\n"
+        + f"repository: {RepoConfig.from_config(run_properties.config).repo_credentials.name}\n"
+        + f"revision: {run_properties.versioning.revision}\n"
+        + f"tag: {run_properties.versioning.identifier}\n"
+    )
 
 
-def write_manifest(
-    target_path: Path, chart: dict[str, CustomResourceDefinition]
-) -> Path:
-    if not target_path.exists():
-        os.makedirs(target_path, exist_ok=True)
-    manifests = render_manifests(chart)
-    manifest_file = target_path / "manifest.yaml"
-    manifest_file.write_text(manifests, "utf-8")
-    return manifest_file
+def write_manifests(
+    target_path: Path,
+    chart: dict[str, CustomResourceDefinition],
+    run_properties: RunProperties,
+) -> list[Path]:
+    """
+    Writes the `manifest.yaml` and `deployment.yaml` that ArgoCD deploys from
+    :return: the files of which the content changed in more than the `REVISION_LINE`
+    """
+    files = {
+        target_path / "manifest.yaml": render_manifests(chart),
+        target_path / "deployment.yaml": to_deployment_details(run_properties),
+    }
+    changed = []
+    for path, content in files.items():
+        previous = path.read_text("utf-8") if path.exists() else None
+        if write_if_changed(path, content) and (
+            previous is None
+            or REVISION_LINE.sub("", previous) != REVISION_LINE.sub("", content)
+        ):
+            changed.append(path)
+    return changed
 
 
 def get_config_map(
@@ -190,6 +242,44 @@ def replace_config_map(
         )
 
 
+def _to_project_id(project: Project, target: Target) -> str:
+    return (
+        project.deployment.kubernetes.rancher.project_id.get_value(target=target)
+        if project.deployment
+        and project.deployment.kubernetes
+        and project.deployment.kubernetes.rancher
+        and project.deployment.kubernetes.rancher.project_id
+        else ""
+    )
+
+
+def apply_chart(
+    logger: Logger,
+    chart: dict[str, CustomResourceDefinition],
+    step_input: Input,
+    release_name: str,
+    replace_jobs: bool = False,
+) -> Output:
+    """Applies the chart with server side apply, instead of installing it with helm"""
+    run_properties = step_input.run_properties
+    project = step_input.project_execution.project
+    namespace = get_namespace(run_properties, project)
+    cluster_config = get_cluster_config_for_project(run_properties, project)
+
+    upsert_namespace(
+        logger=logger,
+        namespace=namespace,
+        project_id=_to_project_id(project, run_properties.target),
+        dry_run=step_input.dry_run,
+        run_properties=run_properties,
+        cluster_config=cluster_config,
+    )
+    applier = ChartApplier(
+        logger, clients.dynamic_api(cluster_config.context), namespace
+    )
+    return applier.apply(chart, release_name, step_input.dry_run, replace_jobs)
+
+
 def deploy_helm_chart(  # pylint: disable=too-many-locals
     logger: Logger,
     chart: dict[str, CustomResourceDefinition],
@@ -204,37 +294,27 @@ def deploy_helm_chart(  # pylint: disable=too-many-locals
     action = deployment_config.action.value
     if action == DeployAction.KUBERNETES_MANIFEST.value:  # pylint: disable=no-member
         path = Path(project.root_path, deployment_config.output_path)
-        file_path = write_manifest(target_path=path, chart=chart)
+        write_manifests(path, chart, run_properties)
 
         artifact = input_to_artifact(
             artifact_type=ArtifactType.KUBERNETES_MANIFEST,
             step_input=step_input,
-            spec=KubernetesManifestSpec(str(file_path)),
+            spec=KubernetesManifestSpec(str(path / "manifest.yaml")),
         )
 
-        cluster = (
-            "test"
-            if run_properties.target in (Target.PULL_REQUEST_BASE, Target.PULL_REQUEST)
-            else run_properties.target.name.lower()
-        )  # Can't re-use get_argo_folder_name function for now because of circular imports
-        deployment_details = (
-            f"cluster: {cluster}\n"
-            + f"repository: {RepoConfig.from_config(run_properties.config).repo_credentials.name}\n"
-            + f"revision: {run_properties.versioning.revision}\n"
-            + f"tag: {run_properties.versioning.identifier}\n"
-        )
-        with Path(path / "deployment.yaml").open(mode="w+", encoding="utf-8") as file:
-            file.write(deployment_details)
-
         return Output(
             success=True,
             message=f"Wrote kubectl manifest to {path}",
             produced_artifact=artifact,
         )
 
-    chart_path = write_helm_chart(
+    if action == DeployAction.KUBERNETES_APPLY.value:  # pylint: disable=no-member
+        return apply_chart(logger, chart, step_input, release_name, delete_existing)
+
+    helm_chart = write_helm_chart(
         logger, chart, Path(project.target_path), run_properties, release_name
     )
+    chart_path = helm_chart.path
 
     if action == DeployAction.HELM_TEMPLATE.value:  # pylint: disable=no-member
         template_path = helm.template(logger, chart_path, release_name)
@@ -254,31 +334,38 @@ def deploy_helm_chart(  # pylint: disable=too-many-locals
         step_input.dry_run
         or action == DeployAction.HELM_DRY_RUN.value  # pylint: disable=no-member
     )
-    project_id: str = (
-        project.deployment.kubernetes.rancher.project_id.get_value(
-            target=run_properties.target
-        )
-        if project.deployment
-        and project.deployment.kubernetes
-        and project.deployment.kubernetes.rancher
-        and project.deployment.kubernetes.rancher.project_id
-        else ""
-    )
-
     cluster_config: ClusterConfig = get_cluster_config_for_project(
         run_properties, project
     )
 
+    if (
+        deployment_config.skip_unchanged_releases
+        and not dry_run
+        and not delete_existing
+        and is_release_unchanged(
+            logger, helm_chart, release_name, namespace, cluster_config
+        )
+    ):
+        return Output(
+            success=True,
+            message=f"Release {release_name} in {namespace} is up to date",
+        )
+
     upsert_namespace(
         logger=logger,
         namespace=namespace,
-        project_id=project_id,
+        project_id=_to_project_id(project, run_properties.target),
         dry_run=dry_run,
         run_properties=run_properties,
         cluster_config=cluster_config,
     )
 
-    return helm.install(
+    tracker = (
+        RolloutTracker(logger, clients.dynamic_api(cluster_config.context), namespace)
+        if deployment_config.await_rollout and not dry_run
+        else None
+    )
+    installed = helm.install(
         logger,
         chart_path,
         dry_run,
@@ -287,6 +374,12 @@ def deploy_helm_chart(  # pylint: disable=too-many-locals
         cluster_config.context,
         delete_existing,
     )
+    if not installed.success or tracker is None:
+        return installed
+    rollout = tracker.await_rollout(to_workloads(chart))
+    return Output(
+        success=rollout.success, message=f"{installed.message}\n{rollout.message}"
+    )
 
 
 def substitute_namespaces(
@@ -0,0 +1,185 @@
+"""
+Deploys a chart by applying its resources to the cluster with server side apply, as an alternative to installing it
+as a helm release. The resources are applied in the order helm installs them, and are labeled with the release and
+with `app.kubernetes.io/managed-by: mpyl`. Resources with those labels that are no longer part of the chart are
+pruned afterwards. The deploy completes when the deployments of the chart are rolled out.
+"""
+from dataclasses import dataclass
+from logging import Logger
+from kubernetes.dynamic import DynamicClient
+from kubernetes.dynamic.exceptions import (
+    DynamicApiError,
+    NotFoundError,
+    ResourceNotFoundError,
+)
+from kubernetes.dynamic.resource import Resource
+
+from .resources import CustomResourceDefinition, to_chart_manifests
+from .rollout import ROLLOUT_TIMEOUT_SECONDS, RolloutTracker, Workload
+from ...models import Output
+
+FIELD_MANAGER = "mpyl"
+MANAGED_BY_LABEL = "app.kubernetes.io/managed-by"
+INSTANCE_LABEL = "app.kubernetes.io/instance"
+
+KINDS = [
+    ("v1", "ServiceAccount"),
+    ("bitnami.com/v1alpha1", "SealedSecret"),
+    ("v1", "ConfigMap"),
+    ("rbac.authorization.k8s.io/v1", "Role"),
+    ("rbac.authorization.k8s.io/v1", "RoleBinding"),
+    ("v1", "Service"),
+    ("apps/v1", "Deployment"),
+    ("batch/v1", "Job"),
+    ("batch/v1", "CronJob"),
+    ("sparkoperator.k8s.io/v1beta2", "SparkApplication"),
+    ("sparkoperator.k8s.io/v1beta2", "ScheduledSparkApplication"),
+    ("monitoring.coreos.com/v1", "ServiceMonitor"),
+    ("monitoring.coreos.com/v1", "PrometheusRule"),
+    ("traefik.io/v1alpha1", "Middleware"),
+    ("traefik.io/v1alpha1", "IngressRoute"),
+]
+"""The kinds of resources a chart can have, in the order they are applied. These kinds are pruned."""
+
+
+@dataclass(frozen=True)
+class Manifest:
+    api_version: str
+    kind: str
+    name: str
+    body: dict
+
+
+def to_manifests(
+    chart: dict[str, CustomResourceDefinition], release_name: str, namespace: str
+) -> list[Manifest]:
+    """:return: the resources of the chart, labeled as part of the release, in the order in which to apply them"""
+    manifests = []
+    for _, body in sorted(to_chart_manifests(chart).items()):
+        metadata = body.setdefault("metadata", {})
+        metadata["namespace"] = namespace
+        metadata["labels"] = metadata.get("labels", {}) | {
+            INSTANCE_LABEL: release_name,
+            MANAGED_BY_LABEL: FIELD_MANAGER,
+        }
+        manifests.append(
+            Manifest(body["apiVersion"], body["kind"], metadata["name"], body)
+        )
+    order = [kind for _, kind in KINDS]
+    return sorted(
+        manifests,
+        key=lambda m: order.index(m.kind) if m.kind in order else len(order),
+    )
+
+
+class ChartApplier:
+    def __init__(
+        self, logger: Logger, dynamic_client: DynamicClient, namespace: str
+    ) -> None:
+        self._logger = logger
+        self._client = dynamic_client
+        self._namespace = namespace
+
+    def _resource(self, api_version: str, kind: str) -> Resource:
+        return self._client.resources.get(api_version=api_version, kind=kind)
+
+    def apply(
+        self,
+        chart: dict[str, CustomResourceDefinition],
+        release_name: str,
+        dry_run: bool,
+        replace_jobs: bool = False,
+    ) -> Output:
+        manifests = to_manifests(chart, release_name, self._namespace)
+        tracker = RolloutTracker(self._logger, self._client, self._namespace)
+        try:
+            for manifest in manifests:
+                resource = self._resource(manifest.api_version, manifest.kind)
+                if replace_jobs and manifest.kind == "Job" and not dry_run:
+                    self._delete_and_await(resource, manifest.name)
+                self._logger.debug(f"Applying {manifest.kind} {manifest.name}")
+                self._client.server_side_apply(
+                    resource,
+                    body=manifest.body,
+                    namespace=self._namespace,
+                    field_manager=FIELD_MANAGER,
+                    force_conflicts=True,
+                    dry_run="All" if dry_run else None,
+                )
+            if dry_run:
+                return Output(
+                    success=True,
+                    message=f"Validated {len(manifests)} resources of {release_name}",
+                )
+
+            pruned = self._prune(release_name, manifests)
+            rollout = tracker.await_rollout(
+                [Workload(m.kind, m.name) for m in manifests if m.kind == "Deployment"]
+            )
+            if not rollout.success:
+                return rollout
+        except (DynamicApiError, ResourceNotFoundError, TimeoutError) as exc:
+            return Output(
+                success=False, message=f"Failed to apply {release_name}: {exc}"
+            )
+
+        return Output(
+            success=True,
+            message=f"Applied {len(manifests)} and pruned {pruned} resources of {release_name} "
+            f"in {self._namespace}",
+        )
+
+    def _prune(self, release_name: str, manifests: list[Manifest]) -> int:
+        applied = {(m.kind, m.name) for m in manifests}
+        pruned = 0
+        for api_version, kind in KINDS:
+            try:
+                resource = self._resource(api_version, kind)
+            except ResourceNotFoundError:
+                continue
+            existing = self._client.get(
+                resource,
+                namespace=self._namespace,
+                label_selector=f"{INSTANCE_LABEL}={release_name},{MANAGED_BY_LABEL}={FIELD_MANAGER}",
+            )
+            for item in existing.items:
+                if (kind, item.metadata.name) not in applied:
+                    self._logger.info(f"Pruning {kind} {item.metadata.name}")
+                    self._client.delete(
+                        resource,
+                        name=item.metadata.name,
+                        namespace=self._namespace,
+                        propagation_policy="Background",
+                    )
+                    pruned += 1
+        return pruned
+
+    def _delete_and_await(self, resource: Resource, name: str) -> None:
+        """
+        Deletes the resource, which cannot be updated in place, and waits until it is gone
+        :raises TimeoutError: if the resource still exists after `ROLLOUT_TIMEOUT_SECONDS`
+        """
+        try:
+            deleted = self._client.delete(
+                resource,
+                name=name,
+                namespace=self._namespace,
+                propagation_policy="Foreground",
+            )
+        except NotFoundError:
+            return
+        if deleted.kind == "Status":
+            return
+        self._logger.info(f"Waiting for {resource.kind} {name} to be deleted")
+        for event in self._client.watch(
+            resource,
+            namespace=self._namespace,
+            name=name,
+            resource_version=deleted.metadata.resourceVersion,
+            timeout=ROLLOUT_TIMEOUT_SECONDS,
+        ):
+            if event["type"] == "DELETED":
+                return
+        raise TimeoutError(
+            f"{resource.kind} {name} was not deleted within {ROLLOUT_TIMEOUT_SECONDS} seconds"
+        )
@@ -85,6 +85,9 @@ from ....utilities.docker import DockerImageSpec
 
 yaml = YAML()
 
+# Only used to convert values to models, which needs no connection to a cluster
+_DESERIALIZER = ApiClient()
+
 # Determined (unscientifically) to be sensible factors.
 # Based on actual CPU usage, pods rarely use more than 10% of the allocated CPU. 60% usage is healthy, so we
 # scale down to 20% in order to keep some slack.
@@ -310,8 +313,10 @@ class ChartBuilder:
 
     @staticmethod
     def _to_k8s_model(values: dict, model_type):
-        return ApiClient()._ApiClient__deserialize(  # pylint: disable=protected-access
-            values, model_type
+        return (
+            _DESERIALIZER._ApiClient__deserialize(  # pylint: disable=protected-access
+                values, model_type
+            )
         )
 
     @staticmethod
@@ -0,0 +1,60 @@
+"""
+Kubernetes API clients that are shared by the deploys of a run. The kube config is loaded once per cluster context,
+into a client configuration of its own, so that deploys to different clusters can run at the same time. The
+connection pool of a client is sized for the concurrent deploys, so that they reuse their TLS sessions.
+"""
+import threading
+
+from kubernetes import config, client
+from kubernetes.client import ApiClient
+from kubernetes.dynamic import DynamicClient
+
+CONNECTION_POOL_SIZE = 16
+
+_clients: dict[str, ApiClient] = {}
+_dynamic_clients: dict[str, DynamicClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _new_api_client(context: str) -> ApiClient:
+    configuration = client.Configuration()
+    config.load_kube_config(
+        context=context, client_configuration=configuration, persist_config=False
+    )
+    configuration.connection_pool_maxsize = CONNECTION_POOL_SIZE
+    return ApiClient(configuration)
+
+
+def api_client(context: str) -> ApiClient:
+    """:return: the client of the current run for the cluster `context`, which is created on first use"""
+    with _clients_lock:
+        if context not in _clients:
+            _clients[context] = _new_api_client(context)
+        return _clients[context]
+
+
+def core_api(context: str) -> client.CoreV1Api:
+    return client.CoreV1Api(api_client(context))
+
+
+def apps_api(context: str) -> client.AppsV1Api:
+    return client.AppsV1Api(api_client(context))
+
+
+def dynamic_api(context: str) -> DynamicClient:
+    """:return: a client for any kind of resource on the cluster `context`, which discovers the kinds on first use"""
+    api = api_client(context)
+    with _clients_lock:
+        if context not in _dynamic_clients:
+            _dynamic_clients[context] = DynamicClient(api)
+        return _dynamic_clients[context]
+
+
+def close_api_clients() -> None:
+    """Closes the connections of all clients of the run"""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _dynamic_clients.clear()
+    for api in clients:
+        api.close()
@@ -13,19 +13,29 @@ class DeployAction(Enum):
     HELM_DRY_RUN = "HelmDryRun"
     HELM_TEMPLATE = "HelmTemplate"
     KUBERNETES_MANIFEST = "KubectlManifest"
+    KUBERNETES_APPLY = "KubernetesApply"
 
 
 @dataclass(frozen=True)
 class DeployConfig:
     action: DeployAction
     output_path: str
+    max_concurrent_deploys: int = 1
+    skip_unchanged_releases: bool = False
+    await_rollout: bool = False
 
     @staticmethod
     def from_config(values: dict):
         kube_config = values["kubernetes"]
         action: str = kube_config.get("deployAction", "HelmDeploy")
         output_path = kube_config.get("outputPath", "target/kubernetes")
-        return DeployConfig(action=DeployAction(action), output_path=output_path)  # type: ignore
+        return DeployConfig(
+            action=DeployAction(action),  # type: ignore
+            output_path=output_path,
+            max_concurrent_deploys=kube_config.get("maxConcurrentDeploys", 1),
+            skip_unchanged_releases=kube_config.get("skipUnchangedReleases", False),
+            await_rollout=kube_config.get("awaitRollout", False),
+        )
 
 
 def get_namespace(run_properties: RunProperties, project: Project) -> str:
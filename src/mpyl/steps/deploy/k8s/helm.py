@@ -2,21 +2,33 @@
 step.
 """
 
-import shutil
+import base64
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass
 from logging import Logger
 from pathlib import Path
+from typing import Optional
 
 import yaml
+from kubernetes import client
 
-from .resources import to_yaml, CustomResourceDefinition
+from .resources import chart_to_yaml, CustomResourceDefinition
 from ...models import RunProperties, Output
 from ....cli import get_version
+from ....utilities import write_if_changed
 from ....utilities.subprocess import custom_check_output
 
 
-def to_chart_metadata(chart_name: str, run_properties: RunProperties):
+MANIFEST_HASH_ANNOTATION = "mpyl/manifest-hash"
+
+
+def to_chart_metadata(
+    chart_name: str, run_properties: RunProperties, manifest_hash: str = ""
+):
     mpyl_version = get_version()
-    return f"""apiVersion: v3
+    metadata = f"""apiVersion: v3
 name: {chart_name}
 description: |
     A helm chart rendered by an MPyL k8s deploy step. 
@@ -25,11 +37,66 @@ type: application
 version: {mpyl_version}
 appVersion: "{run_properties.versioning.identifier}"
 """
+    if manifest_hash:
+        metadata += f"annotations:\n  {MANIFEST_HASH_ANNOTATION}: {manifest_hash}\n"
+    return metadata
 
 
 GENERATED_WARNING = """# This file was generated by MPyL. DO NOT EDIT DIRECTLY."""
 
 
+@dataclass(frozen=True)
+class ChartFiles:
+    """The files of a chart that were written or removed, because their content changed"""
+
+    written: list[Path]
+    removed: list[Path]
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.written or self.removed)
+
+
+@dataclass(frozen=True)
+class HelmChart:
+    path: Path
+    manifest_hash: str
+    """The hash of the rendered templates and chart metadata, which is recorded in the release"""
+    files: ChartFiles
+    """The files that changed compared to the chart previously written to `path`"""
+
+
+def to_manifest_hash(chart_metadata: str, templates: dict[str, str]) -> str:
+    digest = hashlib.sha256(chart_metadata.encode())
+    for name, template_content in sorted(templates.items()):
+        digest.update(f"\0{name}\0{template_content}".encode())
+    return digest.hexdigest()
+
+
+def _decode_release(data: str) -> dict:
+    release = base64.b64decode(base64.b64decode(data))
+    if release[:2] == b"\x1f\x8b":
+        release = gzip.decompress(release)
+    return json.loads(release)
+
+
+def deployed_manifest_hash(
+    core_api: client.CoreV1Api, release_name: str, name_space: str
+) -> Optional[str]:
+    """
+    :return: the manifest hash of the deployed revision of the release, read from the release secret that helm
+    stores in the namespace, or None if the release is not deployed or was not deployed with a hash
+    """
+    secrets = core_api.list_namespaced_secret(
+        name_space, label_selector=f"owner=helm,name={release_name},status=deployed"
+    ).items
+    if not secrets:
+        return None
+    latest = max(secrets, key=lambda secret: int(secret.metadata.labels["version"]))
+    chart_metadata = _decode_release(latest.data["release"])["chart"]["metadata"]
+    return (chart_metadata.get("annotations") or {}).get(MANIFEST_HASH_ANNOTATION)
+
+
 def add_repo(logger: Logger, repo_name: str, repo_url: str) -> Output:
     cmd_add = f"helm repo add {repo_name} {repo_url}"
     return custom_check_output(logger, cmd_add)
@@ -44,28 +111,50 @@ def write_chart(
     chart_path: Path,
     chart_metadata: str,
     values: dict[str, str],
-) -> None:
-    shutil.rmtree(chart_path, ignore_errors=True)
-    template_path = chart_path / Path("templates")
-    template_path.mkdir(parents=True, exist_ok=True)
+) -> ChartFiles:
+    return _write_chart_files(
+        chart_path,
+        chart_metadata,
+        values,
+        chart_to_yaml(chart),
+    )
 
-    with open(chart_path / Path("Chart.yaml"), mode="w+", encoding="utf-8") as file:
-        file.write(chart_metadata)
-    with open(chart_path / Path("values.yaml"), mode="w+", encoding="utf-8") as file:
-        if values == {}:
-            file.write(
-                "# This file is intentionally left empty. All values in /templates have been pre-interpolated"
-            )
-        else:
-            file.write(yaml.dump(values))
-
-    my_dictionary: dict[str, str] = dict(
-        map(lambda item: (item[0], to_yaml(item[1])), chart.items())
+
+def _write_chart_files(
+    chart_path: Path,
+    chart_metadata: str,
+    values: dict[str, str],
+    templates: dict[str, str],
+) -> ChartFiles:
+    """
+    Writes only the files of which the content changed, and removes templates that are no longer part of the chart,
+    so that a chart that is written again unchanged is left untouched
+    """
+    values_content = (
+        "# This file is intentionally left empty. All values in /templates have been pre-interpolated"
+        if values == {}
+        else yaml.dump(values)
     )
+    template_path = chart_path / Path("templates")
+    files = {
+        chart_path / Path("Chart.yaml"): chart_metadata,
+        chart_path / Path("values.yaml"): values_content,
+    } | {
+        template_path / name: f"{GENERATED_WARNING}\n{template_content}"
+        for name, template_content in templates.items()
+    }
+    written = [
+        path for path, content in files.items() if write_if_changed(path, content)
+    ]
+
+    removed = [
+        path for path in template_path.glob("*") if path not in files and path.is_file()
+    ]
+    for path in removed:
+        path.unlink()
+    template_path.mkdir(parents=True, exist_ok=True)
 
-    for name, template_content in my_dictionary.items():
-        with open(template_path / name, mode="w+", encoding="utf-8") as file:
-            file.write(f"{GENERATED_WARNING}\n{template_content}")
+    return ChartFiles(written, removed)
 
 
 def __remove_existing_chart(
@@ -92,13 +181,25 @@ def write_helm_chart(
     target_path: Path,
     run_properties: RunProperties,
     chart_name: str,
-) -> Path:
+) -> HelmChart:
     chart_path = Path(target_path) / "chart"
     logger.info(f"Writing HELM chart to {chart_path}")
-    write_chart(
-        chart, chart_path, to_chart_metadata(chart_name, run_properties), values={}
+    templates = chart_to_yaml(chart)
+    manifest_hash = to_manifest_hash(
+        to_chart_metadata(chart_name, run_properties), templates
+    )
+    files = _write_chart_files(
+        chart_path,
+        to_chart_metadata(chart_name, run_properties, manifest_hash),
+        {},
+        templates,
+    )
+    logger.debug(
+        f"Wrote {len(files.written)} and removed {len(files.removed)} files of {chart_path}"
+        if files.changed
+        else f"Chart at {chart_path} is unchanged"
     )
-    return chart_path
+    return HelmChart(chart_path, manifest_hash, files)
 
 
 def template(logger: Logger, chart_path: Path, name_space: str) -> Path:
@@ -0,0 +1,144 @@
+"""
+Renders the kubernetes manifests for ArgoCD of many projects at once, without running their deploy steps. The charts
+are built in worker processes, and only the manifest files of which the content changed are replaced. The changed
+manifest files are listed in the `changed_manifests_file`, so that `mpyl build artifacts push` can push just those.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Optional
+
+from . import write_manifests
+from .chart import (
+    ChartBuilder,
+    to_service_chart,
+    to_job_chart,
+    to_cron_job_chart,
+    to_spark_job_chart,
+)
+from .deploy_config import DeployConfig
+from .resources import CustomResourceDefinition
+from .. import STAGE_NAME
+from ...models import (
+    Input,
+    Output,
+    Artifact,
+    ArtifactType,
+    RunProperties,
+    input_to_artifact,
+)
+from ....project import Project
+from ....project_execution import ProjectExecution
+from ....utilities import run_artifacts_folder
+from ....utilities.docker import DockerImageSpec, full_image_path_for_project
+
+CHANGED_MANIFESTS_FILE_NAME = "changed_manifests.txt"
+
+
+def changed_manifests_file() -> Path:
+    """:return: the file that lists the changed manifests, in the run artifacts folder at the root of the repository"""
+    return run_artifacts_folder() / CHANGED_MANIFESTS_FILE_NAME
+
+
+def _to_job_chart(builder: ChartBuilder) -> dict[str, CustomResourceDefinition]:
+    return to_cron_job_chart(builder) if builder.is_cron_job else to_job_chart(builder)
+
+
+CHARTS: dict[str, Callable[[ChartBuilder], dict[str, CustomResourceDefinition]]] = {
+    "Kubernetes Deploy": to_service_chart,
+    "Kubernetes Job Deploy": _to_job_chart,
+    "Kubernetes Spark Job Deploy": to_spark_job_chart,
+}
+"""The charts of the deploy steps that can be rendered, by step name"""
+
+
+@dataclass(frozen=True)
+class RenderResult:
+    project_path: str
+    changed_files: list[Path]
+    error: Optional[str] = None
+
+
+def is_renderable(project: Project) -> bool:
+    return project.stages.for_stage(STAGE_NAME) in CHARTS
+
+
+def _docker_image(step_input: Input) -> Artifact:
+    """
+    :return: the docker image of the latest build of the project at the current revision, if its output is present,
+    or else the image that the build of the current tag pushes
+    """
+    project = step_input.project_execution.project
+    for stage in reversed(step_input.run_properties.stages):
+        output: Optional[Output] = Output.try_read(project.target_path, stage.name)
+        if (
+            output
+            and output.produced_artifact
+            and output.produced_artifact.artifact_type == ArtifactType.DOCKER_IMAGE
+            and output.produced_artifact.revision
+            == step_input.run_properties.versioning.revision
+        ):
+            return output.produced_artifact
+    return input_to_artifact(
+        ArtifactType.DOCKER_IMAGE,
+        step_input,
+        spec=DockerImageSpec(image=full_image_path_for_project(step_input)),
+    )
+
+
+def render_project(project: Project, run_properties: RunProperties) -> RenderResult:
+    try:
+        step_input = Input(
+            ProjectExecution(project, frozenset(), None, False), run_properties
+        )
+        step_input.required_artifact = _docker_image(step_input)
+        chart = CHARTS[project.stages.for_stage(STAGE_NAME) or ""](
+            ChartBuilder(step_input)
+        )
+        deploy_config = DeployConfig.from_config(run_properties.config)
+        changed_files = write_manifests(
+            Path(project.root_path, deploy_config.output_path), chart, run_properties
+        )
+        return RenderResult(project.path, changed_files)
+    except Exception as exc:  # pylint: disable=broad-except
+        return RenderResult(project.path, [], f"{type(exc).__name__}: {exc}")
+
+
+def render_projects(
+    projects: list[Project], run_properties: RunProperties, workers: int
+) -> list[RenderResult]:
+    """
+    Renders the manifests of the `projects` in `workers` processes, and lists the changed manifest files in the
+    `changed_manifests_file`
+    """
+    renderable = [project for project in projects if is_renderable(project)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(
+            executor.map(
+                partial(render_project, run_properties=run_properties),
+                renderable,
+                chunksize=max(1, len(renderable) // (workers * 4)),
+            )
+        )
+    changed_file = changed_manifests_file()
+    changed_file.parent.mkdir(parents=True, exist_ok=True)
+    changed_file.write_text(
+        "".join(f"{path}\n" for result in results for path in result.changed_files),
+        "utf-8",
+    )
+    return results
+
+
+def read_changed_manifests() -> set[Path]:
+    """:return: the folders with manifest files that changed in the last render"""
+    changed_file = changed_manifests_file()
+    if not changed_file.exists():
+        raise FileNotFoundError(
+            f"{changed_file} not found. Run `mpyl build artifacts render` first"
+        )
+    return {
+        Path(line).parent
+        for line in changed_file.read_text("utf-8").splitlines()
+        if line
+    }
@@ -3,11 +3,15 @@ Custom Resource Definitions, allow you to create custom k8s resources, besides t
 This is useful for example when you want to configure a specific operator, like Spark or sealed secrets.
 """
 import pkgutil
+from functools import cache
+from io import StringIO
 from typing import Optional
 
-import jsonschema
 import six
 from jsonschema import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
 from kubernetes.client import Configuration, V1ObjectMeta
 from ruamel.yaml import YAML
 
@@ -15,6 +19,16 @@ from .....projects.versioning import yaml_to_string
 
 yaml = YAML()
 
+fast_yaml = YAML(typ="safe")
+"""Uses the C emitter of ruamel.yaml.clib if it is installed, and formats like `yaml` for the values it is used for"""
+fast_yaml.default_flow_style = False
+fast_yaml.allow_unicode = True
+fast_yaml.sort_base_mapping_type_on_output = False  # type: ignore
+
+FAST_YAML_WIDTH = 76
+"""Lines must stay below the width of 80 at which `yaml` breaks scalars in its own way, including quotes"""
+FAST_YAML_UNSAFE_CHARACTERS = frozenset("'\"\\\n\r\t")
+
 
 class CustomResourceDefinition:
     openapi_types = {
@@ -131,38 +145,175 @@ def to_dict(obj, skip_none=False):
     return result
 
 
-def to_yaml(resource: object) -> str:
-    def remove_none(obj):
-        if isinstance(obj, (list, tuple, set)):
-            return type(obj)(remove_none(x) for x in obj if x is not None)
-        if isinstance(obj, dict):
-            return type(obj)(
-                (remove_none(k), remove_none(v))
-                for k, v in obj.items()
-                if k is not None and v is not None
-            )
-        return obj
+def _is_model(value: object) -> bool:
+    return hasattr(value, "openapi_types") and hasattr(value, "attribute_map")
 
-    resource_dict = (
-        to_dict(resource)
-        if (hasattr(resource, "openapi_types") and hasattr(resource, "attribute_map"))
-        else {}
+
+@cache
+def _attribute_keys(model_type: type) -> tuple[tuple[str, str], ...]:
+    return tuple(
+        (attr, model_type.attribute_map[attr])  # type: ignore
+        for attr in model_type.openapi_types  # type: ignore
+        if model_type.attribute_map.get(attr) is not None  # type: ignore
     )
-    yaml_values = remove_none(resource_dict)
-
-    if hasattr(resource, "schema") and resource.schema:
-        template = pkgutil.get_data(__name__, f"schema/{resource.schema}")
-        if template:
-            schema = yaml.load(template.decode("utf-8"))
-            try:
-                jsonschema.validate(yaml_values, schema)
-            except ValidationError as err:
-                raise ValueError(
-                    f'Schema validation failed with {err.message} at {".".join(map(str, err.schema_path))}'
-                ) from err
+
+
+def _without_none(value):
+    """Converts nested models to dicts, and leaves out all None values, in a single pass"""
+    if _is_model(value):
+        return _model_without_none(value)
+    if isinstance(value, (list, tuple, set)):
+        return type(value)(_without_none(x) for x in value if x is not None)
+    if isinstance(value, dict):
+        return type(value)(
+            (_without_none(k), _without_none(v))
+            for k, v in value.items()
+            if k is not None and v is not None
+        )
+    return value
+
+
+def _model_without_none(model) -> dict:
+    result: dict = {}
+    for attr, key in _attribute_keys(model.__class__):
+        value = getattr(model, attr)
+        if value is None:
+            continue
+        if isinstance(value, list):
+            result[key] = [_without_none(x) for x in value if x is not None]
+        elif isinstance(value, dict) and not _is_model(value):
+            result[key] = {
+                _without_none(k): _without_none(v)
+                for k, v in value.items()
+                if k is not None and v is not None
+            }
         else:
-            raise ValueError(
-                f"Schema {resource.schema} defined but not found in package"
+            result[key] = _without_none(value)
+    return result
+
+
+@cache
+def schema_validator(schema_name: str) -> Validator:
+    """:return: the validator for the schema in the package, which is loaded and checked once per process"""
+    try:
+        template = pkgutil.get_data(__name__, f"schema/{schema_name}")
+    except OSError:
+        template = None
+    if not template:
+        raise ValueError(f"Schema {schema_name} defined but not found in package")
+    schema = YAML(typ="safe").load(template)
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema)
+
+
+def _validation_error(resource: object, values: dict) -> Optional[ValidationError]:
+    schema_name = getattr(resource, "schema", None)
+    if not schema_name:
+        return None
+    return best_match(schema_validator(schema_name).iter_errors(values))
+
+
+def _to_message(error: ValidationError) -> str:
+    return f'Schema validation failed with {error.message} at {".".join(map(str, error.schema_path))}'
+
+
+def to_manifest(resource: object, validate: bool = True) -> dict:
+    """:return: the resource as a dict without empty values, validated against its schema if it has one"""
+    yaml_values = _model_without_none(resource) if _is_model(resource) else {}
+
+    if validate:
+        error = _validation_error(resource, yaml_values)
+        if error:
+            raise ValueError(_to_message(error)) from error
+
+    return yaml_values
+
+
+def to_chart_manifests(chart: dict[str, CustomResourceDefinition]) -> dict[str, dict]:
+    """
+    :return: the manifests of all resources of the chart, by name, after validating all of them
+    :raises ValueError: with the validation failures of all resources that are not valid
+    """
+    manifests = {
+        name: to_manifest(resource, validate=False) for name, resource in chart.items()
+    }
+    failures = {
+        name: error
+        for name, resource in chart.items()
+        if (error := _validation_error(resource, manifests[name]))
+    }
+    if failures:
+        raise ValueError(
+            "\n".join(
+                f"{name}: {_to_message(error)}" for name, error in failures.items()
+            )
+        ) from next(iter(failures.values()))
+    return manifests
+
+
+def _is_fast_yaml_scalar(value, column: int) -> bool:
+    value_type = type(value)
+    if value_type is str:
+        return (
+            column + len(value) + 2 <= FAST_YAML_WIDTH
+            and value.isprintable()
+            and FAST_YAML_UNSAFE_CHARACTERS.isdisjoint(value)
+        )
+    return value_type in (int, bool)
+
+
+def _is_fast_yaml_compatible(value, indent: int = 0) -> bool:
+    """
+    :return: True if `fast_yaml` formats the value exactly like `yaml`, which is when it has only plain types, string
+    keys and short strings without quotes or escaped characters. `indent` is an upper bound of the indentation of the
+    value.
+    """
+    if type(value) is dict:  # pylint: disable=unidiomatic-typecheck
+        return all(
+            type(k) is str  # pylint: disable=unidiomatic-typecheck
+            and _is_fast_yaml_scalar(k, indent)
+            and (
+                _is_fast_yaml_compatible(v, indent + 2)
+                if isinstance(v, (dict, list))
+                else _is_fast_yaml_scalar(v, indent + len(k) + 2)
             )
+            for k, v in value.items()
+        )
+    if type(value) is list:  # pylint: disable=unidiomatic-typecheck
+        return all(
+            _is_fast_yaml_compatible(v, indent + 2)
+            if isinstance(v, (dict, list))
+            else _is_fast_yaml_scalar(v, indent + 2)
+            for v in value
+        )
+    return False
+
+
+def manifest_to_yaml(values: dict) -> str:
+    """
+    Formats the values like `yaml`, but faster. The entries of a block mapping are independent of each other, so every
+    top level entry is formatted by `fast_yaml` if it can be, and by `yaml` otherwise.
+    """
+    if not values or type(values) is not dict:  # pylint: disable=unidiomatic-typecheck
+        return yaml_to_string(values, yaml)
+    with StringIO() as stream:
+        for key, value in values.items():
+            entry = {key: value}
+            if _is_fast_yaml_compatible(entry):
+                fast_yaml.dump(entry, stream)
+            else:
+                yaml.dump(entry, stream)
+        return stream.getvalue()
 
-    return yaml_to_string(yaml_values, yaml)
+
+def to_yaml(resource: object) -> str:
+    return manifest_to_yaml(to_manifest(resource))
+
+
+def chart_to_yaml(chart: dict[str, CustomResourceDefinition]) -> dict[str, str]:
+    """:return: the yaml of all resources of the chart, by name, after validating all of them"""
+    return {
+        name: manifest_to_yaml(manifest)
+        for name, manifest in to_chart_manifests(chart).items()
+    }
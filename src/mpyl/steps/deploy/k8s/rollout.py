@@ -0,0 +1,304 @@
+"""
+Follows the rollout of deployments and the completion of jobs with the kubernetes watch API. All workloads of a deploy
+are followed at the same time, each with a watch on the workload itself and a watch on its pods. Changes in the state
+of the pods are logged as they happen, so that the reason a container does not start shows up in the log of the
+step. Waiting stops as soon as all workloads are ready, or one of them has failed.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from logging import Logger
+from typing import Callable, Iterator, Optional
+
+from kubernetes.dynamic import DynamicClient
+from kubernetes.dynamic.exceptions import DynamicApiError, ResourceNotFoundError
+
+from .resources import CustomResourceDefinition
+from ...models import Output
+
+ROLLOUT_TIMEOUT_SECONDS = 600
+WATCH_INTERVAL_SECONDS = 10
+"""How long a single watch request lasts, which bounds how long a watch keeps running after waiting has stopped"""
+
+WORKLOAD_API_VERSIONS = {
+    "Deployment": "apps/v1",
+    "Job": "batch/v1",
+    "CronJob": "batch/v1",
+}
+
+FATAL_WAITING_REASONS = {
+    "CrashLoopBackOff",
+    "ImagePullBackOff",
+    "InvalidImageName",
+    "CreateContainerConfigError",
+    "CreateContainerError",
+}
+"""Reasons for which a container is waiting, that it does not recover from without a new deploy"""
+
+
+@dataclass(frozen=True)
+class Workload:
+    kind: str
+    name: str
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.name}"
+
+
+def to_workloads(chart: dict[str, CustomResourceDefinition]) -> list[Workload]:
+    """:return: the deployments, jobs and cron jobs of the chart"""
+    return [
+        Workload(resource.kind, resource.metadata.name)
+        for resource in chart.values()
+        if getattr(resource, "kind", None) in WORKLOAD_API_VERSIONS
+    ]
+
+
+def rollout_failure(deployment: dict) -> Optional[str]:
+    """:return: the reason the rollout of the deployment failed, or None if it is still progressing or done"""
+    for condition in deployment.get("status", {}).get("conditions", []):
+        if (
+            condition.get("type") == "Progressing"
+            and condition.get("reason") == "ProgressDeadlineExceeded"
+        ):
+            return condition.get("message", "Progress deadline exceeded")
+    return None
+
+
+def is_rolled_out(deployment: dict) -> bool:
+    """The same check as `kubectl rollout status`"""
+    metadata = deployment.get("metadata", {})
+    status = deployment.get("status", {})
+    observed = status.get("observedGeneration", 0) >= metadata.get("generation", 0)
+    desired = max(
+        deployment.get("spec", {}).get("replicas", 1), status.get("replicas", 0)
+    )
+    updated = status.get("updatedReplicas", 0)
+    return observed and desired <= updated <= status.get("availableReplicas", 0)
+
+
+def _condition(job: dict, condition_type: str) -> Optional[dict]:
+    for condition in job.get("status", {}).get("conditions", []):
+        if (
+            condition.get("type") == condition_type
+            and condition.get("status") == "True"
+        ):
+            return condition
+    return None
+
+
+def job_failure(job: dict) -> Optional[str]:
+    """:return: the reason the job failed, or None if it is still running or completed"""
+    failed = _condition(job, "Failed")
+    if not failed:
+        return None
+    reason = failed.get("reason", "Failed")
+    message = failed.get("message")
+    return f"{reason}: {message}" if message else reason
+
+
+def is_job_complete(job: dict) -> bool:
+    return _condition(job, "Complete") is not None
+
+
+IS_READY: dict[str, Callable[[dict], bool]] = {
+    "Deployment": is_rolled_out,
+    "Job": is_job_complete,
+}
+FAILURE: dict[str, Callable[[dict], Optional[str]]] = {
+    "Deployment": rollout_failure,
+    "Job": job_failure,
+}
+
+
+def pod_status(pod: dict) -> str:
+    """:return: the phase of the pod, with the reasons its containers are waiting or terminated"""
+    status = pod.get("status", {})
+    states = []
+    for container in status.get("containerStatuses", []):
+        state = container.get("state", {})
+        if "waiting" in state:
+            states.append(
+                f"{container['name']} {state['waiting'].get('reason', 'waiting')}"
+            )
+        elif "terminated" in state:
+            terminated = state["terminated"]
+            states.append(
+                f"{container['name']} {terminated.get('reason', 'terminated')} "
+                f"with exit code {terminated.get('exitCode')}"
+            )
+    phase = status.get("phase", "Unknown")
+    return f"{phase}: {', '.join(states)}" if states else phase
+
+
+def pod_failure(pod: dict) -> Optional[str]:
+    """:return: the reason a container of the pod cannot start, or None if it may still start"""
+    for container in pod.get("status", {}).get("containerStatuses", []):
+        waiting = container.get("state", {}).get("waiting", {})
+        if waiting.get("reason") in FATAL_WAITING_REASONS:
+            message = waiting.get("message")
+            return (
+                f"container {container['name']} of pod {pod['metadata']['name']} is in "
+                f"{waiting['reason']}" + (f": {message}" if message else "")
+            )
+    return None
+
+
+def _created_at(body: dict) -> datetime:
+    timestamp = body.get("metadata", {}).get("creationTimestamp")
+    return (
+        datetime.fromisoformat(timestamp)
+        if timestamp
+        else datetime.max.replace(tzinfo=timezone.utc)
+    )
+
+
+class RolloutTracker:
+    def __init__(
+        self,
+        logger: Logger,
+        dynamic_client: DynamicClient,
+        namespace: str,
+        timeout: int = ROLLOUT_TIMEOUT_SECONDS,
+    ) -> None:
+        self._logger = logger
+        self._client = dynamic_client
+        self._namespace = namespace
+        self._timeout = timeout
+        self._started = datetime.now(timezone.utc)
+        """Pods that were created before the tracker are from a previous rollout, and cannot make it fail"""
+
+    def await_rollout(self, workloads: list[Workload]) -> Output:
+        """Waits until all deployments are rolled out, and all jobs have completed"""
+        try:
+            tracked = [w for workload in workloads for w in self._resolve(workload)]
+        except (DynamicApiError, ResourceNotFoundError) as exc:
+            return Output(success=False, message=f"Failed to follow rollout: {exc}")
+        if not tracked:
+            return Output(success=True, message="Nothing to roll out")
+
+        self._logger.info(f"Waiting for {', '.join(map(str, tracked))}")
+        results: queue.Queue[tuple[Workload, Optional[str]]] = queue.Queue()
+        finished = {workload: threading.Event() for workload in tracked}
+        stop = threading.Event()
+        pool = ThreadPoolExecutor(
+            max_workers=2 * len(tracked), thread_name_prefix="rollout"
+        )
+        for workload in tracked:
+            pool.submit(self._follow, workload, results, stop)
+            pool.submit(self._follow_pods, workload, results, finished[workload], stop)
+
+        deadline = time.monotonic() + self._timeout
+        failure = None
+        try:
+            while failure is None and not all(e.is_set() for e in finished.values()):
+                try:
+                    workload, reason = results.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    failure = f"Not rolled out within {self._timeout} seconds"
+                    continue
+                if not finished[workload].is_set():
+                    finished[workload].set()
+                    failure = f"{workload} failed: {reason}" if reason else None
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if failure:
+            return Output(success=False, message=failure)
+        return Output(
+            success=True, message=f"Rolled out {', '.join(map(str, tracked))}"
+        )
+
+    def _resolve(self, workload: Workload) -> list[Workload]:
+        """:return: the workload, or for a cron job, the jobs it is currently running"""
+        if workload.kind != "CronJob":
+            return [workload]
+        cron_job = self._get(workload).to_dict()
+        jobs = [
+            Workload("Job", job["name"])
+            for job in cron_job.get("status", {}).get("active") or []
+        ]
+        if not jobs:
+            self._logger.info(f"{workload} has no running jobs")
+        return jobs
+
+    def _get(self, workload: Workload):
+        resource = self._client.resources.get(
+            api_version=WORKLOAD_API_VERSIONS[workload.kind], kind=workload.kind
+        )
+        return self._client.get(resource, name=workload.name, namespace=self._namespace)
+
+    def _watch(
+        self, api_version: str, kind: str, stop: threading.Event, **selector
+    ) -> Iterator[tuple[str, dict]]:
+        """Watches in short requests, so that watching ends soon after `stop` is set"""
+        resource = self._client.resources.get(api_version=api_version, kind=kind)
+        while not stop.is_set():
+            for event in self._client.watch(
+                resource,
+                namespace=self._namespace,
+                timeout=WATCH_INTERVAL_SECONDS,
+                **selector,
+            ):
+                yield event["type"], event["raw_object"]
+                if stop.is_set():
+                    return
+
+    def _follow(
+        self,
+        workload: Workload,
+        results: queue.Queue,
+        stop: threading.Event,
+    ) -> None:
+        try:
+            for event_type, body in self._watch(
+                WORKLOAD_API_VERSIONS[workload.kind],
+                workload.kind,
+                stop,
+                name=workload.name,
+            ):
+                if event_type == "DELETED":
+                    results.put((workload, "deleted"))
+                    return
+                failure = FAILURE[workload.kind](body)
+                if failure or IS_READY[workload.kind](body):
+                    results.put((workload, failure))
+                    return
+        except Exception as exc:  # pylint: disable=broad-except
+            results.put((workload, str(exc) or type(exc).__name__))
+
+    def _follow_pods(
+        self,
+        workload: Workload,
+        results: queue.Queue,
+        finished: threading.Event,
+        stop: threading.Event,
+    ) -> None:
+        try:
+            match_labels = self._get(workload).to_dict()["spec"]["selector"][
+                "matchLabels"
+            ]
+            selector = ",".join(f"{k}={v}" for k, v in match_labels.items())
+            statuses: dict[str, str] = {}
+            for event_type, pod in self._watch(
+                "v1", "Pod", stop, label_selector=selector
+            ):
+                if finished.is_set():
+                    return
+                name = pod["metadata"]["name"]
+                status = "Deleted" if event_type == "DELETED" else pod_status(pod)
+                if statuses.get(name) != status:
+                    statuses[name] = status
+                    self._logger.info(f"Pod {name} of {workload}: {status}")
+                failure = pod_failure(pod)
+                if failure and _created_at(pod) >= self._started:
+                    results.put((workload, failure))
+                    return
+        except Exception as exc:  # pylint: disable=broad-except
+            self._logger.warning(f"Could not follow the pods of {workload}: {exc}")
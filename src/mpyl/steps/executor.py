@@ -14,6 +14,7 @@ from .models import Output, Input, RunProperties, ArtifactType, Artifact
 from ..project import Project
 from ..project import Stage
 from ..project_execution import ProjectExecution
+from ..utilities.docker.push_queue import wait_for_pushes
 
 yaml = YAML()
 
@@ -44,6 +45,10 @@ class StepResult:
     output: Output
     timestamp: datetime = datetime.now()
 
+    @property
+    def metrics(self) -> dict[str, int]:
+        return self.output.metrics or {}
+
 
 class Executor:
     """Executor of individual steps within a pipeline."""
@@ -151,6 +156,9 @@ class Executor:
         else:
             after_result.produced_artifact = main_step_artifact
 
+        if main_result.metrics:
+            after_result.metrics = main_result.metrics | (after_result.metrics or {})
+
         if not main_result.success:
             after_result.message = main_result.message
             after_result.success = False
@@ -187,6 +195,11 @@ class Executor:
                 self._properties.stages,
                 executor.required_artifact,
             )
+            if artifact is not None and (
+                push_failure := wait_for_pushes(project_execution.name)
+            ):
+                return Output(success=False, message=push_failure)
+
             if executor.before:
                 before_result = self._execute(
                     stage=stage,
@@ -1,5 +1,6 @@
 """ Model representation of run-specific configuration. """
 
+import threading
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
@@ -12,6 +13,8 @@ from ..project_execution import ProjectExecution
 from ..run_plan import RunPlan
 
 yaml = YAML()
+_yaml_lock = threading.Lock()
+"""The YAML instance is not thread safe, and steps of different projects may run concurrently"""
 
 
 @dataclass(frozen=True)
@@ -20,6 +23,8 @@ class VersioningProperties:
     branch: Optional[str]
     pr_number: Optional[int]
     tag: Optional[str]
+    target_branch: Optional[str] = None
+    """The branch the pull request is merged into, if any"""
 
     def validate(self) -> Optional[str]:
         if not self.pr_number and not self.tag:
@@ -141,6 +146,8 @@ class RunProperties:
             branch=versioning_config["branch"],
             pr_number=pr_num,
             tag=tag,
+            target_branch=versioning_config.get("target_branch")
+            or (config["vcs"]["git"]["mainBranch"] if pr_num else None),
         )
         console = ConsoleProperties.from_configuration(build)
 
@@ -248,6 +255,8 @@ class Output:
     success: bool
     message: str
     produced_artifact: Optional[Artifact] = None
+    metrics: Optional[dict[str, int]] = None
+    """Quantitative information about the execution, e.g. the size of a docker build context in bytes"""
 
     @staticmethod
     def path(target_path: Path, stage: str):
@@ -255,14 +264,16 @@ class Output:
 
     def write(self, target_path: Path, stage: str):
         Path(target_path).mkdir(parents=True, exist_ok=True)
-        with Output.path(target_path, stage).open(mode="w+", encoding="utf-8") as file:
+        with _yaml_lock, Output.path(target_path, stage).open(
+            mode="w+", encoding="utf-8"
+        ) as file:
             yaml.dump(self, file)
 
     @staticmethod
     def try_read(target_path: Path, stage: str):
         path = Output.path(target_path, stage)
         if path.exists():
-            with open(path, encoding="utf-8") as file:
+            with _yaml_lock, open(path, encoding="utf-8") as file:
                 return yaml.load(file)
         return None
 
@@ -7,7 +7,7 @@ from python_on_whales import DockerClient
 from . import STAGE_NAME
 from .. import Step, Meta
 from ..models import Input, Output, ArtifactType
-from ...utilities.docker import stream_docker_logging
+from ...utilities.docker import stream_docker_logging, DockerComposeConfig
 
 
 class IntegrationTestAfter(Step):
@@ -29,6 +29,12 @@ class IntegrationTestAfter(Step):
         if not os.path.exists(compose_file):
             return Output(success=True, message="No containers to stop")
 
+        if DockerComposeConfig.from_yaml(step_input.run_properties.config).share_stacks:
+            return Output(
+                success=True,
+                message=f"Containers in {compose_file} are shared, and stopped at the end of the stage",
+            )
+
         self._logger.debug(f"Stopping containers in {compose_file}")
         docker_client = DockerClient(compose_files=[compose_file])
         logs = docker_client.compose.logs(stream=True)
@@ -1,12 +1,18 @@
-""" Before test step. Starts docker-compose if necessary."""
+""" Before test step. Starts docker-compose if necessary.
+
+With `docker.compose.shareStacks`, projects with identical compose files share their containers within a stage, as
+described in `mpyl.utilities.docker.compose`.
+"""
 import os
-import time
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from logging import Logger
+from pathlib import Path
+from typing import Generator
 
 from python_on_whales import DockerClient, Container
-from python_on_whales.components.compose.models import ComposeProject
-from python_on_whales.components.container.models import ContainerHealthcheckResult
+from python_on_whales.components.system.models import DockerEvent
 
 from . import STAGE_NAME
 from .. import Step, Meta
@@ -18,13 +24,96 @@ from ...utilities.docker import (
     login,
     DockerConfig,
 )
+from ...utilities.docker.compose import (
+    release_conflicting_stacks,
+    shared_compose_stack,
+)
+
+
+COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+HEALTH_STATUS_ACTION = "health_status"
+PENDING_STATES = {"created", "restarting"}
+"""States of a container that is not running yet, but may still start"""
+
+
+def _restarts(container: Container) -> bool:
+    policy = container.host_config.restart_policy if container.host_config else None
+    return bool(policy and policy.name and policy.name != "no")
+
 
+@dataclass
+class ComposeReadiness:
+    """The containers of a compose project that are not ready yet, updated from their docker events"""
 
-@dataclass(frozen=True)
-class ContainerHealth:
-    name: str
-    status: str
-    health_checks: list[ContainerHealthcheckResult]
+    awaiting: dict[str, str]
+    """The status of every container that is not running, or not healthy yet, by name"""
+    failed: dict[str, str] = field(default_factory=dict)
+    """The containers that stopped and are not restarted, with the reason"""
+    restarted: frozenset[str] = frozenset()
+    """The containers with a restart policy, which docker restarts when they stop, e.g. while a dependency starts"""
+    health_checked: frozenset[str] = frozenset()
+    """The containers with a health check, which are only ready when they are healthy"""
+
+    @staticmethod
+    def of(containers: list[Container]) -> "ComposeReadiness":
+        readiness = ComposeReadiness(
+            awaiting={},
+            restarted=frozenset(c.name for c in containers if _restarts(c)),
+            health_checked=frozenset(
+                c.name for c in containers if c.state.health is not None
+            ),
+        )
+        for container in containers:
+            state = container.state
+            if state.running:
+                if state.health is not None and state.health.status != "healthy":
+                    readiness.awaiting[container.name] = (
+                        state.health.status or "starting"
+                    )
+            elif (
+                state.status in PENDING_STATES or container.name in readiness.restarted
+            ):
+                readiness.awaiting[container.name] = state.status or "created"
+            else:
+                readiness.failed[
+                    container.name
+                ] = f"{state.status} with exit code {state.exit_code}"
+        return readiness
+
+    @property
+    def ready(self) -> bool:
+        return not self.awaiting and not self.failed
+
+    @property
+    def unhealthy(self) -> dict[str, str]:
+        return dict(self.awaiting)
+
+    def process(self, event: DockerEvent) -> None:
+        attributes = (event.actor.attributes if event.actor else None) or {}
+        name = attributes.get("name")
+        action = event.action or ""
+        if not name:
+            return
+        if action.startswith(HEALTH_STATUS_ACTION) and name in self.awaiting:
+            status = action.split(":", 1)[-1].strip()
+            if status == "healthy":
+                del self.awaiting[name]
+            else:
+                self.awaiting[name] = status
+        elif action == "start" and name in self.awaiting:
+            if name in self.health_checked:
+                self.awaiting[name] = "starting"
+            else:
+                del self.awaiting[name]
+        elif action == "die":
+            if name in self.restarted:
+                self.awaiting[
+                    name
+                ] = f"restarting after exit code {attributes.get('exitCode')}"
+            else:
+                self.failed[
+                    name
+                ] = f"exited with exit code {attributes.get('exitCode')}"
 
 
 class IntegrationTestBefore(Step):
@@ -41,17 +130,6 @@ class IntegrationTestBefore(Step):
             required_artifact=ArtifactType.NONE,
         )
 
-    @staticmethod
-    def all_running(project_status: ComposeProject):
-        total_not_running: int = (
-            (project_status.created or 0)
-            + (project_status.restarting or 0)
-            + (project_status.exited or 0)
-            + (project_status.paused or 0)
-            + (project_status.dead or 0)
-        )
-        return total_not_running == 0
-
     def execute(self, step_input: Input) -> Output:
         compose_file = step_input.project_execution.project.test_containers_path
         if not os.path.exists(compose_file):
@@ -66,60 +144,96 @@ class IntegrationTestBefore(Step):
             login(logger=self._logger, registry_config=docker_registry_config)
 
         config = DockerComposeConfig.from_yaml(step_input.run_properties.config)
+        if not config.share_stacks:
+            return self._start(
+                DockerClient(compose_files=[compose_file]), compose_file, config
+            )
 
+        stack = shared_compose_stack(compose_file)
+        with stack.lock:
+            if stack.ready:
+                return Output(
+                    success=True,
+                    message=f"Reusing containers of {stack.project_name} for {compose_file}",
+                )
+            release_conflicting_stacks(self._logger, stack)
+            output = self._start(stack.client(), compose_file, config)
+            stack.started = True
+            stack.ready = output.success
+            return output
+
+    def _start(
+        self,
+        docker_client: DockerClient,
+        compose_file: Path,
+        config: DockerComposeConfig,
+    ) -> Output:
         self._logger.debug(f"Starting containers in {compose_file}")
-        docker_client = DockerClient(compose_files=[compose_file])
         docker_client.compose.down(remove_orphans=True)
         docker_client.compose.build()
+        started_at = datetime.now()
         docker_client.compose.up(detach=True, color=True, quiet=False)
 
-        goal_reached: bool = False
-        stream_docker_logging(
-            logger=self._logger,
-            generator=docker_client.compose.logs(stream=True),
-            task_name=f"Start {compose_file}",
-        )
-
-        poll = 0
-        while not goal_reached:
-            project_status: ComposeProject = docker_client.compose.ls()[0]
-            containers = docker_client.compose.ps()
-            container_healths = [
-                ContainerHealth(c.name, c.state.health.status, c.state.health.log or [])
-                for c in containers
-                if c.state.health is not None and c.state.health.status is not None
-            ]
-            all_healthy = all(
-                container.status == "healthy" for container in container_healths
+        threading.Thread(
+            target=stream_docker_logging,
+            kwargs={
+                "logger": self._logger,
+                "generator": docker_client.compose.logs(stream=True, follow=True),
+                "task_name": f"Start {compose_file}",
+            },
+            name="compose-logs",
+            daemon=True,
+        ).start()
+
+        containers: list[Container] = docker_client.compose.ps()
+        readiness = ComposeReadiness.of(containers)
+        if not readiness.ready:
+            self._logger.info("Waiting for container to be running and healthy..")
+            self._await_readiness(
+                docker_client, containers, readiness, started_at, config
             )
 
-            goal_reached = self.all_running(project_status) and all_healthy
-
-            unhealthy = [
-                (c.name, c.status, c.health_checks)
-                for c in container_healths
-                if c.status != "healthy"
-            ]
-            if not goal_reached:
-                if poll == 0:
-                    self._logger.info(
-                        "Waiting for container to be running and healthy.."
-                    )
-                self._logger.debug(f"Project stats: {project_status}")
-                self._logger.debug(f"Container healths: {unhealthy}")
-
-            poll += 1
-            if poll >= config.failure_threshold:
-                if unhealthy:
-                    self._logger.info(f"Unhealthy containers: {unhealthy}")
-                return Output(
-                    success=False,
-                    message=f"Failed to start services in {compose_file} "
-                    f"within {config.total_duration} seconds.",
-                )
-
-            time.sleep(config.period_seconds)
-        running_containers: list[Container] = docker_client.compose.ps()
-        container_names = list(map(lambda l: l.name, running_containers))
+        if not readiness.ready:
+            if readiness.unhealthy:
+                self._logger.info(f"Unhealthy containers: {readiness.unhealthy}")
+            return Output(
+                success=False,
+                message=f"Failed to start services in {compose_file} "
+                f"within {config.total_duration} seconds."
+                if not readiness.failed
+                else f"Failed to start services in {compose_file}: {readiness.failed}",
+            )
 
+        container_names = [container.name for container in containers]
         return Output(success=True, message=f"Started {', '.join(container_names)}")
+
+    def _await_readiness(
+        self,
+        docker_client: DockerClient,
+        containers: list[Container],
+        readiness: ComposeReadiness,
+        started_at: datetime,
+        config: DockerComposeConfig,
+    ) -> None:
+        """
+        Follows the docker events of the containers, starting at the time they were started so that no health status
+        transition is missed, until all of them are ready, one of them stopped or `config.total_duration` passed.
+        """
+        labels = containers[0].config.labels or {}
+        events = docker_client.system.events(
+            since=started_at,
+            until=started_at + timedelta(seconds=config.total_duration),
+            filters={
+                "type": "container",
+                "label": f"{COMPOSE_PROJECT_LABEL}={labels.get(COMPOSE_PROJECT_LABEL)}",
+            },
+        )
+        try:
+            for event in events:
+                readiness.process(event)
+                self._logger.debug(f"Container event: {event.action}")
+                if readiness.ready or readiness.failed:
+                    return
+        finally:
+            if isinstance(events, Generator):
+                events.close()
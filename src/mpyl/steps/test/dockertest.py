@@ -10,12 +10,38 @@ Otherwise, building of the container would stop and the test results would not b
 The test results need to be written to a folder named `$WORKDIR/target/test-reports/` for
 `TestDocker.extract_test_results` to find and extract them.
 
+### Combined build and test
+
+When `docker.build.combineTestTarget` is enabled, the `tester` target is built in the same BuildKit session as the
+`builder` target by `mpyl.steps.build.docker_build.BuildDocker`. The test reports are exported from the
+`tester` stage straight to the host, so this step only has to collect them. No `-test` image is built and no
+container is created. If the reports have not been exported, for example because the build stage was cached, only the
+test reports are exported.
+
+### Sharding
+
+When `test.shards` is set in the `project.yml`, the `tester` target is built once per shard, concurrently, with the
+build arguments
+
+- `MPYL_TEST_SHARD_INDEX` and `MPYL_TEST_SHARD_COUNT`, which are always set
+- `MPYL_TEST_SUITES`, the space separated names of the suites assigned to the shard, balanced on their durations in
+the previous run
+- `MPYL_TEST_KNOWN_SUITES`, the names of all suites with a recorded duration
+
+The suite lists are a hint: the durations only cover the suites that ran before. The Dockerfile has to run the suites
+in `MPYL_TEST_SUITES`, and spread the suites that are not in `MPYL_TEST_KNOWN_SUITES`, like new ones, over the shards
+on the shard index, for example with `cksum` of the suite name modulo `MPYL_TEST_SHARD_COUNT`. Without recorded
+durations both lists are empty and all suites are spread that way.
+The test reports of all shards are merged into `$WORKDIR/target/test-reports/`. Sharding is not applied when
+`docker.build.combineTestTarget` is enabled.
 
 """
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from logging import Logger
 from pathlib import Path
-from typing import cast
+from typing import Optional, cast
 
 from python_on_whales import Container
 
@@ -33,30 +59,59 @@ from ..models import (
 from ...project import Project
 from ...utilities.docker import (
     DockerConfig,
+    DockerCacheExportMode,
+    TEST_IMAGE_SUFFIX,
     build,
+    build_with_test_reports,
     docker_image_tag,
     docker_file_path,
     docker_copy,
     remove_container,
     create_container,
+    docker_registry_path,
     push_to_registry,
     registry_for_project,
     get_default_build_args,
     full_image_path_for_project,
+    prepare_build_context,
+    CONTEXT_BYTES_METRIC,
 )
+from ...utilities.docker.push_queue import push_queue
+from ...utilities.logging import LogCapture
 from ...utilities.junit import (
-    to_test_suites,
-    sum_suites,
+    TIMINGS_FILE_NAME,
+    summarize_test_results,
     JunitTestSpec,
+    read_suite_timings,
+    record_suite_timings,
+    suite_summaries,
+    to_shards,
 )
 
+DOCKER_TEST_STEP_NAME = "Docker Test"
+
+
+def to_shard_build_args(
+    timings: dict[str, float], shard_count: int
+) -> list[dict[str, str]]:
+    """:return: the build arguments that tell the test target of every shard which suites to run"""
+    return [
+        {
+            "MPYL_TEST_SHARD_INDEX": str(index),
+            "MPYL_TEST_SHARD_COUNT": str(shard_count),
+            "MPYL_TEST_SUITES": " ".join(shard),
+            "MPYL_TEST_KNOWN_SUITES": " ".join(sorted(timings)),
+        }
+        for index, shard in enumerate(to_shards(timings, shard_count))
+    ]
+
 
 class TestDocker(Step):
     def __init__(self, logger: Logger) -> None:
         super().__init__(
             logger=logger,
             meta=Meta(
-                name="Docker Test",
+                name=DOCKER_TEST_STEP_NAME,
                 description="Test docker image",
                 version="0.0.1",
                 stage=STAGE_NAME,
@@ -67,18 +122,13 @@ class TestDocker(Step):
             after=IntegrationTestAfter(logger),
         )
 
-    def execute(  # pylint: disable=too-many-arguments, too-many-locals
-        self, step_input: Input
-    ) -> Output:
+    def execute(self, step_input: Input) -> Output:
         docker_config = DockerConfig.from_dict(step_input.run_properties.config)
         test_target = docker_config.test_target
         if not test_target:
             raise ValueError("docker.testTarget must be specified")
 
-        tag = docker_image_tag(step_input) + "-test"
         project = step_input.project_execution.project
-        dockerfile = docker_file_path(project=project, docker_config=docker_config)
-        docker_registry_config = registry_for_project(docker_config, project)
 
         build_args: dict[str, str] = get_default_build_args(
             full_image_path_for_project(step_input),
@@ -92,14 +142,48 @@ class TestDocker(Step):
                 for arg in build_config.args.credentials
             }
 
+        context_bytes = prepare_build_context(self._logger, project, docker_config)
+        if docker_config.combine_test_target:
+            output = self._test_in_build_session(step_input, docker_config, build_args)
+        elif project.test_shards > 1:
+            output = self._test_in_sharded_test_images(
+                step_input, docker_config, build_args, test_target
+            )
+        else:
+            output = self._test_in_test_image(
+                step_input, docker_config, build_args, test_target
+            )
+
+        if context_bytes is not None:
+            output.metrics = {CONTEXT_BYTES_METRIC: context_bytes}
+        return output
+
+    def _test_in_test_image(
+        self,
+        step_input: Input,
+        docker_config: DockerConfig,
+        build_args: dict[str, str],
+        test_target: str,
+    ) -> Output:
+        tag = docker_image_tag(step_input) + TEST_IMAGE_SUFFIX
+        project = step_input.project_execution.project
+        docker_registry_config = registry_for_project(docker_config, project)
+        versioning = (
+            None if step_input.dry_run else step_input.run_properties.versioning
+        )
+        log_capture = LogCapture(
+            self._logger, project.target_path / f"{STAGE_NAME}.log"
+        )
         success = build(
             logger=self._logger,
             root_path=docker_config.root_folder,
-            file_path=dockerfile,
+            file_path=docker_file_path(project=project, docker_config=docker_config),
             image_tag=tag,
             target=test_target,
             registry_config=docker_registry_config,
             build_args=build_args,
+            versioning=versioning,
+            log_capture=log_capture,
         )
 
         if success:
@@ -107,33 +191,166 @@ class TestDocker(Step):
             artifact = self.extract_test_results(
                 self._logger, project, container, step_input
             )
-            docker_registry = registry_for_project(docker_config, project)
-            if not step_input.dry_run and docker_registry.cache_from_registry:
-                push_to_registry(self._logger, docker_registry, tag)
+            if (
+                not step_input.dry_run
+                and docker_registry_config.cache_from_registry
+                and docker_registry_config.cache_export_mode
+                == DockerCacheExportMode.INLINE
+            ):
+                if docker_config.push.background:
+                    push_queue(docker_config.push.max_concurrent).submit(
+                        self._logger,
+                        project.name,
+                        docker_registry_path(docker_registry_config, tag),
+                        lambda: push_to_registry(
+                            self._logger, docker_registry_config, tag
+                        ),
+                        required=False,
+                    )
+                else:
+                    push_to_registry(self._logger, docker_registry_config, tag)
 
-            junit_spec: JunitTestSpec = cast(JunitTestSpec, artifact.spec)
+            output = self._to_output(project, artifact)
+            remove_container(self._logger, container)
+        else:
+            output = self._no_results_output(project, log_capture)
 
-            summary = sum_suites(
-                to_test_suites(
-                    Path(junit_spec.test_output_path)  # pylint: disable=no-member
-                )
-            )
-            junit_spec.test_results_summary = summary
+        return output
+
+    def _test_in_sharded_test_images(
+        self,
+        step_input: Input,
+        docker_config: DockerConfig,
+        build_args: dict[str, str],
+        test_target: str,
+    ) -> Output:
+        project = step_input.project_execution.project
+        shards = to_shard_build_args(
+            read_suite_timings(project.target_path / TIMINGS_FILE_NAME),
+            project.test_shards,
+        )
+        tag = docker_image_tag(step_input) + TEST_IMAGE_SUFFIX
+        versioning = (
+            None if step_input.dry_run else step_input.run_properties.versioning
+        )
+        shard_reports_path = project.target_path / "test-reports"
 
-            output = Output(
-                success=summary.is_success,
-                message=f"Tests results produced for {project.name} ({summary})",
-                produced_artifact=artifact,
+        def run_shard(index: int) -> Optional[LogCapture]:
+            shard_tag = f"{tag}-shard-{index}"
+            log_capture = LogCapture(
+                self._logger, project.target_path / f"{STAGE_NAME}-shard-{index}.log"
+            )
+            success = build(
+                logger=self._logger,
+                root_path=docker_config.root_folder,
+                file_path=docker_file_path(
+                    project=project, docker_config=docker_config
+                ),
+                image_tag=shard_tag,
+                target=test_target,
+                registry_config=registry_for_project(docker_config, project),
+                build_args=build_args | shards[index],
+                versioning=versioning,
+                log_capture=log_capture,
+            )
+            if not success:
+                return log_capture
+            container = create_container(self._logger, shard_tag)
+            docker_copy(
+                logger=self._logger,
+                container_path=f"{project.test_report_path}/.",
+                dst_path=shard_reports_path / f"shard-{index}",
+                container=container,
             )
             remove_container(self._logger, container)
-        else:
-            output = Output(
-                success=False,
-                message=f"Tests failed to run for {project.name}. No test results have been recorded.",
-                produced_artifact=None,
+            return None
+
+        self._logger.info(
+            f"Running the tests of {project.name} in {len(shards)} shards"
+        )
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            failed = [log for log in executor.map(run_shard, range(len(shards))) if log]
+        if failed:
+            return self._no_results_output(project, failed[0])
+
+        shutil.rmtree(project.test_report_path, ignore_errors=True)
+        project.test_report_path.mkdir(parents=True)
+        for report in sorted(shard_reports_path.glob("shard-*/*.xml")):
+            shutil.move(
+                report, project.test_report_path / f"{report.parent.name}-{report.name}"
             )
+        shutil.rmtree(shard_reports_path, ignore_errors=True)
 
-        return output
+        return self._to_output(
+            project, self.to_test_results_artifact(project, step_input)
+        )
+
+    def _test_in_build_session(
+        self, step_input: Input, docker_config: DockerConfig, build_args: dict[str, str]
+    ) -> Output:
+        project = step_input.project_execution.project
+        versioning = (
+            None if step_input.dry_run else step_input.run_properties.versioning
+        )
+        if not project.test_report_path.is_dir():
+            self._logger.info(
+                f"No test reports exported for {project.name} during build, exporting them now"
+            )
+            log_capture = LogCapture(
+                self._logger, project.target_path / f"{STAGE_NAME}.log"
+            )
+            success = build_with_test_reports(
+                logger=self._logger,
+                root_path=docker_config.root_folder,
+                file_path=docker_file_path(
+                    project=project, docker_config=docker_config
+                ),
+                image_tag=docker_image_tag(step_input),
+                target=cast(str, docker_config.build_target),
+                test_target=cast(str, docker_config.test_target),
+                test_report_path=project.test_report_path,
+                registry_config=registry_for_project(docker_config, project),
+                build_args=build_args,
+                include_image=False,
+                versioning=versioning,
+                log_capture=log_capture,
+            )
+            if not success:
+                return self._no_results_output(project, log_capture)
+
+        return self._to_output(
+            project, self.to_test_results_artifact(project, step_input)
+        )
+
+    @staticmethod
+    def _to_output(project: Project, artifact: Artifact) -> Output:
+        junit_spec: JunitTestSpec = cast(JunitTestSpec, artifact.spec)
+
+        summary = summarize_test_results(
+            Path(junit_spec.test_output_path)  # pylint: disable=no-member
+        )
+        junit_spec.test_results_summary = summary
+        if project.test_shards > 1:
+            record_suite_timings(
+                project.target_path / TIMINGS_FILE_NAME,
+                suite_summaries(Path(junit_spec.test_output_path)),
+                complete=summary.is_success,
+            )
+
+        return Output(
+            success=summary.is_success,
+            message=f"Tests results produced for {project.name} ({summary})",
+            produced_artifact=artifact,
+        )
+
+    @staticmethod
+    def _no_results_output(project: Project, log_capture: LogCapture) -> Output:
+        return Output(
+            success=False,
+            message=f"Tests failed to run for {project.name}. No test results have been recorded.\n"
+            f"{log_capture.tail_message()}",
+            produced_artifact=None,
+        )
 
     @staticmethod
     def extract_test_results(
@@ -147,6 +364,10 @@ class TestDocker(Step):
             container=container,
         )
 
+        return TestDocker.to_test_results_artifact(project, step_input)
+
+    @staticmethod
+    def to_test_results_artifact(project: Project, step_input: Input) -> Artifact:
         return input_to_artifact(
             artifact_type=ArtifactType.JUNIT_TESTS,
             step_input=step_input,
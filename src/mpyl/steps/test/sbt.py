@@ -1,22 +1,49 @@
-"""A step to compile and run tests for an SBT project"""
+"""A step to compile and run tests for an SBT project
+
+When `sbt.batchProjects` is enabled, the tests of all projects in the test stage that use this step are run in a
+single sbt invocation, the first time the step is executed. Projects with a `docker-compose-test.yml` are excluded
+from the batch, because their containers are only started right before their own tests.
+
+When `test.shards` is set in the `project.yml`, the test suites of the project are split into that many shards, which
+run concurrently in separate forks of the sbt build. The shards are balanced on the durations of the suites in the
+previous run, which are kept in `test-timings.json` in the `.mpyl` folder of the project. Sharded projects are not
+batched.
+
+When `sbt.testImpact.enabled` is set, the tests of a pull request are limited to the suites that are impacted by the
+changed files, as described in `mpyl.utilities.sbt.impact`. The map it uses is recorded after every full run with
+coverage. Projects of which only a selection of the suites runs are not batched.
+"""
 from logging import Logger
 from pathlib import Path
-from typing import cast
+from typing import Optional, cast
 
 from . import STAGE_NAME
 from .after_test import IntegrationTestAfter
 from .before_test import IntegrationTestBefore
 from .. import Input, Output, Step
-from ..models import Artifact, input_to_artifact
+from ..models import Artifact, RunProperties, input_to_artifact
 from ...project import Project
+from ...project_execution import ProjectExecution
 from ...steps import Meta, ArtifactType
 from ...utilities.junit import (
-    to_test_suites,
-    sum_suites,
+    TIMINGS_FILE_NAME,
+    summarize_test_results,
     JunitTestSpec,
+    read_suite_timings,
+    record_suite_timings,
+    suite_summaries,
+    to_shards,
 )
-from ...utilities.sbt import SbtConfig
-from ...utilities.subprocess import custom_check_output
+from ...utilities.sbt import (
+    SbtBatchResult,
+    SbtBatchResults,
+    SbtConfig,
+    run_sbt,
+    run_sbt_batch,
+    to_batch_command,
+    to_sharding_commands,
+)
+from ...utilities.sbt.impact import TestImpactConfig, record_impact_map, select_suites
 
 
 class TestSbt(Step):
@@ -36,18 +63,45 @@ class TestSbt(Step):
             before=IntegrationTestBefore(logger),
             after=IntegrationTestAfter(logger),
         )
+        self._batch_results = SbtBatchResults()
 
-    def _test(self, step_input: Input, sbt_config: SbtConfig) -> Output:
-        command_test = self._construct_sbt_command(
-            project_name=step_input.project_execution.name, config=sbt_config
-        )
-        run_outcome = custom_check_output(
-            logger=self._logger, command=command_test, use_print=True
-        )
+    def _test(
+        self, step_input: Input, sbt_config: SbtConfig, suites: Optional[list[str]]
+    ) -> Output:
+        project = step_input.project_execution.project
+        if self._can_batch(
+            step_input.project_execution, step_input.run_properties, sbt_config
+        ):
+            success = self._batch_result(step_input, sbt_config).succeeded_for(
+                project.name
+            )
+        else:
+            if suites:
+                self._logger.info(
+                    f"Running {len(suites)} suites of {project.name} that are impacted by the changes"
+                )
+            command_test = self._construct_sbt_command(
+                project_name=step_input.project_execution.name,
+                config=sbt_config,
+                shards=self._to_shards(project),
+                suites=suites,
+            )
+            success = run_sbt(
+                self._logger, sbt_config, sbt_config.test_with_client, command_test
+            ).success
+        if (
+            suites is None
+            and sbt_config.test_with_coverage
+            and TestImpactConfig.from_config(step_input.run_properties.config).enabled
+            and record_impact_map(project) is None
+        ):
+            self._logger.warning(
+                f"No test names found in the coverage data of {project.name}, the test impact map is not updated"
+            )
         artifact = self._extract_test_report(
             step_input.project_execution.project, step_input
         )
-        if not run_outcome.success:
+        if not success:
             return Output(
                 success=False,
                 message=f"Tests without coverage failed to run for {step_input.project_execution.name}",
@@ -59,12 +113,22 @@ class TestSbt(Step):
         project = step_input.project_execution
         sbt_config = SbtConfig.from_config(config=step_input.run_properties.config)
         self._logger.debug(f"Config {sbt_config}")
-        test_result = self._test(step_input=step_input, sbt_config=sbt_config)
+        suites = self._select_suites(project, step_input.run_properties)
+        test_result = self._test(
+            step_input=step_input, sbt_config=sbt_config, suites=suites
+        )
 
         if test_result.produced_artifact:
             spec = cast(JunitTestSpec, test_result.produced_artifact.spec)
-            suite = to_test_suites(Path(spec.test_output_path))
-            summary = sum_suites(suite)
+            summary = summarize_test_results(Path(spec.test_output_path))
+            if project.project.test_shards > 1:
+                record_suite_timings(
+                    project.project.target_path / TIMINGS_FILE_NAME,
+                    suite_summaries(Path(spec.test_output_path)),
+                    complete=suites is None
+                    and test_result.success
+                    and summary.is_success,
+                )
             spec.test_results_summary = summary
             return Output(
                 success=test_result.success and summary.is_success,
@@ -74,15 +138,85 @@ class TestSbt(Step):
 
         return test_result
 
+    def _batch_result(self, step_input: Input, config: SbtConfig) -> SbtBatchResult:
+        """Tests all projects of the stage that have not been tested yet, and returns the outcome for this one"""
+        name = step_input.project_execution.name
+        batch_results = self._batch_results.for_run(step_input.run_properties.run_plan)
+        if name not in batch_results:
+            names = [name] + [
+                execution.name
+                for execution in step_input.run_properties.run_plan.get_executions_for_step(
+                    STAGE_NAME, self.meta.name
+                )
+                if execution.name not in batch_results
+                and execution.name != name
+                and self._can_batch(execution, step_input.run_properties, config)
+            ]
+            commands = to_batch_command(names, "test")
+            if config.test_with_coverage:
+                commands = ["coverageOn"] + commands + ["coverageOff"]
+            result = run_sbt_batch(
+                logger=self._logger,
+                config=config,
+                client_mode=config.test_with_client,
+                project_names=names,
+                sbt_commands=commands,
+                task_name=f"sbt {STAGE_NAME}",
+            )
+            batch_results |= {project_name: result for project_name in names}
+        return batch_results.pop(name)
+
+    @staticmethod
+    def _select_suites(
+        execution: ProjectExecution, run_properties: RunProperties
+    ) -> Optional[list[str]]:
+        return select_suites(
+            config=TestImpactConfig.from_config(run_properties.config),
+            project=execution.project,
+            changed_files=execution.changed_files,
+            versioning=run_properties.versioning,
+            main_branch=run_properties.config["vcs"]["git"]["mainBranch"],
+        )
+
+    @staticmethod
+    def _can_batch(
+        execution: ProjectExecution, run_properties: RunProperties, config: SbtConfig
+    ) -> bool:
+        return (
+            config.batch_projects
+            and not execution.project.test_containers_path.exists()
+            and execution.project.test_shards == 1
+            and TestSbt._select_suites(execution, run_properties) is None
+        )
+
+    def _to_shards(self, project: Project) -> Optional[list[list[str]]]:
+        if project.test_shards == 1:
+            return None
+        shards = to_shards(
+            read_suite_timings(project.target_path / TIMINGS_FILE_NAME),
+            project.test_shards,
+        )
+        self._logger.info(
+            f"Running the tests of {project.name} in {len(shards)} shards of "
+            f"{', '.join(str(len(shard)) for shard in shards)} known suites"
+        )
+        return shards
+
     @staticmethod
-    def _construct_sbt_command(project_name: str, config: SbtConfig):
+    def _construct_sbt_command(
+        project_name: str,
+        config: SbtConfig,
+        shards: Optional[list[list[str]]] = None,
+        suites: Optional[list[str]] = None,
+    ):
         command = list(
             filter(
                 None,
                 [
                     f"project {project_name}",
+                    *(to_sharding_commands(shards) if shards else []),
                     "coverageOn" if config.test_with_coverage else None,
-                    "test",
+                    f"testOnly {' '.join(suites)}" if suites else "test",
                     "coverageOff" if config.test_with_coverage else None,
                 ],
             )
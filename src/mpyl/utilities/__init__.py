@@ -1,8 +1,14 @@
 """Common utility functions"""
 
+import functools
+import os
+import uuid
+from pathlib import Path
 from typing import Optional
 
-from ..constants import PR_NUMBER_PLACEHOLDER
+from git import Git, GitCommandError
+
+from ..constants import PR_NUMBER_PLACEHOLDER, RUN_ARTIFACTS_FOLDER
 
 
 def replace_pr_number(original_value: Optional[str], pr_number: Optional[int]):
@@ -11,3 +17,35 @@ def replace_pr_number(original_value: Optional[str], pr_number: Optional[int]):
         if original_value and pr_number
         else original_value
     )
+
+
+def write_if_changed(file_path: Path, content: str) -> bool:
+    """
+    Replaces the file atomically, so that a reader never sees a partially written file.
+    :return: whether the content of the file changed
+    """
+    if file_path.exists() and file_path.read_text("utf-8") == content:
+        return False
+    os.makedirs(file_path.parent, exist_ok=True)
+    temporary_file = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}")
+    temporary_file.write_text(content, "utf-8")
+    os.replace(temporary_file, file_path)
+    return True
+
+
+@functools.lru_cache
+def _repository_root(working_directory: Path) -> Path:
+    try:
+        return Path(Git(working_directory).rev_parse("--show-toplevel"))
+    except GitCommandError:
+        return working_directory
+
+
+def repository_root() -> Path:
+    """:return: the root of the git repository of the working directory, or the working directory if there is none"""
+    return _repository_root(Path.cwd())
+
+
+def run_artifacts_folder() -> Path:
+    """:return: the folder with the artifacts of the run, at the root of the repository"""
+    return repository_root() / RUN_ARTIFACTS_FOLDER
@@ -1,40 +1,74 @@
 """Docker related utility methods"""
 
+import base64
 import json
 import logging
+import os
+import re
 import shlex
 import shutil
-from dataclasses import dataclass
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 from logging import Logger
 from pathlib import Path
 from traceback import print_exc
-from typing import Dict, Optional, Iterator, cast, Union
+from typing import Any, Dict, Optional, Iterator, cast, Union
 
 import boto3
+import requests
 from botocore.config import Config
 from python_on_whales import docker, Image, Container, DockerException
 from python_on_whales.exceptions import NoSuchContainer
 from ruamel.yaml import yaml_object, YAML
 
-from ..logging import try_parse_ansi
+from ..logging import LogCapture
+from ...constants import RUN_ARTIFACTS_FOLDER
 from ...project import Project
-from ...steps.models import Input, ArtifactSpec
+from ...steps.build import STAGE_NAME as BUILD_STAGE_NAME
+from ...steps.models import Input, ArtifactSpec, VersioningProperties
 
 yaml = YAML()
 
+DOCKER_IGNORE_DEFAULT = ["**/target/*", f"**/{RUN_ARTIFACTS_FOLDER}/*"]
+DOCKER_IGNORE_EXCLUDED_FOLDERS = {"target", RUN_ARTIFACTS_FOLDER}
+CONTEXT_BYTES_METRIC = "docker_context_bytes"
+CACHE_TAG_PREFIX = "cache-"
+TEST_IMAGE_SUFFIX = "-test"
+CONTENT_TAG_PREFIX = "content-"
+LOCAL_REGISTRY_HOSTS = {"localhost", "127.0.0.1"}
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+MANIFEST_MEDIA_TYPES = [
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+]
+
+IMAGE_BAKE_TARGET = "image"
+TESTER_BAKE_TARGET = "tester"
+TEST_REPORTS_BAKE_TARGET = "test-reports"
+
 
 @yaml_object(yaml)
 @dataclass
 class DockerImageSpec(ArtifactSpec):
     yaml_tag = "!DockerImageSpec"
     image: str
+    content_image: Optional[str] = None
+    """Content-addressed tag of the image, that is pushed alongside `image`"""
+    in_registry: bool = False
+    """The registry already holds `content_image`, so `image` only needs to be added as a tag"""
 
 
 @dataclass(frozen=True)
 class DockerComposeConfig:
     period_seconds: int
     failure_threshold: int
+    share_stacks: bool = False
+    """Share the containers of identical compose files between projects, see `mpyl.utilities.docker.compose`"""
 
     @property
     def total_duration(self):
@@ -48,6 +82,7 @@ class DockerComposeConfig:
         return DockerComposeConfig(
             period_seconds=int(compose_config["periodSeconds"]),
             failure_threshold=int(compose_config["failureThreshold"]),
+            share_stacks=compose_config.get("shareStacks", False),
         )
 
 
@@ -61,8 +96,15 @@ class DockerCacheConfig:
         return DockerCacheConfig(config["to"], config["from"])
 
 
+class DockerCacheExportMode(Enum):
+    INLINE = "inline"
+    """The cache is embedded in the pushed image. Only the layers of the final stage are cached."""
+    MAX = "max"
+    """The cache of all stages is exported to dedicated cache tags. Requires a `docker-container` builder."""
+
+
 @dataclass(frozen=True)
-class DockerRegistryConfig:
+class DockerRegistryConfig:  # pylint: disable=too-many-instance-attributes
     host_name: str
     organization: Optional[str]
     user_name: str
@@ -71,6 +113,9 @@ class DockerRegistryConfig:
     region: Optional[str]
     cache_from_registry: bool
     custom_cache_config: Optional[DockerCacheConfig]
+    cache_export_mode: DockerCacheExportMode = DockerCacheExportMode.INLINE
+    cache_fallback_branches: list[str] = field(default_factory=lambda: ["main"])
+    """Branches of which the cache is used if there is no cache for the current run or its target branch"""
 
     @staticmethod
     def from_dict(config: dict):
@@ -89,11 +134,47 @@ class DockerRegistryConfig:
                     if "custom" in cache_config
                     else None
                 ),
+                cache_export_mode=DockerCacheExportMode(
+                    cache_config.get(
+                        "exportMode",
+                        DockerCacheExportMode.INLINE.value,  # pylint: disable=no-member
+                    )
+                ),
+                cache_fallback_branches=cache_config.get("fallbackBranches", ["main"]),
             )
         except KeyError as exc:
             raise KeyError(f"Docker config could not be loaded from {config}") from exc
 
 
+@dataclass(frozen=True)
+class DockerContextConfig:
+    minimal: bool
+    """Only send the project, its build dependencies and the shared folders to the docker daemon"""
+    shared_folders: list[str]
+    """Folders, relative to the root folder, that are part of the build context of every project"""
+
+    @staticmethod
+    def from_dict(config: dict):
+        return DockerContextConfig(
+            minimal=config.get("minimal", False),
+            shared_folders=config.get("sharedFolders", []),
+        )
+
+
+@dataclass(frozen=True)
+class DockerPushConfig:
+    background: bool
+    """Push images in the background, while the run continues"""
+    max_concurrent: int
+
+    @staticmethod
+    def from_dict(config: dict):
+        return DockerPushConfig(
+            background=config.get("background", False),
+            max_concurrent=config.get("maxConcurrent", 2),
+        )
+
+
 @dataclass(frozen=True)
 class DockerConfig:
     default_registry: str
@@ -102,6 +183,14 @@ class DockerConfig:
     build_target: Optional[str]
     test_target: Optional[str]
     docker_file_name: str
+    combine_test_target: bool = False
+    content_tags: bool = False
+    context: DockerContextConfig = field(
+        default_factory=lambda: DockerContextConfig(minimal=False, shared_folders=[])
+    )
+    push: DockerPushConfig = field(
+        default_factory=lambda: DockerPushConfig(background=False, max_concurrent=2)
+    )
 
     @staticmethod
     def from_dict(config: dict):
@@ -115,6 +204,10 @@ class DockerConfig:
                 build_target=build_config.get("buildTarget", None),
                 test_target=build_config.get("testTarget", None),
                 docker_file_name=build_config["dockerFileName"],
+                combine_test_target=build_config.get("combineTestTarget", False),
+                content_tags=build_config.get("contentTags", False),
+                context=DockerContextConfig.from_dict(build_config.get("context", {})),
+                push=DockerPushConfig.from_dict(config["docker"].get("push", {})),
             )
         except KeyError as exc:
             raise KeyError(f"Docker config could not be loaded from {config}") from exc
@@ -144,22 +237,22 @@ def stream_docker_logging(
     generator: Union[Iterator[str], Iterator[tuple[str, bytes]]],
     task_name: str,
     level=logging.INFO,
+    log_capture: Optional[LogCapture] = None,
 ) -> list[str]:
-    copied_logs = []
-
-    while True:
-        try:
-            next_item = next(generator)
+    """
+    :param log_capture: captures the stream. By default, the log is written to a file named after `task_name`
+    :return: the tail of the log
+    """
+    with log_capture or LogCapture.for_task(logger, task_name, level=level) as capture:
+        for next_item in generator:
             log_line = (
                 next_item[1].decode(errors="replace")
                 if isinstance(next_item, tuple)
                 else next_item
             )
-            copied_logs.append(str(log_line))
-            logger.log(level, try_parse_ansi(str(log_line)))
-        except StopIteration:
-            logger.info(f"{task_name} complete.")
-            return copied_logs
+            capture.append(str(log_line))
+    logger.info(f"{task_name} complete.")
+    return capture.tail
 
 
 def docker_image_tag(step_input: Input) -> str:
@@ -220,6 +313,81 @@ def push_to_registry(
     docker.image.push(full_image_path, quiet=False)
 
 
+def retag_in_registry(
+    logger: Logger, docker_config: DockerRegistryConfig, source: str, target: str
+) -> None:
+    """Adds the tag `target` to the image `source` in the registry, without pulling or pushing any layers"""
+    source_path = docker_registry_path(docker_config, source)
+    target_path = docker_registry_path(docker_config, target)
+    login(logger=logger, registry_config=docker_config)
+    logger.info(f"Tagging {source_path} as {target_path}")
+    docker.buildx.imagetools.create(sources=[source_path], tags=[target_path])
+
+
+def _manifest_url(docker_config: DockerRegistryConfig, image_name: str) -> str:
+    host, repository_and_tag = docker_registry_path(docker_config, image_name).split(
+        "/", 1
+    )
+    repository, tag = repository_and_tag.rsplit(":", 1)
+    scheme = "http" if host.split(":")[0] in LOCAL_REGISTRY_HOSTS else "https"
+    return f"{scheme}://{host}/v2/{repository}/manifests/{tag}"
+
+
+def _bearer_token(docker_config: DockerRegistryConfig, challenge: str) -> Optional[str]:
+    parameters = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+    if "realm" not in parameters:
+        return None
+    response = requests.get(
+        parameters.pop("realm"),
+        params=parameters,
+        auth=(docker_config.user_name, docker_config.password),
+        timeout=10,
+    )
+    response.raise_for_status()
+    body = response.json()
+    return body.get("token", body.get("access_token"))
+
+
+def manifest_exists(
+    logger: Logger, docker_config: DockerRegistryConfig, image_name: str
+) -> bool:
+    """
+    Checks with a HEAD request on its manifest whether the registry holds `image_name`. Any failure to reach the
+    registry is logged and treated as a missing image, so that the image is built instead.
+    """
+    url = _manifest_url(docker_config, image_name)
+    headers = {"Accept": ", ".join(MANIFEST_MEDIA_TYPES)}
+    try:
+        if docker_config.provider == Provider.AWS.value:  # pylint: disable=no-member
+            authorization = _ecr_authorization(docker_config)
+            response = requests.head(
+                url,
+                headers=headers | {"Authorization": f"Basic {authorization}"},
+                timeout=10,
+            )
+        else:
+            auth = (docker_config.user_name, docker_config.password)
+            response = requests.head(url, headers=headers, auth=auth, timeout=10)
+            challenge = response.headers.get("WWW-Authenticate", "")
+            if response.status_code == 401 and challenge.startswith("Bearer"):
+                bearer = _bearer_token(docker_config, challenge)
+                response = requests.head(
+                    url,
+                    headers=headers | {"Authorization": f"Bearer {bearer}"},
+                    timeout=10,
+                )
+    except requests.RequestException as exc:
+        logger.warning(f"Could not look up {url}: {exc}")
+        return False
+
+    if response.status_code == 200:
+        logger.debug(f"Found manifest {url}")
+        return True
+    if response.status_code != 404:
+        logger.warning(f"Unexpected status {response.status_code} looking up {url}")
+    return False
+
+
 def registry_for_project(
     docker_config: DockerConfig, project: Project
 ) -> DockerRegistryConfig:
@@ -237,6 +405,92 @@ def docker_file_path(project: Project, docker_config: DockerConfig):
     return f"{project.deployment_path}/{docker_config.docker_file_name}"
 
 
+def build_context_paths(project: Project, docker_config: DockerConfig) -> list[str]:
+    """
+    :return: the paths, relative to `DockerConfig.root_folder`, that make up the minimal build context of
+    the project. These are the root path of the project, its dependencies for the build stage and the shared folders.
+    """
+    dependencies = (
+        project.dependencies.set_for_stage(BUILD_STAGE_NAME)
+        if project.dependencies
+        else set()
+    )
+    paths = {
+        os.path.relpath(path, docker_config.root_folder)
+        for path in [
+            str(project.root_path),
+            *dependencies,
+            *docker_config.context.shared_folders,
+        ]
+    }
+    return sorted(paths)
+
+
+def docker_ignore_contents(include_paths: list[str]) -> str:
+    """
+    :param include_paths: the paths to include in the build context. Everything else is ignored, unless the root
+    folder itself is included.
+    :return: the contents of a `.dockerignore` file that only lets `include_paths` through
+    """
+    allow_list = include_paths and "." not in include_paths
+    patterns = (
+        ["*"] + [f"!{path}" for path in include_paths] if allow_list else []
+    ) + DOCKER_IGNORE_DEFAULT
+    return "\n".join(patterns)
+
+
+def context_size(root_path: str, include_paths: list[str]) -> int:
+    """
+    :return: the number of bytes of the files under `include_paths` that are sent as build context
+    """
+    total = 0
+    for include_path in include_paths:
+        path = Path(root_path) / include_path
+        if path.is_file():
+            total += path.stat().st_size
+            continue
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names[:] = [
+                d for d in dir_names if d not in DOCKER_IGNORE_EXCLUDED_FOLDERS
+            ]
+            for file_name in file_names:
+                file_path = Path(dir_path) / file_name
+                if not file_path.is_symlink():
+                    total += file_path.stat().st_size
+    return total
+
+
+def prepare_build_context(
+    logger: Logger, project: Project, docker_config: DockerConfig
+) -> Optional[int]:
+    """
+    Writes the `.dockerignore` file that defines the build context of the project. If a minimal context is configured,
+    the ignore file is specific to the docker file of the project, so that concurrent builds of different projects
+    do not interfere with each other.
+
+    :return: the size of the build context in bytes if a minimal context is configured, None otherwise
+    """
+    if not docker_config.context.minimal:
+        with open(
+            Path(docker_config.root_folder) / ".dockerignore", "w+", encoding="utf-8"
+        ) as ignore_file:
+            ignore_file.write(docker_ignore_contents([]))
+        return None
+
+    include_paths = build_context_paths(project, docker_config)
+    ignore_file_path = Path(f"{docker_file_path(project, docker_config)}.dockerignore")
+    ignore_file_path.write_text(
+        f"# This file was generated by MPyL. DO NOT EDIT DIRECTLY.\n"
+        f"{docker_ignore_contents(include_paths)}",
+        encoding="utf-8",
+    )
+    size = context_size(docker_config.root_folder, include_paths)
+    logger.info(
+        f"Build context of {project.name} consists of {', '.join(include_paths)} ({size} bytes)"
+    )
+    return size
+
+
 def docker_copy(
     logger: Logger, container_path: str, dst_path: Path, container: Container
 ):
@@ -267,7 +521,103 @@ def docker_copy(
         raise exc
 
 
-def build(
+def cache_tag(name: str) -> str:
+    """
+    :param name: a branch name or run identifier
+    :return: the tag under which the build cache for `name` is exported
+    """
+    sanitized = re.sub(r"[^A-Za-z0-9_.-]", "-", name.removeprefix("origin/"))
+    return f"{CACHE_TAG_PREFIX}{sanitized}"[:128]
+
+
+def cache_chain(
+    registry_config: DockerRegistryConfig,
+    image_tag: str,
+    versioning: VersioningProperties,
+) -> list[str]:
+    """
+    The registry references from which the build cache is imported, in order of preference. The first one
+    is the reference to which the cache of this build is exported.
+
+    For pull requests the chain consists of the cache of the pull request itself, followed by that of the target
+    branch and the configured fallback branches. For other runs, the cache of the branch that is built comes first.
+    Images that are built for a variant of the run identifier, like the `-test` image, first try their own cache and
+    then fall back onto the cache of the regular image.
+
+    :param registry_config: the registry to which the cache is exported
+    :param image_tag: the tag of the image that is being built
+    :param versioning: the versioning properties of the run
+    :return: the list of cache references
+    """
+    image_name, _, tag = image_tag.partition(":")
+    variant = tag.removeprefix(versioning.identifier) if tag else ""
+    if versioning.pr_number:
+        names = [versioning.identifier] + (
+            [versioning.target_branch] if versioning.target_branch else []
+        )
+    else:
+        names = [versioning.branch or versioning.identifier]
+    names += registry_config.cache_fallback_branches
+
+    repository = docker_registry_path(registry_config, image_name)
+    variants = [variant, ""] if variant else [""]
+    refs = [
+        f"{repository}:{cache_tag(name + suffix)}"
+        for suffix in variants
+        for name in names
+    ]
+    return list(dict.fromkeys(refs))
+
+
+def cache_arguments(
+    registry_config: Optional[DockerRegistryConfig],
+    image_tag: str,
+    versioning: Optional[VersioningProperties] = None,
+) -> tuple[Union[str, list[dict[str, str]], None], Union[str, dict[str, str], None]]:
+    """
+    :param registry_config: optional docker config, used to determine what type of cache to use if any
+    :param image_tag: the tag of the image that is being built
+    :param versioning: the versioning properties of the run. Without them, no registry cache is used in
+    `DockerCacheExportMode.MAX`, e.g. for dry runs that should not push anything.
+    :return: the `--cache-from` and `--cache-to` arguments for docker buildx
+    """
+    if registry_config and registry_config.cache_from_registry:
+        if registry_config.cache_export_mode == DockerCacheExportMode.MAX:
+            if versioning is None:
+                return None, None
+            refs = cache_chain(registry_config, image_tag, versioning)
+            cache_to = {"type": "registry", "ref": refs[0], "mode": "max"}
+            aws = Provider.AWS.value  # pylint: disable=no-member
+            if registry_config.provider == aws:
+                cache_to |= {"image-manifest": "true", "oci-mediatypes": "true"}
+            return [{"type": "registry", "ref": ref} for ref in refs], cache_to
+
+        registry_path = docker_registry_path(registry_config, image_tag)
+        return f"type=registry,ref={registry_path}", "type=inline"
+    if registry_config and registry_config.custom_cache_config:
+        return (
+            registry_config.custom_cache_config.cache_from,
+            registry_config.custom_cache_config.cache_to,
+        )
+    return None, None
+
+
+def _to_buildx_options(
+    argument: Union[str, list[dict[str, str]], dict[str, str], None]
+) -> list[str]:
+    if argument is None:
+        return []
+    if isinstance(argument, str):
+        return [argument]
+    if isinstance(argument, dict):
+        argument = [argument]
+    return [
+        ",".join(f"{key}={value}" for key, value in option.items())
+        for option in argument
+    ]
+
+
+def build(  # pylint: disable=too-many-arguments
     logger: Logger,
     root_path: str,
     file_path: str,
@@ -275,6 +625,8 @@ def build(
     target: str,
     build_args: dict[str, str],
     registry_config: Optional[DockerRegistryConfig] = None,
+    versioning: Optional[VersioningProperties] = None,
+    log_capture: Optional[LogCapture] = None,
 ) -> bool:
     """
     :param logger: the logger
@@ -284,21 +636,13 @@ def build(
     :param target: the 'target' within the multi-stage docker image
     :param registry_config: optional docker config, used what type of cache to use if any
     :param build_args: build arguments to supply to docker build
+    :param versioning: the versioning properties of the run, used to determine the registry cache chain
+    :param log_capture: captures the build log, so that its tail can be reported when the build fails
     :return: True for success, False for failure
     """
     logger.info(f"Building docker image with {file_path} and target {target}")
 
-    if registry_config and registry_config.cache_from_registry:
-        registry_path = docker_registry_path(registry_config, image_tag)
-        cache_from = f"type=registry,ref={registry_path}"
-        cache_to = "type=inline"
-    elif registry_config and registry_config.custom_cache_config:
-        cache_from = registry_config.custom_cache_config.cache_from
-        cache_to = registry_config.custom_cache_config.cache_to
-    else:
-        cache_from = None
-        cache_to = None
-
+    cache_from, cache_to = cache_arguments(registry_config, image_tag, versioning)
     logger.debug(f"Building with cache from: {cache_from} {registry_config}")
 
     try:
@@ -314,7 +658,10 @@ def build(
         )
         if logs is not None and not isinstance(logs, Image):
             stream_docker_logging(
-                logger=logger, generator=logs, task_name=f"Build {file_path}:{target}"
+                logger=logger,
+                generator=logs,
+                task_name=f"Build {file_path}:{target}",
+                log_capture=log_capture,
             )
         logger.debug(logs)
         return True
@@ -331,22 +678,218 @@ def build(
         return False
 
 
-def login(logger: Logger, registry_config: DockerRegistryConfig) -> None:
-    logger.info(f"Logging in with user '{registry_config.user_name}'")
-    if registry_config.provider != Provider.AWS.value:  # pylint: disable=no-member
-        docker.login(
-            server=f"https://{registry_config.host_name}",
-            username=registry_config.user_name,
-            password=registry_config.password,
+def to_bake_definition(  # pylint: disable=too-many-arguments, too-many-locals
+    root_path: str,
+    file_path: str,
+    image_tag: str,
+    target: str,
+    test_target: str,
+    test_report_path: Path,
+    build_args: dict[str, str],
+    registry_config: Optional[DockerRegistryConfig] = None,
+    include_image: bool = True,
+    versioning: Optional[VersioningProperties] = None,
+) -> dict:
+    """
+    Creates a `docker buildx bake` definition that builds the image for `target` and runs the tests in `test_target`
+    within a single BuildKit session. The test reports are copied from `test_target` into an otherwise empty stage,
+    which is exported to `test_report_path` on the host with a local output.
+
+    :param root_path: the root path to which `docker_file_path` is relative
+    :param file_path: path to the docker file to be built
+    :param image_tag: the tag of the image
+    :param target: the 'target' within the multi-stage docker image that produces the runtime image
+    :param test_target: the 'target' within the multi-stage docker image that runs the tests
+    :param test_report_path: the path of the test reports, both within `test_target` and on the host
+    :param build_args: build arguments to supply to docker build
+    :param registry_config: optional docker config, used what type of cache to use if any
+    :param include_image: whether to also build the image for `target` or only export the test reports
+    :param versioning: the versioning properties of the run, used to determine the registry cache chain
+    :return: the bake definition, ready to be serialized to json
+    """
+    context = str(Path(root_path).absolute())
+    dockerfile = str(Path(file_path).absolute())
+
+    def dockerfile_target(docker_target: str, tag: str, export_cache: bool) -> dict:
+        cache_from, cache_to = cache_arguments(registry_config, tag, versioning)
+        definition: dict = {
+            "context": context,
+            "dockerfile": dockerfile,
+            "target": docker_target,
+            "args": build_args,
+        }
+        if cache_from:
+            definition["cache-from"] = _to_buildx_options(cache_from)
+        if cache_to and export_cache:
+            definition["cache-to"] = _to_buildx_options(cache_to)
+        return definition
+
+    report_path = str(test_report_path).strip("/")
+    max_cache = (
+        registry_config is not None
+        and registry_config.cache_export_mode == DockerCacheExportMode.MAX
+    )
+    targets: dict[str, dict] = {
+        TESTER_BAKE_TARGET: dockerfile_target(
+            test_target, f"{image_tag}{TEST_IMAGE_SUFFIX}", export_cache=max_cache
+        ),
+        TEST_REPORTS_BAKE_TARGET: {
+            "context": context,
+            "contexts": {TESTER_BAKE_TARGET: f"target:{TESTER_BAKE_TARGET}"},
+            "dockerfile-inline": f"FROM scratch\nCOPY --from={TESTER_BAKE_TARGET} /{report_path}/ /\n",
+            "output": [f"type=local,dest={Path(test_report_path).absolute()}"],
+        },
+    }
+    if include_image:
+        targets[IMAGE_BAKE_TARGET] = dockerfile_target(
+            target, image_tag, export_cache=True
+        ) | {
+            "tags": [image_tag],
+            "output": ["type=docker"],
+        }
+
+    return {
+        "group": {
+            "default": {
+                "targets": [name for name in targets if name != TESTER_BAKE_TARGET]
+            }
+        },
+        "target": targets,
+    }
+
+
+def build_with_test_reports(  # pylint: disable=too-many-arguments, too-many-locals
+    logger: Logger,
+    root_path: str,
+    file_path: str,
+    image_tag: str,
+    target: str,
+    test_target: str,
+    test_report_path: Path,
+    build_args: dict[str, str],
+    registry_config: Optional[DockerRegistryConfig] = None,
+    include_image: bool = True,
+    versioning: Optional[VersioningProperties] = None,
+    log_capture: Optional[LogCapture] = None,
+) -> bool:
+    """
+    Builds the runtime image and runs the tests in a single BuildKit session, exporting the test reports
+    straight to `test_report_path`. No test image is tagged and no container is needed to extract the reports.
+    See `to_bake_definition` and `build` for a description of the parameters.
+
+    :return: True for success, False for failure
+    """
+    logger.info(
+        f"Building docker image with {file_path}, target {target} and test target {test_target}"
+    )
+    shutil.rmtree(test_report_path, ignore_errors=True)
+    definition = to_bake_definition(
+        root_path=root_path,
+        file_path=file_path,
+        image_tag=image_tag,
+        target=target,
+        test_target=test_target,
+        test_report_path=test_report_path,
+        build_args=build_args,
+        registry_config=registry_config,
+        include_image=include_image,
+        versioning=versioning,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bake_file = Path(tmp_dir) / "docker-bake.json"
+        bake_file.write_text(json.dumps(definition), encoding="utf-8")
+        try:
+            logs = docker.buildx.bake(
+                targets=["default"], files=[bake_file], stream_logs=True
+            )
+            if logs is not None and not isinstance(logs, dict):
+                stream_docker_logging(
+                    logger=logger,
+                    generator=logs,
+                    task_name=f"Build {file_path}:{target},{test_target}",
+                    log_capture=log_capture,
+                )
+            return True
+        except DockerException as exc:
+            command = " ".join(exc.docker_command)
+            logger.warning(
+                f"Docker bake failed with command {command} and exit code {exc.return_code}"
+            )
+            return False
+
+
+@dataclass
+class RegistrySession:
+    """The login state of a registry, shared by all projects in a run"""
+
+    logged_in_until: Optional[datetime] = None
+    ecr_client: Optional[Any] = None
+    ecr_authorization: Optional[str] = None
+    """Base64 encoded `user:password` for the registry, as handed out by ECR"""
+    ecr_authorization_expires_at: Optional[datetime] = None
+    known_repositories: set[str] = field(default_factory=set)
+    lock: threading.RLock = field(default_factory=threading.RLock)
+
+    @staticmethod
+    def _is_valid(expires_at: Optional[datetime]) -> bool:
+        return (
+            expires_at is not None
+            and datetime.now(timezone.utc) < expires_at - TOKEN_REFRESH_MARGIN
         )
-    else:
-        docker.login_ecr(
-            aws_access_key_id=registry_config.user_name,
-            aws_secret_access_key=registry_config.password,
-            region_name=registry_config.region,
-            registry=registry_config.host_name,
+
+    @property
+    def is_logged_in(self) -> bool:
+        return self._is_valid(self.logged_in_until)
+
+    @property
+    def has_valid_ecr_authorization(self) -> bool:
+        return self._is_valid(self.ecr_authorization_expires_at)
+
+
+_registry_sessions: dict[str, RegistrySession] = {}
+_registry_sessions_lock = threading.Lock()
+
+
+def registry_session(registry_config: DockerRegistryConfig) -> RegistrySession:
+    with _registry_sessions_lock:
+        return _registry_sessions.setdefault(
+            registry_config.host_name, RegistrySession()
         )
-    logger.debug(f"Logged in as '{registry_config.user_name}'")
+
+
+def clear_registry_sessions() -> None:
+    """Forgets the logins of the current run, so that the next run logs in again"""
+    with _registry_sessions_lock:
+        _registry_sessions.clear()
+
+
+def login(logger: Logger, registry_config: DockerRegistryConfig) -> None:
+    """Logs in to the registry, unless this run already did and the login has not expired"""
+    session = registry_session(registry_config)
+    with session.lock:
+        if session.is_logged_in:
+            logger.debug(f"Already logged in to '{registry_config.host_name}'")
+            return
+
+        logger.info(f"Logging in with user '{registry_config.user_name}'")
+        if registry_config.provider != Provider.AWS.value:  # pylint: disable=no-member
+            docker.login(
+                server=f"https://{registry_config.host_name}",
+                username=registry_config.user_name,
+                password=registry_config.password,
+            )
+            session.logged_in_until = datetime.max.replace(tzinfo=timezone.utc)
+        else:
+            authorization = _ecr_authorization(registry_config)
+            user_name, password = base64.b64decode(authorization).decode().split(":", 1)
+            docker.login(
+                server=registry_config.host_name,
+                username=user_name,
+                password=password,
+            )
+            session.logged_in_until = session.ecr_authorization_expires_at
+        logger.debug(f"Logged in as '{registry_config.user_name}'")
 
 
 def create_container(logger: Logger, image_name: str) -> Container:
@@ -362,20 +905,43 @@ def remove_container(logger: Logger, container: Container) -> None:
     logger.info(f"Removed container {container.id}")
 
 
+def _ecr_client(registry_config: DockerRegistryConfig):
+    session = registry_session(registry_config)
+    with session.lock:
+        if session.ecr_client is None:
+            ecr_config = Config(
+                region_name=registry_config.region,
+                signature_version="v4",
+                retries={"max_attempts": 10, "mode": "standard"},
+            )
+            session.ecr_client = boto3.client(
+                "ecr",
+                config=ecr_config,
+                aws_access_key_id=registry_config.user_name,
+                aws_secret_access_key=registry_config.password,
+            )
+        return session.ecr_client
+
+
+def _ecr_authorization(registry_config: DockerRegistryConfig) -> str:
+    session = registry_session(registry_config)
+    with session.lock:
+        if not session.has_valid_ecr_authorization:
+            token = _ecr_client(registry_config).get_authorization_token()
+            authorization_data = token["authorizationData"][0]
+            session.ecr_authorization = authorization_data["authorizationToken"]
+            session.ecr_authorization_expires_at = authorization_data["expiresAt"]
+        return cast(str, session.ecr_authorization)
+
+
 def create_ecr_repo_if_needed(
     logger: Logger, registry_config: DockerRegistryConfig, repo: str
 ):
-    ecr_config = Config(
-        region_name=registry_config.region,
-        signature_version="v4",
-        retries={"max_attempts": 10, "mode": "standard"},
-    )
-    ecr_client = boto3.client(
-        "ecr",
-        config=ecr_config,
-        aws_access_key_id=registry_config.user_name,
-        aws_secret_access_key=registry_config.password,
-    )
+    session = registry_session(registry_config)
+    if repo.lower() in session.known_repositories:
+        return
+
+    ecr_client = _ecr_client(registry_config)
     try:
         ecr_client.describe_repositories(
             repositoryNames=[
@@ -391,3 +957,4 @@ def create_ecr_repo_if_needed(
             imageTagMutability="MUTABLE",
             encryptionConfiguration={"encryptionType": "AES256"},
         )
+    session.known_repositories.add(repo.lower())
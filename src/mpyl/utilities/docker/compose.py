@@ -0,0 +1,170 @@
+"""
+Docker compose stacks that are shared by the projects of a run. Projects with identical compose files, for example a
+database and a message broker, use a single stack that is started by the first of them and torn down in the
+background at the end of the stage. The stacks are identified by the hash of their compose file. A compose file that
+builds an image or refers to files next to it, like an `env_file`, the `file` of a config or secret, a relative volume
+or a `.env` file in its folder that is used for interpolation, is specific to its project. The folder of such a
+compose file is part of the hash. Tests usually connect to the containers on fixed host ports, so a stack is torn
+down before a stack with a different compose file that publishes any of the same ports is started.
+"""
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from logging import Logger
+from pathlib import Path
+from typing import Any, Iterator
+
+from python_on_whales import DockerClient, DockerException
+from ruamel.yaml import YAML
+
+COMPOSE_PROJECT_PREFIX = "mpyl-"
+FILE_KEYS = {"build", "env_file", "file", "label_file"}
+"""Keys of which the values are resolved relative to the folder of the compose file"""
+
+
+def _refers_to_files(value: Any) -> bool:
+    if isinstance(value, dict):
+        return not FILE_KEYS.isdisjoint(value) or any(
+            _refers_to_files(v) for v in value.values()
+        )
+    if isinstance(value, list):
+        return any(_refers_to_files(v) for v in value)
+    return isinstance(value, str) and value.startswith(("./", "../"))
+
+
+def compose_stack_key(compose_file: Path) -> str:
+    content = compose_file.read_bytes()
+    digest = hashlib.sha256(content)
+    if (compose_file.parent / ".env").exists() or _refers_to_files(
+        YAML(typ="safe").load(content)
+    ):
+        digest.update(str(compose_file.parent.resolve()).encode())
+    return digest.hexdigest()
+
+
+def _host_ports(published: str, protocol: str) -> Iterator[str]:
+    start, _, end = published.partition("-")
+    if start.isdigit() and end.isdigit():
+        for port in range(int(start), int(end) + 1):
+            yield f"{port}/{protocol}"
+    elif published:
+        yield f"{published}/{protocol}"
+
+
+def _published_ports(port: Any) -> Iterator[str]:
+    if isinstance(port, dict):
+        if "published" in port:
+            yield from _host_ports(str(port["published"]), port.get("protocol", "tcp"))
+        return
+    mapping, _, protocol = str(port).partition("/")
+    parts = mapping.rsplit(":", 2)
+    if len(parts) > 1:
+        yield from _host_ports(parts[-2], protocol or "tcp")
+
+
+def published_ports(compose_file: Path) -> frozenset[str]:
+    """:return: the host ports that the services of the compose file publish, like `5432/tcp`"""
+    services = (YAML(typ="safe").load(compose_file.read_bytes()) or {}).get(
+        "services"
+    ) or {}
+    return frozenset(
+        published
+        for service in services.values()
+        for port in (service or {}).get("ports") or []
+        for published in _published_ports(port)
+    )
+
+
+@dataclass
+class ComposeStack:
+    key: str
+    compose_file: Path
+    ports: frozenset[str] = frozenset()
+    """The host ports that the stack publishes"""
+    started: bool = False
+    """Containers have been created, which need to be torn down"""
+    ready: bool = False
+    """All containers are running and healthy, so the stack can be used by other projects"""
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    """Held while the stack is started, so that it is started only once"""
+
+    @property
+    def project_name(self) -> str:
+        return f"{COMPOSE_PROJECT_PREFIX}{self.key[:12]}"
+
+    def client(self) -> DockerClient:
+        return DockerClient(
+            compose_files=[self.compose_file], compose_project_name=self.project_name
+        )
+
+    def down(self, logger: Logger) -> None:
+        logger.debug(f"Stopping shared containers of {self.compose_file}")
+        try:
+            self.client().compose.down(remove_orphans=True)
+        except DockerException as exc:
+            logger.warning(f"Failed to stop {self.project_name}: {exc}")
+
+
+_stacks: dict[str, ComposeStack] = {}
+_teardowns: list[tuple[ComposeStack, threading.Thread]] = []
+_stacks_lock = threading.Lock()
+
+
+def shared_compose_stack(compose_file: Path) -> ComposeStack:
+    """:return: the stack of the current run for `compose_file`, which is created on first use, but not started"""
+    key = compose_stack_key(compose_file)
+    with _stacks_lock:
+        if key not in _stacks:
+            _stacks[key] = ComposeStack(
+                key, compose_file, published_ports(compose_file)
+            )
+        return _stacks[key]
+
+
+def release_conflicting_stacks(logger: Logger, stack: ComposeStack) -> None:
+    """Tears down the stacks that publish any of the host ports of `stack`, and waits until they are down"""
+    with _stacks_lock:
+        conflicting = [
+            other
+            for other in _stacks.values()
+            if other is not stack
+            and other.started
+            and not other.ports.isdisjoint(stack.ports)
+        ]
+        for other in conflicting:
+            del _stacks[other.key]
+        teardowns = [
+            teardown
+            for other, teardown in _teardowns
+            if not other.ports.isdisjoint(stack.ports)
+        ]
+    for other in conflicting:
+        logger.info(
+            f"Stopping {other.project_name}, which publishes ports of {stack.compose_file}"
+        )
+        other.down(logger)
+    for teardown in teardowns:
+        teardown.join()
+
+
+def stop_compose_stacks(logger: Logger) -> None:
+    """Tears down the started stacks in the background. Stacks that are needed again are started again."""
+    with _stacks_lock:
+        stacks = [stack for stack in _stacks.values() if stack.started]
+        _stacks.clear()
+        for stack in stacks:
+            teardown = threading.Thread(
+                target=stack.down, args=(logger,), name=f"compose-{stack.project_name}"
+            )
+            teardown.start()
+            _teardowns.append((stack, teardown))
+
+
+def close_compose_stacks(logger: Logger) -> None:
+    """Tears down the started stacks and waits for all teardowns of the run to complete"""
+    stop_compose_stacks(logger)
+    with _stacks_lock:
+        teardowns = list(_teardowns)
+        _teardowns.clear()
+    for _, teardown in teardowns:
+        teardown.join()
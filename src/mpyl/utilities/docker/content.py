@@ -0,0 +1,83 @@
+"""
+Content-addressed image tags. An image that is built from the same committed files, with the same docker file,
+target and build arguments, gets the same tag, so that a registry that already holds it does not need a new build.
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from git import GitCommandError, InvalidGitRepositoryError, Repo
+
+from . import (
+    CONTENT_TAG_PREFIX,
+    DockerConfig,
+    build_context_paths,
+    docker_file_path,
+)
+from ...project import Project
+from ...steps.models import Input
+
+
+def _declared_build_args(dockerfile: Path) -> set[str]:
+    return set(re.findall(r"^\s*ARG\s+(\w+)", dockerfile.read_text("utf-8"), re.M))
+
+
+def content_digest(
+    project: Project,
+    docker_config: DockerConfig,
+    target: str,
+    build_args: dict[str, str],
+) -> Optional[str]:
+    """
+    :return: a digest of everything the image is built from: the git trees of the build context paths of the
+    project, the docker file, the build target and the build arguments that the docker file declares. Untracked
+    files are not part of it. None if a tracked file has uncommitted changes, because those are not in a git tree.
+    """
+    dockerfile = Path(docker_file_path(project, docker_config))
+    repo = Repo(docker_config.root_folder, search_parent_directories=True)
+    paths = sorted(
+        {
+            os.path.relpath(path.resolve(), repo.working_tree_dir)
+            for path in [
+                *(
+                    Path(docker_config.root_folder, path)
+                    for path in build_context_paths(project, docker_config)
+                ),
+                dockerfile,
+            ]
+        }
+    )
+    if repo.git.status("--porcelain", "--untracked-files=no", "--", *paths):
+        return None
+    declared = _declared_build_args(dockerfile)
+    content = {
+        "trees": {path: repo.git.rev_parse(f"HEAD:{path}") for path in paths},
+        "target": target,
+        "args": {k: v for k, v in sorted(build_args.items()) if k in declared},
+    }
+    return hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+
+
+def content_image_tag(
+    step_input: Input, docker_config: DockerConfig, build_args: dict[str, str]
+) -> Optional[str]:
+    """
+    :return: an image tag derived from the `content_digest` of the project, or None if the project has
+    uncommitted changes
+    """
+    try:
+        digest = content_digest(
+            step_input.project_execution.project,
+            docker_config,
+            docker_config.build_target or "",
+            build_args,
+        )
+    except (GitCommandError, InvalidGitRepositoryError, OSError):
+        return None
+    if not digest:
+        return None
+    name = step_input.project_execution.name.lower()
+    return f"{name}:{CONTENT_TAG_PREFIX}{digest}".replace("/", "_")
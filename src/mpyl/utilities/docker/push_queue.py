@@ -0,0 +1,121 @@
+"""
+Pushes docker images to the registry in the background, so that the next project can be built while the layers of
+the previous one are uploaded. The queue lives for the duration of a single run. Steps that require an artifact wait
+only for the required pushes of their own project and fail if one of them failed. Pushes that only serve as a cache,
+like that of the `-test` image, are not waited for until the end of the run.
+"""
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import Logger
+from typing import Callable, Optional
+
+
+class PushQueue:
+    def __init__(self, max_concurrent: int) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent, thread_name_prefix="docker-push"
+        )
+        self._lock = threading.Lock()
+        self._pushes: dict[str, list[tuple[str, Future, bool]]] = {}
+        self._reported: set[Future] = set()
+
+    def submit(
+        self,
+        logger: Logger,
+        project_name: str,
+        image: str,
+        push: Callable[[], None],
+        required: bool = True,
+    ) -> None:
+        """
+        :param required: whether the steps that follow need the image. Only required pushes are waited for by
+        `wait_for`
+        """
+
+        def run_push():
+            logger.info(f"Pushing {image}")
+            push()
+            logger.info(f"Pushed {image}")
+
+        with self._lock:
+            future = self._executor.submit(run_push)
+            self._pushes.setdefault(project_name, []).append((image, future, required))
+
+    def wait_for(self, project_name: str) -> Optional[str]:
+        """
+        :param project_name: the project of which to wait for the required pushes
+        :return: a description of the required pushes that failed, or None if all of them succeeded
+        """
+        with self._lock:
+            pushes = list(self._pushes.get(project_name, []))
+
+        failures = [
+            f"Failed to push {image}: {future.exception()}"
+            for image, future, required in pushes
+            if required and future.exception() is not None
+        ]
+        return "\n".join(failures) if failures else None
+
+    def failures(self, wait: bool = False) -> dict[str, str]:
+        """
+        :param wait: whether to wait for all pending pushes, or only look at the ones that are done
+        :return: the projects of which a push failed, with a description of the failures. Every failure is
+        returned only once.
+        """
+        if wait:
+            with self._lock:
+                pending = [f for p in self._pushes.values() for _, f, _ in p]
+            for future in pending:
+                future.exception()
+
+        failures: dict[str, list[str]] = {}
+        with self._lock:
+            for project_name, project_pushes in self._pushes.items():
+                for image, future, _ in project_pushes:
+                    if future in self._reported or not future.done():
+                        continue
+                    if (exception := future.exception()) is not None:
+                        self._reported.add(future)
+                        failures.setdefault(project_name, []).append(
+                            f"Failed to push {image}: {exception}"
+                        )
+        return {name: "\n".join(messages) for name, messages in failures.items()}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_queue: Optional[PushQueue] = None
+_queue_lock = threading.Lock()
+
+
+def push_queue(max_concurrent: int) -> PushQueue:
+    """:return: the push queue of the current run, which is created on first use"""
+    global _queue  # pylint: disable=global-statement
+    with _queue_lock:
+        if _queue is None:
+            _queue = PushQueue(max_concurrent)
+        return _queue
+
+
+def wait_for_pushes(project_name: str) -> Optional[str]:
+    return _queue.wait_for(project_name) if _queue else None
+
+
+def failed_pushes() -> dict[str, str]:
+    """:return: the failures of the pushes that are done, that have not been returned before"""
+    return _queue.failures() if _queue else {}
+
+
+def close_push_queue() -> dict[str, str]:
+    """Waits for all pending pushes and ends the queue of the current run
+    :return: the failures that have not been returned before
+    """
+    global _queue  # pylint: disable=global-statement
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is None:
+        return {}
+    failures = queue.failures(wait=True)
+    queue.shutdown()
+    return failures
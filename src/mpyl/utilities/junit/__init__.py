@@ -1,8 +1,12 @@
-"""Wrapper around `junitparser`"""
+"""Wrapper around `junitparser`, with a streaming summary of large JUnit reports"""
+import heapq
+import json
 import os
-from dataclasses import dataclass
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Union
 
 from junitparser import JUnitXml, TestSuite
 from ruamel.yaml import yaml_object, YAML
@@ -11,6 +15,10 @@ from ...steps.models import ArtifactSpec
 
 yaml = YAML()
 
+SUMMARY_FILE_NAME = "mpyl-junit-summary.json"
+SUMMARY_VERSION = 1
+TIMINGS_FILE_NAME = "test-timings.json"
+
 
 @yaml_object(yaml)
 @dataclass(frozen=False)
@@ -37,23 +45,203 @@ class JunitTestSpec(ArtifactSpec):
     test_results_summary: Optional[TestRunSummary] = None
 
 
+@dataclass(frozen=True)
+class SuiteSummary:
+    """The counts of a single test suite, without its test cases"""
+
+    name: str
+    tests: int
+    failures: int
+    errors: int
+    skipped: int
+    time: float
+
+
+def _report_files(junit_result_path: Path) -> list[Path]:
+    if not os.path.isdir(junit_result_path):
+        return []
+    return sorted(
+        Path(junit_result_path, file_name)
+        for file_name in os.listdir(junit_result_path)
+        if file_name.endswith(".xml")
+    )
+
+
 def to_test_suites(junit_result_path: Path) -> list[TestSuite]:
     xml = JUnitXml()
-    for file_name in (
-        [fn for fn in os.listdir(junit_result_path) if fn.endswith(".xml")]
-        if os.path.isdir(junit_result_path)
-        else []
-    ):
-        xml += JUnitXml.fromfile(Path(junit_result_path, file_name).as_posix())
+    for report_file in _report_files(junit_result_path):
+        xml += JUnitXml.fromfile(report_file.as_posix())
 
     suites = [TestSuite.fromelem(s) for s in xml]
     return sorted(suites, key=lambda s: s.time)
 
 
-def sum_suites(suites: list[TestSuite]) -> TestRunSummary:
+SUITE_COUNTS = ("tests", "failures", "errors", "skipped")
+TEST_CONTAINERS = {"testsuite", "testsuites"}
+
+
+def _int_attribute(element: ET.Element, name: str, counted: int) -> int:
+    value = element.get(name)
+    return int(value) if value is not None else counted
+
+
+def summarize_report_file(report_file: Path) -> list[SuiteSummary]:
+    """
+    Summarizes the test suites in a JUnit XML file without building its tree. Every child of a test suite, like a test
+    case or its `system-out`, is removed from the suite as soon as it has been parsed, so memory use does not grow with
+    the number of test cases. Counts that are missing from the `testsuite` attributes are derived from its own test
+    cases, not those of nested test suites.
+    """
+    summaries = []
+    open_elements: list[ET.Element] = []
+    # the counts of the test cases of every open test suite, innermost last
+    counters: list[dict[str, int]] = []
+    for event, element in ET.iterparse(report_file, events=("start", "end")):
+        if event == "start":
+            open_elements.append(element)
+            if element.tag == "testsuite":
+                counters.append(dict.fromkeys(SUITE_COUNTS, 0))
+            continue
+        open_elements.pop()
+        if element.tag == "testcase" and counters:
+            outcomes = {child.tag for child in element}
+            counted = counters[-1]
+            counted["tests"] += 1
+            counted["failures"] += "failure" in outcomes
+            counted["errors"] += "error" in outcomes
+            counted["skipped"] += "skipped" in outcomes
+        elif element.tag == "testsuite":
+            counted = counters.pop()
+            summaries.append(
+                SuiteSummary(
+                    name=element.get("name", ""),
+                    tests=_int_attribute(element, "tests", counted["tests"]),
+                    failures=_int_attribute(element, "failures", counted["failures"]),
+                    errors=_int_attribute(element, "errors", counted["errors"]),
+                    skipped=_int_attribute(element, "skipped", counted["skipped"]),
+                    time=float(element.get("time", 0)),
+                )
+            )
+        if open_elements and open_elements[-1].tag in TEST_CONTAINERS:
+            open_elements[-1].remove(element)
+    return summaries
+
+
+def _fingerprint(report_file: Path) -> list[int]:
+    stat = report_file.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _read_summary_file(summary_file: Path) -> dict:
+    try:
+        with open(summary_file, encoding="utf-8") as file:
+            cached = json.load(file)
+        return cached["files"] if cached.get("version") == SUMMARY_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def suite_summaries(
+    junit_result_path: Path, persist: bool = False, max_workers: int = 4
+) -> list[SuiteSummary]:
+    """
+    Summarizes all JUnit XML files in `junit_result_path`. Summaries of earlier runs are read from
+    `SUMMARY_FILE_NAME` in the same directory, so only report files that were added or changed since are parsed.
+    Those are parsed concurrently.
+    :param junit_result_path: the directory with the JUnit XML files
+    :param persist: whether to write the summaries next to the reports, for later use by the reporters
+    :param max_workers: the maximum number of files parsed at the same time
+    :return: the summaries of all test suites, sorted by their duration
+    """
+    report_files = _report_files(junit_result_path)
+    summary_file = Path(junit_result_path, SUMMARY_FILE_NAME)
+    cached = _read_summary_file(summary_file)
+
+    fingerprints = {f.name: _fingerprint(f) for f in report_files}
+    outdated = [
+        f
+        for f in report_files
+        if cached.get(f.name, {}).get("fingerprint") != fingerprints[f.name]
+    ]
+    if outdated:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            parsed = dict(
+                zip(
+                    [f.name for f in outdated],
+                    executor.map(summarize_report_file, outdated),
+                )
+            )
+        cached = {
+            name: cached[name]
+            if name not in parsed
+            else {
+                "fingerprint": fingerprints[name],
+                "suites": [asdict(suite) for suite in parsed[name]],
+            }
+            for name in fingerprints
+        }
+        if persist:
+            with open(summary_file, "w", encoding="utf-8") as file:
+                json.dump({"version": SUMMARY_VERSION, "files": cached}, file)
+
+    suites = [
+        SuiteSummary(**suite)
+        for name in fingerprints
+        for suite in cached[name]["suites"]
+    ]
+    return sorted(suites, key=lambda s: s.time)
+
+
+def sum_suites(suites: Union[list[TestSuite], list[SuiteSummary]]) -> TestRunSummary:
     return TestRunSummary(
         tests=sum(s.tests for s in suites),
         failures=sum(s.failures for s in suites),
         errors=sum(s.errors for s in suites),
         skipped=sum(s.skipped for s in suites),
     )
+
+
+def summarize_test_results(junit_result_path: Path) -> TestRunSummary:
+    """Summarizes the reports in `junit_result_path` and persists the per-suite summaries for the reporters"""
+    return sum_suites(suite_summaries(junit_result_path, persist=True))
+
+
+def read_suite_timings(timings_file: Path) -> dict[str, float]:
+    """:return: the duration in seconds of every suite, as recorded by `record_suite_timings`"""
+    try:
+        with open(timings_file, encoding="utf-8") as file:
+            return {name: float(time) for name, time in json.load(file).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def record_suite_timings(
+    timings_file: Path, suites: list[SuiteSummary], complete: bool = False
+) -> None:
+    """
+    Records the durations of `suites`
+    :param complete: whether all suites of the project ran successfully. The durations of suites that did not run are
+    then dropped, because the suites no longer exist. Otherwise they are kept.
+    """
+    recorded = {} if complete else read_suite_timings(timings_file)
+    timings = recorded | {s.name: s.time for s in suites}
+    timings_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(timings_file, "w", encoding="utf-8") as file:
+        json.dump(timings, file, indent=2, sort_keys=True)
+
+
+def to_shards(timings: dict[str, float], shard_count: int) -> list[list[str]]:
+    """
+    Splits suites into shards of about the same duration, by assigning the longest suite that is left to the shard
+    with the shortest total duration so far.
+    :param timings: the duration of every suite
+    :param shard_count: the number of shards
+    :return: the names of the suites in each shard, sorted
+    """
+    shards: list[list[str]] = [[] for _ in range(shard_count)]
+    totals = [(0.0, index) for index in range(shard_count)]
+    for name, time in sorted(timings.items(), key=lambda t: (-t[1], t[0])):
+        total, index = heapq.heappop(totals)
+        shards[index].append(name)
+        heapq.heappush(totals, (total + time, index))
+    return [sorted(shard) for shard in shards]
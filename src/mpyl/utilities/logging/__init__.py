@@ -1,9 +1,23 @@
 """Console logging for utilities for the `rich` library."""
 
+import logging
+import re
+import threading
+from collections import deque
+from logging import Logger
+from pathlib import Path
+from typing import Optional, TextIO
+
 from rich.errors import ConsoleError
 from rich.text import Text
 from rich.markup import escape
 
+from .. import run_artifacts_folder
+
+
+def log_folder() -> Path:
+    return run_artifacts_folder() / "logs"
+
 
 def try_parse_ansi(text: str):
     escaped = escape(text)
@@ -11,3 +25,118 @@ def try_parse_ansi(text: str):
         return Text.from_ansi(escaped)
     except ConsoleError:
         return Text(escaped)
+
+
+class LogCapture:
+    """
+    Captures the output of a long-running docker or subprocess stream. Only the last `tail_size` lines are kept in
+    memory, or all of them if it is None. The full log is written to `log_file`. Lines are sent to the console in
+    batches, to avoid rendering every single line of verbose builds. A batch is sent when it is full, or at the latest
+    `flush_interval_seconds` after its first line, also when no more lines follow.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        logger: Logger,
+        log_file: Optional[Path],
+        level: int = logging.INFO,
+        tail_size: Optional[int] = 200,
+        batch_size: int = 100,
+        flush_interval_seconds: float = 1.0,
+        use_print: bool = False,
+    ) -> None:
+        self._logger = logger
+        self.log_file = log_file
+        self._level = level
+        self._tail: deque[str] = deque(maxlen=tail_size)
+        self._batch: list[str] = []
+        self._batch_size = batch_size
+        self._flush_interval_seconds = flush_interval_seconds
+        self._flush_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._use_print = use_print
+        self._file: Optional[TextIO] = None
+        self.line_count = 0
+
+    @staticmethod
+    def for_task(logger: Logger, task_name: str, **kwargs) -> "LogCapture":
+        """
+        :return: a capture that writes to a file named after `task_name` in the run artifacts folder. The id of the
+        thread is part of the name, so that concurrent tasks with the same name do not write to the same file.
+        """
+        file_name = re.sub(r"[^\w.-]+", "-", task_name).strip("-")[:100]
+        return LogCapture(
+            logger,
+            log_folder() / f"{file_name}-{threading.get_native_id()}.log",
+            **kwargs,
+        )
+
+    def __enter__(self) -> "LogCapture":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def append(self, line: str) -> None:
+        line = line.rstrip()
+        with self._lock:
+            self.line_count += 1
+            self._tail.append(line)
+            self._batch.append(line)
+            self._write(line)
+            if len(self._batch) >= self._batch_size:
+                self._flush_batch()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(
+                    self._flush_interval_seconds, self.flush
+                )
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _write(self, line: str) -> None:
+        if self.log_file is None:
+            return
+        if self._file is None:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(  # pylint: disable=consider-using-with
+                self.log_file, "w", encoding="utf-8"
+            )
+        self._file.write(line + "\n")
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_batch()
+
+    def _flush_batch(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._batch:
+            return
+        text = "\n".join(self._batch)
+        self._batch = []
+        if self._use_print:
+            print(text)
+        else:
+            self._logger.log(self._level, try_parse_ansi(text))
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_batch()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @property
+    def tail(self) -> list[str]:
+        return list(self._tail)
+
+    def tail_message(self, lines: int = 20) -> str:
+        """:return: the last `lines` lines of the log, with a reference to the full log"""
+        tail = self.tail[-lines:]
+        if not tail:
+            return ""
+        location = f", full log in {self.log_file}" if self.log_file else ""
+        return f"Last {len(tail)} of {self.line_count} lines{location}:\n" + "\n".join(
+            tail
+        )
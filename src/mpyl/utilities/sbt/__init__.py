@@ -1,6 +1,24 @@
 """SBT config"""
 
+import json
+import re
+import socket
+import threading
 from dataclasses import dataclass
+from logging import Logger
+from pathlib import Path
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
+from ..logging import LogCapture
+from ..subprocess import run_command, SUBPROCESS_FAILED
+from ...run_plan import RunPlan
+from ...steps.models import Output
+
+TASK_FAILURE_PATTERN = re.compile(r"\[error\] \(([\w.-]+) / ")
+"""Matches the summary sbt prints for a failed task, like `[error] (service / Test / test) TestsFailedException`"""
+SERVER_STARTUP_TIMEOUT_SECONDS = 600
+SERVER_SHUTDOWN_TIMEOUT_SECONDS = 60
 
 
 @dataclass(frozen=True)
@@ -13,6 +31,7 @@ class SbtConfig:
     verbose: bool
     build_with_client: bool
     test_with_client: bool
+    batch_projects: bool = False
 
     @staticmethod
     def from_config(config: dict):
@@ -32,6 +51,7 @@ class SbtConfig:
             test_with_client=(
                 str(sbt_config.get("clientMode", {}).get("test")).lower() == "true"
             ),
+            batch_projects=sbt_config.get("batchProjects", False),
         )
 
     def to_command(self, client_mode: bool, sbt_commands: list[str]):
@@ -44,3 +64,266 @@ class SbtConfig:
         joined_commands = "; ".join(sbt_commands)
         cmd.append(joined_commands)
         return cmd
+
+
+class SbtServer:
+    """
+    The sbt server that the thin client of `SbtConfig.sbt_client_command` connects to. A single server is shared by
+    the sbt steps in all stages of a run, so that the build is loaded and compiled only once. The server is started
+    when it is first needed, and started again if it crashed. A server that was already running before the run is
+    reused, but not shut down.
+    """
+
+    def __init__(self, config: SbtConfig, root_path: Path = Path(".")) -> None:
+        self._config = config
+        self._root_path = root_path
+        self._lock = threading.Lock()
+        self._started = False
+
+    @property
+    def active_file(self) -> Path:
+        """The file in which sbt publishes the address of a running server"""
+        return self._root_path / "project" / "target" / "active.json"
+
+    def is_alive(self) -> bool:
+        """:return: whether the server accepts connections"""
+        try:
+            uri = urlparse(json.loads(self.active_file.read_text("utf-8"))["uri"])
+            if uri.scheme == "local":
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                    connection.settimeout(1)
+                    connection.connect(uri.path)
+            else:
+                with socket.create_connection(
+                    (uri.hostname, uri.port), timeout=1  # type: ignore[arg-type]
+                ):
+                    pass
+            return True
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def _run_client(
+        self, logger: Logger, sbt_commands: list[str], timeout_seconds: float
+    ) -> bool:
+        with LogCapture.for_task(logger, "sbt server") as log_capture:
+            return run_command(
+                logger,
+                self._config.to_command(True, sbt_commands),
+                timeout_seconds,
+                log_capture,
+                cwd=self._root_path,
+            ).success
+
+    def ensure_running(self, logger: Logger) -> bool:
+        """Starts the server, unless it is running already
+        :return: whether the server is running
+        """
+        with self._lock:
+            if self.is_alive():
+                return True
+            logger.info("Starting sbt server")
+            self.active_file.unlink(missing_ok=True)
+            self._run_client(logger, ["about"], SERVER_STARTUP_TIMEOUT_SECONDS)
+            if not self.is_alive():
+                logger.warning("sbt server could not be started")
+                return False
+            self._started = True
+            return True
+
+    def shutdown(self, logger: Logger) -> None:
+        with self._lock:
+            if self._started and self.is_alive():
+                logger.info("Shutting down sbt server")
+                self._run_client(logger, ["shutdown"], SERVER_SHUTDOWN_TIMEOUT_SECONDS)
+
+
+_server: Optional[SbtServer] = None
+_server_lock = threading.Lock()
+
+
+def sbt_server(config: SbtConfig) -> SbtServer:
+    """:return: the sbt server of the current run"""
+    global _server  # pylint: disable=global-statement
+    with _server_lock:
+        if _server is None:
+            _server = SbtServer(config)
+        return _server
+
+
+def shutdown_sbt_server(logger: Logger) -> None:
+    """Shuts down the sbt server of the current run, if one was started"""
+    global _server  # pylint: disable=global-statement
+    with _server_lock:
+        server, _server = _server, None
+    if server is not None:
+        server.shutdown(logger)
+
+
+def _run_sbt_command(
+    logger: Logger,
+    config: SbtConfig,
+    client_mode: bool,
+    command: list[str],
+    log_capture: LogCapture,
+) -> bool:
+    if not client_mode:
+        return run_command(logger, command, None, log_capture).success
+
+    server = sbt_server(config)
+    for _ in range(2):
+        if not server.ensure_running(logger):
+            return False
+        if run_command(logger, command, None, log_capture).success:
+            return True
+        if server.is_alive():
+            return False
+        logger.warning("The sbt server stopped while running the command, retrying")
+    return False
+
+
+def run_sbt(
+    logger: Logger, config: SbtConfig, client_mode: bool, command: list[str]
+) -> Output:
+    """
+    Runs `command`, which is constructed with `SbtConfig.to_command`. In client mode, the command is sent to the
+    server of the run, which is restarted if it stopped while running the command.
+    """
+    command_argument = " ".join(command)
+    logger.info(f"Executing: '{command_argument}'")
+    with LogCapture.for_task(logger, command_argument, use_print=True) as log_capture:
+        try:
+            success = _run_sbt_command(
+                logger, config, client_mode, command, log_capture
+            )
+        except FileNotFoundError:
+            logger.warning(f"'{command_argument}: file not found", exc_info=True)
+            success = False
+
+    if success:
+        return Output(success=True, message="Subprocess executed successfully")
+    return Output(
+        success=False, message=f"{SUBPROCESS_FAILED}\n{log_capture.tail_message()}"
+    )
+
+
+@dataclass(frozen=True)
+class SbtBatchResult:
+    """The outcome of a single sbt invocation for multiple projects"""
+
+    success: bool
+    failed_projects: frozenset[str]
+    """Projects to which a failed task could be attributed"""
+    unattributed_failure: bool
+    """A task failed that does not belong to any of the projects in the batch, e.g. in a shared module"""
+    log_tail: str
+
+    def succeeded_for(self, project_name: str) -> bool:
+        return self.success or (
+            not self.unattributed_failure and project_name not in self.failed_projects
+        )
+
+
+class SbtBatchResults:
+    """
+    The outcomes of the batched sbt invocations of a step, by project name. The outcomes are scoped to the run plan,
+    so that the outcome for a project that was batched, but not executed afterwards, is not used in a later run.
+    """
+
+    def __init__(self) -> None:
+        self._run_plan: Optional[RunPlan] = None
+        self._results: dict[str, SbtBatchResult] = {}
+
+    def for_run(self, run_plan: RunPlan) -> dict[str, SbtBatchResult]:
+        """:return: the outcomes of the batches of the run with `run_plan` that have not been taken yet"""
+        if self._run_plan is not run_plan:
+            self._run_plan = run_plan
+            self._results = {}
+        return self._results
+
+
+def failed_sbt_projects(log_lines: Iterable[str]) -> set[str]:
+    """:return: the ids of the projects with failed tasks, according to the error summary of sbt"""
+    return {
+        match.group(1)
+        for line in log_lines
+        if (match := TASK_FAILURE_PATTERN.search(line))
+    }
+
+
+def run_sbt_batch(  # pylint: disable=too-many-arguments
+    logger: Logger,
+    config: SbtConfig,
+    client_mode: bool,
+    project_names: list[str],
+    sbt_commands: list[str],
+    task_name: str,
+) -> SbtBatchResult:
+    """Runs `sbt_commands` for all `project_names` in a single sbt invocation and attributes failures to projects"""
+    logger.info(f"Running {task_name} for {', '.join(project_names)} in one sbt batch")
+    with LogCapture.for_task(logger, task_name, use_print=True) as log_capture:
+        try:
+            success = _run_sbt_command(
+                logger,
+                config,
+                client_mode,
+                config.to_command(client_mode, sbt_commands),
+                log_capture,
+            )
+        except FileNotFoundError:
+            logger.warning(f"'{config.sbt_command}': file not found", exc_info=True)
+            success = False
+
+    failed = set()
+    if not success and log_capture.log_file and log_capture.log_file.exists():
+        with open(log_capture.log_file, encoding="utf-8") as log_file:
+            failed = failed_sbt_projects(log_file)
+
+    return SbtBatchResult(
+        success=success,
+        failed_projects=frozenset(failed),
+        unattributed_failure=not success
+        and (not failed or not failed.issubset(project_names)),
+        log_tail=log_capture.tail_message(),
+    )
+
+
+def to_batch_command(
+    project_names: list[str], task: str, settings: Optional[list[str]] = None
+) -> list[str]:
+    """
+    :param project_names: the ids of the sbt projects
+    :param task: the task to run for every project, e.g. `test`
+    :param settings: settings to apply before running the tasks
+    :return: the sbt commands that run `task` for all projects, without stopping at the first failure
+    """
+    commands = [f"set {setting}" for setting in settings or []]
+    commands.append("all " + " ".join(f"{name}/{task}" for name in project_names))
+    return commands
+
+
+def to_sharding_commands(shards: list[list[str]]) -> list[str]:
+    """
+    :param shards: the names of the test suites in each shard, see `mpyl.utilities.junit.to_shards`
+    :return: the sbt commands that make the `test` task of the current project run every shard in its own fork,
+    concurrently. Suites that are not in any of the shards, e.g. because they are new, are spread over the shards by
+    the hash of their name. The settings contain no semicolons, as those separate the sbt commands.
+    """
+    assignments = ", ".join(
+        f"{json.dumps(suite)} -> {index}"
+        for index, shard in enumerate(shards)
+        for suite in shard
+    )
+    grouping = (
+        "((Test / definedTests).value, (Test / forkOptions).value) match { case (tests, options) => "
+        f"tests.groupBy(test => Map[String, Int]({assignments})"
+        f".getOrElse(test.name, math.abs(test.name.hashCode % {len(shards)})))"
+        ".toSeq.sortBy(_._1)"
+        '.map { case (shard, group) => Tests.Group(s"shard-$shard", group, Tests.SubProcess(options)) } }'
+    )
+    return [
+        "set Test / fork := true",
+        f"set Test / testGrouping := {grouping}",
+        "set Global / concurrentRestrictions := Seq("
+        f"Tags.limitAll(java.lang.Runtime.getRuntime.availableProcessors.max({len(shards)})), "
+        f"Tags.limit(Tags.ForkedTestGroup, {len(shards)}))",
+    ]
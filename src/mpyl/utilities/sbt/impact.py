@@ -0,0 +1,175 @@
+"""
+Selects the test suites of an sbt project that are impacted by the changed files, so that a pull request only runs
+those. The impacted suites are looked up in a map from source file to test suites, that is recorded from the scoverage
+data of the last full run with coverage. Recording requires the build to let scoverage report the name of the test
+that invoked a statement, so that every measurement reads `<statement id> <suite>`.
+
+A changed test source only counts as a suite when its name is known, from the map or from the durations recorded in
+`test-timings.json`. Other test sources, like shared fixtures, can be used by any suite.
+
+A full run is done instead when the run is not for a pull request, when the map is missing or older than
+`sbt.testImpact.fullRunIntervalHours`, or when a changed file is neither a known test suite nor in the map.
+"""
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+from ..junit import TIMINGS_FILE_NAME, read_suite_timings
+from ...project import Project
+from ...steps.models import VersioningProperties
+
+IMPACT_FILE_NAME = "test-impact.json"
+TEST_SOURCE_PATTERN = re.compile(
+    r"src/(?:test|it)/(?:scala|java)/(.+)\.(?:scala|java)$"
+)
+
+
+@dataclass(frozen=True)
+class TestImpactConfig:
+    __test__ = False
+    enabled: bool
+    full_run_interval: timedelta
+
+    @staticmethod
+    def from_config(config: dict):
+        impact_config = config.get("sbt", {}).get("testImpact", {})
+        return TestImpactConfig(
+            enabled=impact_config.get("enabled", False),
+            full_run_interval=timedelta(
+                hours=impact_config.get("fullRunIntervalHours", 24)
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class TestImpactMap:
+    __test__ = False
+    recorded_at: datetime
+    """The time of the full run the map was recorded from"""
+    suites_per_file: dict[str, set[str]]
+    """The suites that cover each source file, by path relative to the repository root"""
+
+    @staticmethod
+    def read(impact_file: Path) -> Optional["TestImpactMap"]:
+        try:
+            with open(impact_file, encoding="utf-8") as file:
+                values = json.load(file)
+            return TestImpactMap(
+                recorded_at=datetime.fromisoformat(values["recordedAt"]),
+                suites_per_file={
+                    name: set(suites) for name, suites in values["files"].items()
+                },
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def write(self, impact_file: Path) -> None:
+        impact_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(impact_file, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "recordedAt": self.recorded_at.isoformat(),
+                    "files": {
+                        name: sorted(suites)
+                        for name, suites in sorted(self.suites_per_file.items())
+                    },
+                },
+                file,
+                indent=2,
+            )
+
+    def impacted_suites(
+        self, changed_files: frozenset[str], recorded_suites: Iterable[str] = ()
+    ) -> Optional[set[str]]:
+        """
+        :param recorded_suites: the names of suites that are known from elsewhere, e.g. from their recorded durations
+        :return: the suites that cover the changed files, and the changed test suites themselves. None if a changed
+        file is not known, in which case all suites need to run.
+        """
+        known_suites = set(recorded_suites).union(*self.suites_per_file.values())
+        suites: set[str] = set()
+        for changed_file in changed_files:
+            match = TEST_SOURCE_PATTERN.search(changed_file)
+            if match and (suite := match.group(1).replace("/", ".")) in known_suites:
+                suites.add(suite)
+            elif changed_file in self.suites_per_file:
+                suites |= self.suites_per_file[changed_file]
+            else:
+                return None
+        return suites
+
+
+def _is_pull_request(versioning: VersioningProperties, main_branch: str) -> bool:
+    return versioning.pr_number is not None and versioning.branch != main_branch
+
+
+def select_suites(
+    config: TestImpactConfig,
+    project: Project,
+    changed_files: frozenset[str],
+    versioning: VersioningProperties,
+    main_branch: str,
+) -> Optional[list[str]]:
+    """:return: the names of the suites to run, or None if all suites need to run"""
+    if not config.enabled or not _is_pull_request(versioning, main_branch):
+        return None
+    impact_map = TestImpactMap.read(project.target_path / IMPACT_FILE_NAME)
+    if (
+        impact_map is None
+        or datetime.now(timezone.utc) - impact_map.recorded_at
+        > config.full_run_interval
+    ):
+        return None
+    suites = impact_map.impacted_suites(
+        changed_files, read_suite_timings(project.target_path / TIMINGS_FILE_NAME)
+    )
+    return sorted(suites) if suites else None
+
+
+def read_scoverage_impact(data_dir: Path) -> dict[str, set[str]]:
+    """
+    :param data_dir: the `scoverage-data` folder of a project, with the statements in `scoverage.coverage` and the
+    invoked statements in the `scoverage.measurements.*` files
+    :return: the suites that invoked a statement of each source file, by path relative to the working directory
+    """
+    coverage_file = data_dir / "scoverage.coverage"
+    if not coverage_file.exists():
+        return {}
+
+    sources: dict[str, str] = {}
+    for block in coverage_file.read_text(encoding="utf-8").split("\f"):
+        statement = "\n".join(
+            line for line in block.split("\n") if not line.startswith("#")
+        )
+        lines = statement.strip("\n").split("\n")
+        if len(lines) >= 2 and lines[0].isdigit():
+            source = lines[1]
+            sources[lines[0]] = (
+                os.path.relpath(source) if os.path.isabs(source) else source
+            )
+
+    suites_per_file: dict[str, set[str]] = {}
+    for measurements in data_dir.glob("scoverage.measurements.*"):
+        for line in measurements.read_text(encoding="utf-8").splitlines():
+            statement, _, suite = line.strip().partition(" ")
+            if suite and statement in sources:
+                suites_per_file.setdefault(sources[statement], set()).add(suite)
+    return suites_per_file
+
+
+def record_impact_map(project: Project) -> Optional[TestImpactMap]:
+    """Records the map of `project` from the scoverage data of its last run, if that has test names"""
+    suites_per_file: dict[str, set[str]] = {}
+    for data_dir in Path(project.root_path).glob("target/scala-*/scoverage-data"):
+        for name, suites in read_scoverage_impact(data_dir).items():
+            suites_per_file.setdefault(name, set()).update(suites)
+    if not suites_per_file:
+        return None
+
+    impact_map = TestImpactMap(datetime.now(timezone.utc), suites_per_file)
+    impact_map.write(project.target_path / IMPACT_FILE_NAME)
+    return impact_map
@@ -1,26 +1,157 @@
 """Utilities related to launching a subprocess"""
 
-import subprocess
+import asyncio
+import logging
+import os
+import signal
+import time
+from asyncio.subprocess import PIPE, Process
+from dataclasses import dataclass
 from logging import Logger
-from typing import Union
+from pathlib import Path
+from typing import Optional, Union
 
-from ..logging import try_parse_ansi
+from ..logging import LogCapture
 from ...steps.models import Output
 
 SUBPROCESS_FAILED = "Subprocess failed"
+TERMINATION_GRACE_SECONDS = 5.0
+STREAM_LINE_LIMIT = 16 * 1024 * 1024
 
 
-def custom_check_output(
+@dataclass(frozen=True)
+class CommandResult:
+    command: list[str]
+    exit_code: Optional[int]
+    """The exit code of the process, negative if it was ended by a signal"""
+    duration_seconds: float
+    timed_out: bool
+    output: list[str]
+    """The tail of the output, as kept by the `mpyl.utilities.logging.LogCapture` of the command"""
+
+    @property
+    def success(self) -> bool:
+        return self.exit_code == 0 and not self.timed_out
+
+
+async def _drain(stream: Optional[asyncio.StreamReader], log_capture: LogCapture):
+    if stream is None:
+        return
+    async for line in stream:
+        log_capture.append(line.decode(errors="replace"))
+
+
+async def _kill_process_group(process: Process):
+    for kill_signal in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, kill_signal)
+        except ProcessLookupError:
+            return
+        try:
+            await asyncio.wait_for(process.wait(), TERMINATION_GRACE_SECONDS)
+            return
+        except asyncio.TimeoutError:
+            continue
+
+
+async def run_command_async(
+    logger: Logger,
+    command: list[str],
+    timeout_seconds: Optional[float] = None,
+    log_capture: Optional[LogCapture] = None,
+    cwd: Optional[Path] = None,
+) -> CommandResult:
+    """
+    Runs `command` in its own process group, while draining its stdout and stderr concurrently into `log_capture`.
+    If the command does not finish within `timeout_seconds`, the whole process group is terminated.
+    :raise FileNotFoundError: if the executable does not exist
+    """
+    command_argument = " ".join(command)
+    capture = log_capture or LogCapture.for_task(logger, command_argument)
+
+    start = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=PIPE,
+        stderr=PIPE,
+        start_new_session=True,
+        limit=STREAM_LINE_LIMIT,
+        cwd=cwd,
+    )
+    timed_out = False
+    with capture:
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    _drain(process.stdout, capture),
+                    _drain(process.stderr, capture),
+                    process.wait(),
+                ),
+                timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(
+                f"'{command_argument}' did not finish within {timeout_seconds} seconds"
+            )
+            await _kill_process_group(process)
+
+    return CommandResult(
+        command=command,
+        exit_code=process.returncode,
+        duration_seconds=time.monotonic() - start,
+        timed_out=timed_out,
+        output=capture.tail,
+    )
+
+
+def run_command(
+    logger: Logger,
+    command: list[str],
+    timeout_seconds: Optional[float] = None,
+    log_capture: Optional[LogCapture] = None,
+    cwd: Optional[Path] = None,
+) -> CommandResult:
+    """Synchronous version of `run_command_async`, that can be called from any thread without a running event loop"""
+    return asyncio.run(
+        run_command_async(logger, command, timeout_seconds, log_capture, cwd)
+    )
+
+
+async def run_commands_async(
+    logger: Logger,
+    commands: list[list[str]],
+    max_concurrent: int,
+    timeout_seconds: Optional[float] = None,
+) -> list[CommandResult]:
+    """Runs `commands` with at most `max_concurrent` at the same time
+    :return: the results in the order of `commands`
+    """
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run_limited(command: list[str]) -> CommandResult:
+        async with semaphore:
+            return await run_command_async(logger, command, timeout_seconds)
+
+    return list(await asyncio.gather(*(run_limited(c) for c in commands)))
+
+
+def custom_check_output(  # pylint: disable=too-many-arguments
     logger: Logger,
     command: Union[str, list[str]],
     capture_stdout: bool = False,
     use_print: bool = False,
+    log_file: Optional[Path] = None,
+    timeout_seconds: Optional[float] = None,
 ) -> Output:
     """
-    Wrapper around subprocess.Popen
+    Wrapper around `run_command`
     ⚠️ Using this function implies an implicit runtime OS dependency.
     Avoid this if at all possible. For example, to run docker commands, use the bundled docker client (python-on-whales)
     which makes the dependency on docker explicit and adds a lot of convenience methods.
+
+    The output is captured by a `mpyl.utilities.logging.LogCapture`, which writes it to `log_file`, or to a file named
+    after the command if not specified. The tail of the output is added to the message of a failed `Output`.
     """
     if isinstance(command, str):
         command = command.split(" ")
@@ -29,43 +160,29 @@ def custom_check_output(
     logger.info(f"Executing: '{command_argument}'")
     logger = logger.getChild("Subprocess")
 
-    try:
-        if capture_stdout:
-            out = subprocess.check_output(command, stderr=subprocess.STDOUT).decode(
-                "utf-8"
-            )
-            return Output(success=True, message=out)
-
-        with subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
-        ) as process:
-            if not process.stdout:
-                raise RuntimeError(
-                    f"Process {command_argument} does not have an stdout"
-                )
-
-            for line in process.stdout:
-                if use_print:
-                    print(line.rstrip())
-                else:
-                    logger.info(try_parse_ansi(line.rstrip()))
-
-            success = process.wait() == 0
-            if not success:
-                if process.stderr:
-                    logger.warning(f"{SUBPROCESS_FAILED} with {process.stderr.read()}")
-                return Output(success=False, message=SUBPROCESS_FAILED)
-
-            return Output(success=True, message="Subprocess executed successfully")
-
-    except subprocess.CalledProcessError as exc:
-        logger.warning(
-            f"'{command_argument}': failed with return code: {exc.returncode} err: "
-            f"{exc.stderr.decode() if exc.stderr else 'No stderr output'}",
-            exc_info=True,
-        )
+    if capture_stdout:
+        log_capture = LogCapture(logger, log_file, level=logging.DEBUG, tail_size=None)
+    elif log_file:
+        log_capture = LogCapture(logger, log_file, use_print=use_print)
+    else:
+        log_capture = LogCapture.for_task(logger, command_argument, use_print=use_print)
 
+    try:
+        result = run_command(logger, command, timeout_seconds, log_capture)
     except FileNotFoundError:
         logger.warning(f"'{command_argument}: file not found", exc_info=True)
+        return Output(success=False, message=SUBPROCESS_FAILED)
+
+    if not result.success:
+        logger.warning(
+            f"'{command_argument}': failed with return code: {result.exit_code}"
+            f"{' after timing out' if result.timed_out else ''}"
+        )
+        return Output(
+            success=False,
+            message=f"{SUBPROCESS_FAILED}\n{log_capture.tail_message()}",
+        )
 
-    return Output(success=False, message=SUBPROCESS_FAILED)
+    if capture_stdout:
+        return Output(success=True, message="\n".join(result.output) + "\n")
+    return Output(success=True, message="Subprocess executed successfully")
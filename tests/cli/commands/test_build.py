@@ -1,5 +1,8 @@
 import logging
 import shutil
+import threading
+import time
+from pathlib import Path
 
 from click.testing import CliRunner
 
@@ -9,6 +12,7 @@ from src.mpyl.project_execution import ProjectExecution
 from src.mpyl.run_plan import RunPlan
 from src.mpyl.steps import Step, Meta, ArtifactType, Input, Output
 from src.mpyl.steps.build import STAGE_NAME
+from src.mpyl.steps.deploy import STAGE_NAME as DEPLOY_STAGE_NAME
 from src.mpyl.steps.run import RunResult
 from src.mpyl.steps.run_properties import construct_run_properties
 from src.mpyl.steps.executor import Executor, StepsCollection
@@ -42,6 +46,42 @@ class ThrowingStep(Step):
         raise Exception("this is not good")
 
 
+class RecordingDeploy(Step):
+    started: list[str] = []
+    finished: list[str] = []
+    running: set[str] = set()
+    max_running = 0
+    lock = threading.Lock()
+
+    def __init__(self, logger: logging.Logger) -> None:
+        super().__init__(
+            logger,
+            Meta(
+                name="Recording Deploy",
+                description="Deploy step that records concurrent deploys",
+                version="0.0.1",
+                stage=DEPLOY_STAGE_NAME,
+            ),
+            produced_artifact=ArtifactType.NONE,
+            required_artifact=ArtifactType.NONE,
+        )
+
+    def execute(self, step_input: Input) -> Output:
+        path = step_input.project_execution.project.path
+        with self.lock:
+            RecordingDeploy.started.append(path)
+            RecordingDeploy.running.add(path)
+            RecordingDeploy.max_running = max(self.max_running, len(self.running))
+        time.sleep(0.1)
+        with self.lock:
+            RecordingDeploy.running.remove(path)
+            RecordingDeploy.finished.append(path)
+        return Output(
+            success=step_input.project_execution.project.root_path.name != "a-failing",
+            message=f"Deployed {path}",
+        )
+
+
 class TestBuildCommand:
     resource_path = root_test_path / "cli" / "test_resources"
     config_path = root_test_path / "test_resources/mpyl_config.yml"
@@ -129,6 +169,56 @@ class TestBuildCommand:
         assert result.exception.project_name == "test"
         assert result.exception.executor == "Throwing Build"
 
+    def _deploy_concurrently(self, root: Path, paths: list[str]) -> RunResult:
+        projects = {
+            get_project_with_stages(
+                {"deploy": "Recording Deploy"}, path=str(root / path)
+            )
+            for path in paths
+        }
+        run_plan = RunPlan.from_plan(
+            {
+                TestStage.deploy(): {
+                    ProjectExecution(p, frozenset(), None, False) for p in projects
+                }
+            }
+        )
+        config = config_values | {
+            "kubernetes": config_values["kubernetes"] | {"maxConcurrentDeploys": 3}
+        }
+        run_properties = construct_run_properties(
+            config=config,
+            properties=properties_values,
+            run_plan=run_plan,
+            all_projects=projects,
+        )
+        RecordingDeploy.started.clear()
+        RecordingDeploy.finished.clear()
+        RecordingDeploy.max_running = 0
+        executor = Executor(self.logger, run_properties, StepsCollection(self.logger))
+        return run_build(self.logger, RunResult(run_properties), executor, None)
+
+    def test_run_build_deploys_concurrently_after_first_deploy_to_namespace(
+        self, tmp_path: Path
+    ):
+        paths = [f"project{i}/deployment/project.yml" for i in range(4)]
+        result = self._deploy_concurrently(tmp_path, paths)
+
+        assert result.is_success
+        assert len(result.results_for_stage(TestStage.deploy())) == 4
+        assert RecordingDeploy.started[0] == RecordingDeploy.finished[0]
+        assert RecordingDeploy.max_running == 3
+
+    def test_run_build_stops_deploying_after_failure(self, tmp_path: Path):
+        result = self._deploy_concurrently(
+            tmp_path, ["a-failing/deployment/project.yml", "b/deployment/project.yml"]
+        )
+
+        assert not result.is_success
+        assert RecordingDeploy.started == [
+            str(tmp_path / "a-failing/deployment/project.yml")
+        ]
+
     def test_build_clean_output(self):
         result = self.runner.invoke(
             main_group,
@@ -145,3 +235,22 @@ class TestBuildCommand:
         )
 
         assert "Nothing to clean" in result.output
+
+    def test_build_artifacts_render_output(self):
+        result = self.runner.invoke(
+            main_group,
+            [
+                "build",
+                "-c",
+                str(self.config_path),
+                "-p",
+                str(self.run_properties_path),
+                "artifacts",
+                "render",
+                "--filter",
+                "non_existing_project",
+            ],
+        )
+
+        assert "files changed, listed in" in result.output
+        assert "changed_manifests.txt" in result.output
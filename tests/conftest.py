@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def log_folder(tmp_path, monkeypatch):
+    """Keeps the logs of the tasks that the tests run out of the checkout"""
+    monkeypatch.setattr(
+        "src.mpyl.utilities.logging.log_folder", lambda: tmp_path / "logs"
+    )
@@ -0,0 +1,13 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The plugins import `mpyl` as it is installed in the projects that use them
+sys.path.append(str(Path(__file__).parents[2] / "src"))
+
+
+@pytest.fixture(autouse=True)
+def plugin_log_folder(tmp_path, monkeypatch):
+    """Keeps the logs of the tasks that the plugins run out of the checkout"""
+    monkeypatch.setattr("mpyl.utilities.logging.log_folder", lambda: tmp_path / "logs")
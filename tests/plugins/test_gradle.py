@@ -0,0 +1,68 @@
+import contextlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from plugins.gradle import GradleStep, run_gradle, to_gradle_project
+
+
+def _write_fake_gradle(folder: Path, script: str) -> None:
+    fake_gradle = folder / "gradlew"
+    fake_gradle.write_text(f"#!/bin/sh\n{script}", encoding="utf-8")
+    os.chmod(fake_gradle, 0o755)
+
+
+def _run_failing_gradle(failed_task: str):
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.chdir(tmp_dir):
+        _write_fake_gradle(
+            Path(tmp_dir),
+            f"echo \"Execution failed for task '{failed_task}'.\"\nexit 1\n",
+        )
+        return run_gradle(
+            logging.getLogger(), [Path("projects/a"), Path("projects/b")], "test"
+        )
+
+
+def _step_input(name: str, run_plan: MagicMock) -> MagicMock:
+    step_input = MagicMock()
+    step_input.project_execution.name = name
+    step_input.project_execution.project.root_path = Path("projects", name)
+    step_input.run_properties.run_plan = run_plan
+    return step_input
+
+
+def _run_plan(names: list[str]) -> MagicMock:
+    run_plan = MagicMock()
+    run_plan.get_executions_for_step.return_value = [
+        _step_input(name, run_plan).project_execution for name in names
+    ]
+    return run_plan
+
+
+class TestGradle:
+    def test_attribute_failure_to_project_in_invocation(self):
+        result = _run_failing_gradle(":projects:b:test")
+
+        assert not result.success
+        assert result.failed_projects == {":projects:b"}
+        assert result.succeeded_for(to_gradle_project(Path("projects/a")))
+        assert not result.succeeded_for(to_gradle_project(Path("projects/b")))
+
+    def test_fail_all_projects_when_a_task_outside_invocation_fails(self):
+        result = _run_failing_gradle(":common:compileJava")
+
+        assert result.unattributed_failure
+        assert not result.succeeded_for(":projects:a")
+        assert not result.succeeded_for(":projects:b")
+
+    def test_results_are_scoped_to_the_run(self):
+        step = GradleStep(logging.getLogger(), MagicMock(), "test", MagicMock())
+        with tempfile.TemporaryDirectory() as tmp_dir, contextlib.chdir(tmp_dir):
+            _write_fake_gradle(Path(tmp_dir), 'echo "$@" >> invocations.txt\n')
+            first_run = _run_plan(["a", "b"])
+
+            assert step.run_task(_step_input("a", first_run)).success
+            assert step.run_task(_step_input("b", _run_plan(["b"]))).success
+            assert len(Path("invocations.txt").read_text("utf-8").splitlines()) == 2
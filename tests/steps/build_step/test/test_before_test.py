@@ -0,0 +1,61 @@
+from python_on_whales.components.system.models import DockerEvent
+
+from src.mpyl.steps.test.before_test import ComposeReadiness
+
+
+def container_event(name: str, action: str, **attributes) -> DockerEvent:
+    return DockerEvent.model_validate(
+        {
+            "Type": "container",
+            "Action": action,
+            "Actor": {"ID": name, "Attributes": {"name": name, **attributes}},
+        }
+    )
+
+
+class TestIntegrationTestBefore:
+    def test_ready_when_all_containers_are_healthy(self):
+        readiness = ComposeReadiness(
+            awaiting={"postgres": "starting", "kafka": "starting"}
+        )
+
+        readiness.process(container_event("postgres", "health_status: healthy"))
+        readiness.process(container_event("kafka", "health_status: unhealthy"))
+        assert not readiness.ready
+        assert readiness.unhealthy == {"kafka": "unhealthy"}
+
+        readiness.process(container_event("other", "health_status: healthy"))
+        readiness.process(container_event("kafka", "health_status: healthy"))
+        assert readiness.ready
+
+    def test_fail_when_a_container_stops(self):
+        readiness = ComposeReadiness(awaiting={"postgres": "starting"})
+
+        readiness.process(container_event("postgres", "die", exitCode="1"))
+        assert not readiness.ready
+        assert readiness.failed == {"postgres": "exited with exit code 1"}
+
+    def test_wait_for_containers_that_are_restarted(self):
+        readiness = ComposeReadiness(
+            awaiting={"api": "created"}, restarted=frozenset({"api"})
+        )
+
+        readiness.process(container_event("api", "die", exitCode="1"))
+        assert not readiness.failed
+        assert readiness.awaiting == {"api": "restarting after exit code 1"}
+
+        readiness.process(container_event("api", "start"))
+        assert readiness.ready
+
+    def test_restarted_container_with_health_check_must_become_healthy(self):
+        readiness = ComposeReadiness(
+            awaiting={"api": "restarting"},
+            restarted=frozenset({"api"}),
+            health_checked=frozenset({"api"}),
+        )
+
+        readiness.process(container_event("api", "start"))
+        assert readiness.awaiting == {"api": "starting"}
+
+        readiness.process(container_event("api", "health_status: healthy"))
+        assert readiness.ready
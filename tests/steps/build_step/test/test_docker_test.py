@@ -0,0 +1,17 @@
+from src.mpyl.steps.test.dockertest import to_shard_build_args
+
+
+class TestDockerTest:
+    def test_shard_build_args(self):
+        args = to_shard_build_args({"a": 3.0, "b": 2.0, "c": 1.0}, 2)
+
+        assert [a["MPYL_TEST_SUITES"] for a in args] == ["a", "b c"]
+        assert all(a["MPYL_TEST_KNOWN_SUITES"] == "a b c" for a in args)
+        assert [a["MPYL_TEST_SHARD_INDEX"] for a in args] == ["0", "1"]
+
+    def test_shard_build_args_without_timings(self):
+        args = to_shard_build_args({}, 3)
+
+        assert [a["MPYL_TEST_SHARD_INDEX"] for a in args] == ["0", "1", "2"]
+        assert all(a["MPYL_TEST_SHARD_COUNT"] == "3" for a in args)
+        assert all(not a["MPYL_TEST_SUITES"] for a in args)
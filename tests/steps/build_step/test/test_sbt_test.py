@@ -36,3 +36,37 @@ class TestBuildSbt:
             "-J-Xss2M -Duser.timezone=GMT -Djline.terminal=jline.UnixTerminal project "
             "dockertest; test"
         )
+
+    def test_sbt_test_command_with_shards_should_group_suites_in_forks(self):
+        sbt_config = dataclasses.replace(
+            self.sbt_config, test_with_coverage=False, verbose=False
+        )
+        command = TestSbt._construct_sbt_command(
+            self.step_input.project_execution.name,
+            sbt_config,
+            shards=[["a.SlowSpec"], ["b.FastSpec", "c.FastSpec"]],
+        )
+        sbt_commands = command[-1].split("; ")
+        assert len(sbt_commands) == 5
+        assert sbt_commands[0] == "project dockertest"
+        assert sbt_commands[1] == "set Test / fork := true"
+        assert sbt_commands[2].startswith(
+            "set Test / testGrouping := ((Test / definedTests).value, (Test / forkOptions).value) match "
+        )
+        assert (
+            'Map[String, Int]("a.SlowSpec" -> 0, "b.FastSpec" -> 1, "c.FastSpec" -> 1)'
+            in sbt_commands[2]
+        )
+        assert "Tags.limit(Tags.ForkedTestGroup, 2)" in command[-1]
+        assert sbt_commands[-1] == "test"
+
+    def test_sbt_test_command_with_suites_should_only_run_those(self):
+        sbt_config = dataclasses.replace(
+            self.sbt_config, test_with_coverage=False, verbose=False
+        )
+        command = TestSbt._construct_sbt_command(
+            self.step_input.project_execution.name,
+            sbt_config,
+            suites=["a.FirstSpec", "b.SecondSpec"],
+        )
+        assert command[-1] == "project dockertest; testOnly a.FirstSpec b.SecondSpec"
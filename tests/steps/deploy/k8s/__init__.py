@@ -0,0 +1,12 @@
+def deployment(generation: int, observed: int, available: int) -> dict:
+    """A deployment with two replicas, of which `available` are available in the `observed` generation"""
+    return {
+        "metadata": {"name": "a", "generation": generation},
+        "spec": {"replicas": 2, "selector": {"matchLabels": {"app": "a"}}},
+        "status": {
+            "observedGeneration": observed,
+            "replicas": 2,
+            "updatedReplicas": 2,
+            "availableReplicas": available,
+        },
+    }
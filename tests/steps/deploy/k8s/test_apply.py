@@ -0,0 +1,128 @@
+import logging
+from unittest.mock import MagicMock
+
+from kubernetes.dynamic.exceptions import ResourceNotFoundError
+
+from src.mpyl.steps import Input
+from src.mpyl.steps.deploy.k8s.apply import (
+    ChartApplier,
+    to_manifests,
+    FIELD_MANAGER,
+    MANAGED_BY_LABEL,
+)
+from src.mpyl.project_execution import ProjectExecution
+from src.mpyl.steps.deploy.k8s.chart import (
+    ChartBuilder,
+    to_service_chart,
+    to_job_chart,
+)
+from tests.steps.deploy.k8s import deployment
+from tests.test_resources import test_data
+from tests.test_resources.test_data import (
+    get_project_execution,
+    get_job_project,
+    RUN_PROPERTIES,
+)
+
+
+class TestApply:
+    output = test_data.get_output()
+    chart = to_service_chart(
+        ChartBuilder(
+            Input(get_project_execution(), RUN_PROPERTIES, output.produced_artifact)
+        )
+    )
+
+    @staticmethod
+    def _dynamic_client(existing: list[str]) -> MagicMock:
+        """A client on which the deployments with the `existing` names are deployed"""
+        dynamic_client = MagicMock()
+        dynamic_client.resources.get.side_effect = lambda api_version, kind: (
+            MagicMock(kind=kind)
+        )
+        items = [MagicMock() for _ in existing]
+        for item, name in zip(items, existing):
+            item.metadata.name = name
+        dynamic_client.get.side_effect = lambda resource, **_: MagicMock(
+            items=items if resource.kind == "Deployment" else [],
+            to_dict=lambda: deployment(2, 2, 2),
+        )
+        dynamic_client.watch.side_effect = lambda resource, **_: (
+            [
+                {"type": "MODIFIED", "raw_object": deployment(2, 1, 0)},
+                {"type": "MODIFIED", "raw_object": deployment(2, 2, 2)},
+            ]
+            if resource.kind == "Deployment"
+            else []
+        )
+        return dynamic_client
+
+    def test_manifests_should_be_labeled_and_ordered(self):
+        manifests = to_manifests(self.chart, "dockertest", "namespace")
+        kinds = [m.kind for m in manifests]
+
+        assert kinds.index("ServiceAccount") < kinds.index("Deployment")
+        assert kinds.index("Service") < kinds.index("Deployment")
+        assert all(m.body["metadata"]["namespace"] == "namespace" for m in manifests)
+        assert all(
+            m.body["metadata"]["labels"][MANAGED_BY_LABEL] == FIELD_MANAGER
+            for m in manifests
+        )
+
+    def test_apply_should_prune_resources_no_longer_in_chart(self):
+        dynamic_client = self._dynamic_client(existing=["dockertest", "removed"])
+        applier = ChartApplier(logging.getLogger(), dynamic_client, "namespace")
+
+        output = applier.apply(self.chart, "dockertest", dry_run=False)
+
+        assert output.success, output.message
+        applied = dynamic_client.server_side_apply.call_args_list
+        assert len(applied) == len(self.chart)
+        assert all(call.kwargs["field_manager"] == FIELD_MANAGER for call in applied)
+        pruned = {call.kwargs["name"] for call in dynamic_client.delete.call_args_list}
+        assert pruned == {"removed"}
+
+    def test_dry_run_should_only_validate(self):
+        dynamic_client = self._dynamic_client(existing=["removed"])
+        applier = ChartApplier(logging.getLogger(), dynamic_client, "namespace")
+
+        output = applier.apply(self.chart, "dockertest", dry_run=True)
+
+        assert output.success
+        assert all(
+            call.kwargs["dry_run"] == "All"
+            for call in dynamic_client.server_side_apply.call_args_list
+        )
+        dynamic_client.delete.assert_not_called()
+        dynamic_client.watch.assert_not_called()
+
+    def test_apply_of_unknown_kind_should_fail(self):
+        dynamic_client = self._dynamic_client(existing=[])
+        dynamic_client.resources.get.side_effect = ResourceNotFoundError("Unknown")
+        applier = ChartApplier(logging.getLogger(), dynamic_client, "namespace")
+
+        output = applier.apply(self.chart, "dockertest", dry_run=False)
+
+        assert not output.success
+        assert "Unknown" in output.message
+
+    def test_apply_should_fail_when_replaced_job_is_not_deleted(self):
+        job_chart = to_job_chart(
+            ChartBuilder(
+                Input(
+                    ProjectExecution(get_job_project(), frozenset(), None, False),
+                    RUN_PROPERTIES,
+                    self.output.produced_artifact,
+                )
+            )
+        )
+        dynamic_client = self._dynamic_client(existing=[])
+        dynamic_client.delete.return_value = MagicMock(kind="Job")
+        applier = ChartApplier(logging.getLogger(), dynamic_client, "namespace")
+
+        output = applier.apply(job_chart, "job", dry_run=False, replace_jobs=True)
+
+        assert not output.success
+        assert "was not deleted" in output.message
+        applied = dynamic_client.server_side_apply.call_args_list
+        assert all(call.args[0].kind != "Job" for call in applied)
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from src.mpyl.steps.deploy.k8s import clients
+from src.mpyl.steps.deploy.k8s.clients import (
+    api_client,
+    close_api_clients,
+    CONNECTION_POOL_SIZE,
+)
+
+
+class TestClients:
+    @patch("kubernetes.config.load_kube_config")
+    def test_should_load_kube_config_once_per_context(self, load_kube_config):
+        try:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                first = list(pool.map(api_client, ["a", "a", "b", "a"]))
+
+            assert first[0] is first[1] is first[3]
+            assert first[2] is not first[0]
+            assert load_kube_config.call_count == 2
+            assert sorted(
+                c.kwargs["context"] for c in load_kube_config.call_args_list
+            ) == ["a", "b"]
+            assert first[0].configuration.connection_pool_maxsize == (
+                CONNECTION_POOL_SIZE
+            )
+        finally:
+            close_api_clients()
+
+    @patch("kubernetes.config.load_kube_config")
+    def test_should_create_new_clients_after_close(self, load_kube_config):
+        first = api_client("a")
+        close_api_clients()
+
+        assert not clients._clients  # pylint: disable=protected-access
+        assert api_client("a") is not first
+        assert load_kube_config.call_count == 2
+        close_api_clients()
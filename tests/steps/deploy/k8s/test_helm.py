@@ -1,14 +1,28 @@
+import base64
+import gzip
+import json
+import logging
 import tempfile
 from pathlib import Path
+from unittest.mock import MagicMock
 
 from src.mpyl.run_plan import RunPlan
 from src.mpyl.steps import Input
 from src.mpyl.steps.deploy.k8s.chart import ChartBuilder, to_service_chart
-from src.mpyl.steps.deploy.k8s.helm import write_chart, to_chart_metadata
+from src.mpyl.steps.deploy.k8s.helm import (
+    write_chart,
+    to_chart_metadata,
+    write_helm_chart,
+    to_manifest_hash,
+    deployed_manifest_hash,
+    MANIFEST_HASH_ANNOTATION,
+    _write_chart_files,
+)
 from tests.test_resources import test_data
 from tests.test_resources.test_data import (
     TestStage,
     get_project_execution,
+    RUN_PROPERTIES,
 )
 
 
@@ -31,3 +45,82 @@ class TestHelm:
                 to_chart_metadata("chart_name", test_data.RUN_PROPERTIES),
                 {},
             )
+
+    @staticmethod
+    def _release_secret(version: int, annotations: dict) -> MagicMock:
+        release = {"chart": {"metadata": {"name": "a", "annotations": annotations}}}
+        helm_encoded = base64.b64encode(gzip.compress(json.dumps(release).encode()))
+        secret = MagicMock()
+        secret.metadata.labels = {"version": str(version)}
+        secret.data = {"release": base64.b64encode(helm_encoded).decode()}
+        return secret
+
+    def test_write_helm_chart_should_record_manifest_hash(self):
+        output = test_data.get_output()
+        builder = ChartBuilder(
+            Input(get_project_execution(), RUN_PROPERTIES, output.produced_artifact)
+        )
+        chart = to_service_chart(builder)
+        with tempfile.TemporaryDirectory() as tempdir:
+            first = write_helm_chart(
+                logging.getLogger(), chart, Path(tempdir), RUN_PROPERTIES, "a"
+            )
+            second = write_helm_chart(
+                logging.getLogger(), chart, Path(tempdir), RUN_PROPERTIES, "a"
+            )
+            chart_metadata = (first.path / "Chart.yaml").read_text(encoding="utf-8")
+
+        assert first.manifest_hash == second.manifest_hash
+        assert first.files.changed and not second.files.changed
+        assert f"{MANIFEST_HASH_ANNOTATION}: {first.manifest_hash}" in chart_metadata
+
+    def test_write_chart_should_only_write_changed_files(self):
+        templates = {"deployment.yaml": "replicas: 1", "service.yaml": "port: 80"}
+        with tempfile.TemporaryDirectory() as tempdir:
+            chart_path = Path(tempdir)
+            first = _write_chart_files(chart_path, "name: a", {}, templates)
+            deployment = chart_path / "templates" / "deployment.yaml"
+            modified = deployment.stat().st_mtime_ns
+
+            unchanged = _write_chart_files(chart_path, "name: a", {}, templates)
+            assert modified == deployment.stat().st_mtime_ns
+            changed = _write_chart_files(
+                chart_path, "name: a", {}, {"service.yaml": "port: 81"}
+            )
+
+            assert len(first.written) == 4
+            assert not unchanged.changed
+            assert changed.written == [chart_path / "templates" / "service.yaml"]
+            assert changed.removed == [deployment]
+            assert not deployment.exists()
+
+    def test_manifest_hash_should_change_with_templates(self):
+        templates = {"deployment.yaml": "replicas: 1", "service.yaml": "port: 80"}
+        assert to_manifest_hash("name: a", templates) == to_manifest_hash(
+            "name: a", dict(reversed(templates.items()))
+        )
+        assert to_manifest_hash("name: a", templates) != to_manifest_hash(
+            "name: a", templates | {"deployment.yaml": "replicas: 2"}
+        )
+
+    def test_deployed_manifest_hash_should_be_read_from_latest_release(self):
+        core_api = MagicMock()
+        core_api.list_namespaced_secret.return_value.items = [
+            self._release_secret(2, {MANIFEST_HASH_ANNOTATION: "new"}),
+            self._release_secret(1, {MANIFEST_HASH_ANNOTATION: "old"}),
+        ]
+
+        assert deployed_manifest_hash(core_api, "a", "namespace") == "new"
+        core_api.list_namespaced_secret.assert_called_once_with(
+            "namespace", label_selector="owner=helm,name=a,status=deployed"
+        )
+
+    def test_deployed_manifest_hash_without_release_should_be_none(self):
+        core_api = MagicMock()
+        core_api.list_namespaced_secret.return_value.items = []
+        assert deployed_manifest_hash(core_api, "a", "namespace") is None
+
+        core_api.list_namespaced_secret.return_value.items = [
+            self._release_secret(1, {})
+        ]
+        assert deployed_manifest_hash(core_api, "a", "namespace") is None
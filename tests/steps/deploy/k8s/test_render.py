@@ -0,0 +1,109 @@
+import contextlib
+import dataclasses
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from src.mpyl.project import Project
+from src.mpyl.steps.build import STAGE_NAME as BUILD_STAGE_NAME
+from src.mpyl.steps.models import Artifact, ArtifactType, Output
+from src.mpyl.utilities.docker import DockerImageSpec
+from src.mpyl.utilities import write_if_changed
+from src.mpyl.steps.deploy.k8s.render import (
+    render_projects,
+    read_changed_manifests,
+    changed_manifests_file,
+)
+from tests.test_resources.test_data import (
+    RUN_PROPERTIES,
+    get_project,
+    get_job_project,
+    get_cron_job_project,
+    get_spark_project,
+    get_project_with_stages,
+)
+
+
+def _in_folder(project: Project, folder: str) -> Project:
+    return dataclasses.replace(project, path=f"{folder}/deployment/project.yml")
+
+
+class TestRender:
+    projects = [
+        _in_folder(get_project(), "service"),
+        _in_folder(get_job_project(), "job"),
+        _in_folder(get_cron_job_project(), "cron-job"),
+        _in_folder(get_spark_project(), "spark-job"),
+    ]
+
+    def test_render_should_only_write_changed_manifests(self):
+        with TemporaryDirectory() as tmp_dir, contextlib.chdir(tmp_dir):
+            results = render_projects(self.projects, RUN_PROPERTIES, workers=2)
+
+            assert [r.error for r in results] == [None] * 4
+            manifest = Path(self.projects[0].root_path, "target/kubernetes")
+            assert (manifest / "manifest.yaml").exists()
+            assert "tag: pr-1234" in (manifest / "deployment.yaml").read_text("utf-8")
+            assert len(read_changed_manifests()) == 4
+
+            results = render_projects(self.projects, RUN_PROPERTIES, workers=2)
+
+            assert all(not r.changed_files for r in results)
+            assert not read_changed_manifests()
+            assert not list(manifest.glob(".*"))
+
+    def test_render_should_ignore_changed_revision(self):
+        next_commit = dataclasses.replace(
+            RUN_PROPERTIES,
+            versioning=dataclasses.replace(RUN_PROPERTIES.versioning, revision="456"),
+        )
+        with TemporaryDirectory() as tmp_dir, contextlib.chdir(tmp_dir):
+            render_projects(self.projects[:1], RUN_PROPERTIES, workers=1)
+            results = render_projects(self.projects[:1], next_commit, workers=1)
+
+            assert not results[0].changed_files
+            assert not read_changed_manifests()
+            details = Path(
+                self.projects[0].root_path, "target/kubernetes/deployment.yaml"
+            )
+            assert "revision: 456" in details.read_text("utf-8")
+
+    def test_render_should_only_use_image_built_at_current_revision(self):
+        project = self.projects[0]
+        manifest = Path(project.root_path, "target/kubernetes/manifest.yaml")
+
+        def render_with_build(revision: str) -> str:
+            Output(
+                success=True,
+                message="Built",
+                produced_artifact=Artifact(
+                    ArtifactType.DOCKER_IMAGE,
+                    revision,
+                    "Docker Build",
+                    DockerImageSpec(image=f"registry/service:{revision}"),
+                ),
+            ).write(project.target_path, BUILD_STAGE_NAME)
+            render_projects([project], RUN_PROPERTIES, workers=1)
+            return manifest.read_text("utf-8")
+
+        with TemporaryDirectory() as tmp_dir, contextlib.chdir(tmp_dir):
+            assert "registry/service:stale" not in render_with_build("stale")
+
+            revision = RUN_PROPERTIES.versioning.revision
+            assert f"registry/service:{revision}" in render_with_build(revision)
+
+    def test_render_should_skip_projects_without_kubernetes_deploy(self):
+        skipped = get_project_with_stages({"deploy": "Dagster Deploy"})
+
+        with TemporaryDirectory() as tmp_dir, contextlib.chdir(tmp_dir):
+            assert not render_projects([skipped], RUN_PROPERTIES, workers=1)
+            assert changed_manifests_file().read_text("utf-8") == ""
+
+    def test_write_if_changed(self):
+        with TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir, "folder", "manifest.yaml")
+
+            assert write_if_changed(file_path, "a")
+            assert not write_if_changed(file_path, "a")
+            assert write_if_changed(file_path, "b")
+            assert file_path.read_text("utf-8") == "b"
+            assert [p.name for p in file_path.parent.iterdir()] == ["manifest.yaml"]
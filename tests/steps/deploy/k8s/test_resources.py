@@ -0,0 +1,94 @@
+import pytest
+from kubernetes.client import V1ObjectMeta
+
+from src.mpyl.steps.deploy.k8s.chart import (
+    to_service_chart,
+    to_job_chart,
+    to_cron_job_chart,
+    to_spark_job_chart,
+)
+from src.mpyl.steps.deploy.k8s.resources import (
+    manifest_to_yaml,
+    to_manifest,
+    yaml,
+    CustomResourceDefinition,
+    schema_validator,
+    to_chart_manifests,
+)
+from src.mpyl.utilities.yaml import yaml_to_string
+from tests.steps.deploy.k8s import test_k8s
+from tests.test_resources.test_data import (
+    get_project,
+    get_minimal_project,
+    get_job_project,
+    get_cron_job_project,
+    get_spark_project,
+)
+
+
+def _middleware(name: str, strip_prefix: object) -> CustomResourceDefinition:
+    return CustomResourceDefinition(
+        api_version="traefik.io/v1alpha1",
+        kind="Middleware",
+        metadata=V1ObjectMeta(name=name),
+        spec={"stripPrefix": strip_prefix},
+        schema="traefik.middleware.schema.yml",
+    )
+
+
+class TestResources:
+    @pytest.mark.parametrize(
+        "project,to_chart",
+        [
+            (get_project(), to_service_chart),
+            (get_minimal_project(), to_service_chart),
+            (get_job_project(), to_job_chart),
+            (get_cron_job_project(), to_cron_job_chart),
+            (get_spark_project(), to_spark_job_chart),
+        ],
+    )
+    def test_manifest_yaml_should_be_formatted_like_yaml(self, project, to_chart):
+        # pylint: disable=protected-access
+        chart = to_chart(test_k8s.TestKubernetesChart._get_builder(project))
+        for resource in chart.values():
+            manifest = to_manifest(resource)
+            assert manifest_to_yaml(manifest) == yaml_to_string(manifest, yaml)
+
+    def test_manifest_yaml_of_special_values_should_be_formatted_like_yaml(self):
+        manifest = {
+            "quotes": ["'single'", '"double"', "yes", "1e3", "~", "- x", "x: y"],
+            "long": "x" * 90,
+            "nested": {"long": ["y " * 50, {"unicode": "é", "tab": "\t"}]},
+            "multiline": "first\nsecond",
+            "empty": {"list": [], "dict": {}},
+            "numbers": [1, 1.5, True],
+            "keys": {80: "int", True: "bool", None: "none"},
+        }
+        assert manifest_to_yaml(manifest) == yaml_to_string(manifest, yaml)
+
+    def test_schema_validator_should_be_loaded_once(self):
+        schema = "traefik.middleware.schema.yml"
+        assert schema_validator(schema) is schema_validator(schema)
+
+        with pytest.raises(ValueError, match="not found in package"):
+            schema_validator("unknown.schema.yml")
+
+    def test_chart_manifests_should_report_all_invalid_resources(self):
+        valid = _middleware("valid", {"prefixes": ["/api"]})
+        assert to_chart_manifests({"valid": valid})["valid"]["spec"] == {
+            "stripPrefix": {"prefixes": ["/api"]}
+        }
+
+        with pytest.raises(ValueError) as exc_info:
+            to_chart_manifests(
+                {
+                    "first": _middleware("first", "/api"),
+                    "valid": valid,
+                    "second": _middleware("second", "/api"),
+                }
+            )
+        assert str(exc_info.value).splitlines() == [
+            f"{name}: Schema validation failed with '/api' is not of type 'object' "
+            f"at properties.spec.properties.stripPrefix.type"
+            for name in ["first", "second"]
+        ]
@@ -0,0 +1,209 @@
+import logging
+from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock
+
+from src.mpyl.project_execution import ProjectExecution
+from src.mpyl.steps import Input
+from src.mpyl.steps.deploy.k8s.chart import ChartBuilder, to_job_chart
+from src.mpyl.steps.deploy.k8s.rollout import (
+    RolloutTracker,
+    Workload,
+    is_rolled_out,
+    rollout_failure,
+    job_failure,
+    is_job_complete,
+    pod_status,
+    to_workloads,
+)
+from tests.steps.deploy.k8s import deployment
+from tests.test_resources import test_data
+from tests.test_resources.test_data import RUN_PROPERTIES, get_job_project
+
+
+def _job(condition: str = "", reason: str = "", message: str = "") -> dict:
+    conditions = [{"type": condition, "status": "True", "reason": reason}]
+    if message:
+        conditions[0]["message"] = message
+    return {
+        "metadata": {"name": "job"},
+        "spec": {"selector": {"matchLabels": {"controller-uid": "1"}}},
+        "status": {"conditions": conditions if condition else []},
+    }
+
+
+def _pod(created: datetime, waiting: str) -> dict:
+    return {
+        "metadata": {"name": "a-1", "creationTimestamp": created.isoformat()},
+        "status": {
+            "phase": "Pending",
+            "containerStatuses": [
+                {"name": "app", "state": {"waiting": {"reason": waiting}}}
+            ],
+        },
+    }
+
+
+def _dynamic_client(events: dict[str, list[dict]], objects: dict[str, dict]):
+    """A client on which the watches of each kind return the `events` for it"""
+    dynamic_client = MagicMock()
+    dynamic_client.resources.get.side_effect = lambda api_version, kind: (
+        MagicMock(kind=kind)
+    )
+    dynamic_client.get.side_effect = lambda resource, **_: MagicMock(
+        to_dict=lambda: objects[resource.kind]
+    )
+    dynamic_client.watch.side_effect = lambda resource, **_: [
+        {"type": "MODIFIED", "raw_object": body}
+        for body in events.get(resource.kind, [])
+    ]
+    return dynamic_client
+
+
+class TestRollout:
+    logger = logging.getLogger()
+
+    def test_should_wait_until_deployment_is_rolled_out(self):
+        dynamic_client = _dynamic_client(
+            {"Deployment": [deployment(2, 1, 0), deployment(2, 2, 2)]},
+            {"Deployment": deployment(2, 2, 2)},
+        )
+        tracker = RolloutTracker(self.logger, dynamic_client, "namespace")
+
+        output = tracker.await_rollout([Workload("Deployment", "a")])
+
+        assert output.success, output.message
+        assert output.message == "Rolled out Deployment a"
+
+    def test_should_fail_as_soon_as_pod_cannot_start(self, caplog):
+        caplog.set_level(logging.INFO)
+        created = datetime.now(timezone.utc) + timedelta(seconds=10)
+        dynamic_client = _dynamic_client(
+            {
+                "Deployment": [deployment(2, 2, 0)],
+                "Pod": [_pod(created, "ImagePullBackOff")],
+            },
+            {"Deployment": deployment(2, 2, 0)},
+        )
+        tracker = RolloutTracker(self.logger, dynamic_client, "namespace")
+
+        output = tracker.await_rollout([Workload("Deployment", "a")])
+
+        assert not output.success
+        assert output.message == (
+            "Deployment a failed: container app of pod a-1 is in ImagePullBackOff"
+        )
+        assert "Pod a-1 of Deployment a: Pending: app ImagePullBackOff" in caplog.text
+
+    def test_pods_of_previous_rollout_should_not_fail_it(self):
+        previous = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        dynamic_client = _dynamic_client(
+            {
+                "Deployment": [deployment(2, 1, 0), deployment(2, 2, 2)],
+                "Pod": [_pod(previous, "CrashLoopBackOff")],
+            },
+            {"Deployment": deployment(2, 2, 2)},
+        )
+        tracker = RolloutTracker(self.logger, dynamic_client, "namespace")
+
+        assert tracker.await_rollout([Workload("Deployment", "a")]).success
+
+    def test_should_report_failed_job(self):
+        failed = _job("Failed", "BackoffLimitExceeded", "Job has reached the limit")
+        dynamic_client = _dynamic_client({"Job": [_job(), failed]}, {"Job": failed})
+        tracker = RolloutTracker(self.logger, dynamic_client, "namespace")
+
+        output = tracker.await_rollout([Workload("Job", "job")])
+
+        assert not output.success
+        assert output.message == (
+            "Job job failed: BackoffLimitExceeded: Job has reached the limit"
+        )
+
+    def test_should_follow_running_jobs_of_cron_job(self):
+        cron_job = {"status": {"active": [{"kind": "Job", "name": "job-123"}]}}
+        dynamic_client = _dynamic_client(
+            {"Job": [_job("Complete")]}, {"CronJob": cron_job, "Job": _job()}
+        )
+        tracker = RolloutTracker(self.logger, dynamic_client, "namespace")
+
+        output = tracker.await_rollout([Workload("CronJob", "job")])
+
+        assert output.success
+        assert output.message == "Rolled out Job job-123"
+
+        idle = _dynamic_client({}, {"CronJob": {"status": {}}})
+        output = RolloutTracker(self.logger, idle, "namespace").await_rollout(
+            [Workload("CronJob", "job")]
+        )
+        assert output.success
+        idle.watch.assert_not_called()
+
+    def test_should_time_out(self):
+        dynamic_client = _dynamic_client({}, {"Deployment": deployment(2, 2, 0)})
+        tracker = RolloutTracker(self.logger, dynamic_client, "namespace", timeout=0)
+
+        output = tracker.await_rollout([Workload("Deployment", "a")])
+
+        assert not output.success
+        assert output.message == "Not rolled out within 0 seconds"
+
+    def test_should_fail_when_watch_fails(self):
+        dynamic_client = _dynamic_client({}, {"Deployment": deployment(2, 2, 0)})
+        dynamic_client.watch.side_effect = ConnectionResetError("Connection reset")
+        tracker = RolloutTracker(self.logger, dynamic_client, "namespace", timeout=5)
+
+        output = tracker.await_rollout([Workload("Deployment", "a")])
+
+        assert not output.success
+        assert output.message == "Deployment a failed: Connection reset"
+
+    def test_workloads_of_chart(self):
+        output = test_data.get_output()
+        chart = to_job_chart(
+            ChartBuilder(
+                Input(
+                    ProjectExecution(get_job_project(), frozenset(), None, False),
+                    RUN_PROPERTIES,
+                    output.produced_artifact,
+                )
+            )
+        )
+        assert to_workloads(chart) == [Workload("Job", "job")]
+
+    def test_rollout_status(self):
+        assert not is_rolled_out(deployment(2, 1, 2))
+        assert not is_rolled_out(deployment(2, 2, 1))
+        assert is_rolled_out(deployment(2, 2, 2))
+
+        stuck = deployment(2, 2, 0)
+        stuck["status"]["conditions"] = [
+            {
+                "type": "Progressing",
+                "reason": "ProgressDeadlineExceeded",
+                "message": "ReplicaSet has timed out progressing.",
+            }
+        ]
+        assert rollout_failure(stuck) == "ReplicaSet has timed out progressing."
+        assert rollout_failure(deployment(2, 2, 2)) is None
+
+    def test_job_status(self):
+        assert is_job_complete(_job("Complete"))
+        assert not is_job_complete(_job())
+        assert job_failure(_job("Failed", "DeadlineExceeded")) == "DeadlineExceeded"
+        assert job_failure(_job("Complete")) is None
+
+    def test_pod_status(self):
+        pod = _pod(datetime.now(timezone.utc), "ContainerCreating")
+        assert pod_status(pod) == "Pending: app ContainerCreating"
+
+        pod["status"] = {
+            "phase": "Failed",
+            "containerStatuses": [
+                {
+                    "name": "app",
+                    "state": {"terminated": {"reason": "Error", "exitCode": 1}},
+                }
+            ],
+        }
+        assert pod_status(pod) == "Failed: app Error with exit code 1"
+        assert pod_status({"status": {"phase": "Running"}}) == "Running"
@@ -45,3 +45,15 @@ class TestModels:
             None,
         )
         assert properties.validate() == "Either pr_number or tag need to be set"
+
+    def test_pull_request_should_target_main_branch_by_default(self):
+        run_properties = construct_run_properties(
+            config=self.config_values,
+            properties=self.run_properties_values,
+            run_plan=RunPlan.empty(),
+            all_projects=set(),
+            root_dir=self.resource_path,
+        )
+
+        assert run_properties.versioning.pr_number
+        assert run_properties.versioning.target_branch == "main"
@@ -0,0 +1,128 @@
+import logging
+from pathlib import Path
+from unittest.mock import patch
+
+from src.mpyl.utilities.docker.compose import (
+    ComposeStack,
+    close_compose_stacks,
+    compose_stack_key,
+    published_ports,
+    release_conflicting_stacks,
+    shared_compose_stack,
+    stop_compose_stacks,
+)
+
+POSTGRES = """services:
+  postgres:
+    image: postgres:15
+    healthcheck:
+      test: [ "CMD", "pg_isready" ]
+"""
+POSTGRES_ON_PORT = POSTGRES + '    ports:\n      - "5432:5432"\n'
+POSTGRES_WITH_SCRIPT = (
+    POSTGRES + "    volumes:\n      - ./init.sql:/docker-entrypoint-initdb.d/init.sql\n"
+)
+
+
+def write_compose_file(path: Path, content: str) -> Path:
+    path.mkdir(parents=True)
+    compose_file = path / "docker-compose-test.yml"
+    compose_file.write_text(content)
+    return compose_file
+
+
+class TestCompose:
+    logger = logging.getLogger()
+
+    def test_identical_compose_files_share_a_key(self, tmp_path: Path):
+        first = write_compose_file(tmp_path / "first", POSTGRES)
+        second = write_compose_file(tmp_path / "second", POSTGRES)
+
+        assert compose_stack_key(first) == compose_stack_key(second)
+
+    def test_compose_files_with_local_files_do_not_share_a_key(self, tmp_path: Path):
+        first = write_compose_file(tmp_path / "first", POSTGRES_WITH_SCRIPT)
+        second = write_compose_file(tmp_path / "second", POSTGRES_WITH_SCRIPT)
+
+        assert compose_stack_key(first) != compose_stack_key(second)
+
+    def test_compose_files_with_env_files_do_not_share_a_key(self, tmp_path: Path):
+        env_file = POSTGRES + "    env_file: test.env\n"
+        assert compose_stack_key(
+            write_compose_file(tmp_path / "first", env_file)
+        ) != compose_stack_key(write_compose_file(tmp_path / "second", env_file))
+
+        secret = POSTGRES + "secrets:\n  password:\n    file: password.txt\n"
+        assert compose_stack_key(
+            write_compose_file(tmp_path / "third", secret)
+        ) != compose_stack_key(write_compose_file(tmp_path / "fourth", secret))
+
+    def test_compose_files_with_dot_env_do_not_share_a_key(self, tmp_path: Path):
+        first = write_compose_file(tmp_path / "first", POSTGRES)
+        second = write_compose_file(tmp_path / "second", POSTGRES)
+        (tmp_path / "second" / ".env").write_text("POSTGRES_VERSION=16\n")
+
+        assert compose_stack_key(first) != compose_stack_key(second)
+
+    def test_started_stacks_are_stopped_once(self, tmp_path: Path):
+        first = write_compose_file(tmp_path / "first", POSTGRES)
+        second = write_compose_file(tmp_path / "second", POSTGRES)
+
+        stack = shared_compose_stack(first)
+        assert shared_compose_stack(second) is stack
+        assert stack.project_name.startswith("mpyl-")
+        stack.started = True
+
+        with patch.object(ComposeStack, "down") as down:
+            stop_compose_stacks(self.logger)
+            close_compose_stacks(self.logger)
+            down.assert_called_once_with(self.logger)
+
+        assert shared_compose_stack(first) is not stack
+        close_compose_stacks(self.logger)
+
+    def test_published_ports(self, tmp_path: Path):
+        compose_file = write_compose_file(
+            tmp_path / "ports",
+            POSTGRES_ON_PORT
+            + '      - "127.0.0.1:8000-8001:8000-8001/udp"\n'
+            + '      - "9000"\n'
+            + "      - target: 80\n"
+            + "        published: 8080\n",
+        )
+
+        assert published_ports(compose_file) == {
+            "5432/tcp",
+            "8000/udp",
+            "8001/udp",
+            "8080/tcp",
+        }
+
+    def test_stacks_that_publish_the_same_ports_are_not_up_at_once(
+        self, tmp_path: Path
+    ):
+        postgres_15 = shared_compose_stack(
+            write_compose_file(tmp_path / "first", POSTGRES_ON_PORT)
+        )
+        postgres_16 = shared_compose_stack(
+            write_compose_file(
+                tmp_path / "second", POSTGRES_ON_PORT.replace("15", "16")
+            )
+        )
+        other_port = shared_compose_stack(
+            write_compose_file(
+                tmp_path / "third", POSTGRES_ON_PORT.replace("5432:", "5433:")
+            )
+        )
+        assert postgres_15 is not postgres_16
+        postgres_15.started = other_port.started = True
+
+        with patch.object(ComposeStack, "down", autospec=True) as down:
+            release_conflicting_stacks(self.logger, postgres_16)
+            down.assert_called_once_with(postgres_15, self.logger)
+
+        assert shared_compose_stack(postgres_16.compose_file) is postgres_16
+        assert shared_compose_stack(other_port.compose_file) is other_port
+        assert shared_compose_stack(postgres_15.compose_file) is not postgres_15
+        with patch.object(ComposeStack, "down"):
+            close_compose_stacks(self.logger)
@@ -1,11 +1,44 @@
+import base64
+import dataclasses
+import logging
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+from git import Repo
+from python_on_whales import docker
+
+from src.mpyl.steps.models import Input, VersioningProperties
 from src.mpyl.utilities.docker import (
+    DockerCacheExportMode,
     DockerConfig,
+    DockerContextConfig,
+    DockerRegistryConfig,
+    build_context_paths,
+    cache_arguments,
+    cache_chain,
+    clear_registry_sessions,
+    create_ecr_repo_if_needed,
+    context_size,
+    docker_ignore_contents,
     docker_registry_path,
     ecr_repository_path,
+    login,
+    manifest_exists,
     registry_for_project,
+    retag_in_registry,
+    to_bake_definition,
 )
 
-from tests.test_resources.test_data import get_config_values, get_project
+from src.mpyl.utilities.docker.content import content_image_tag
+from tests.test_resources.test_data import (
+    RUN_PROPERTIES,
+    get_config_values,
+    get_project,
+    get_project_execution,
+)
 
 
 class TestDocker:
@@ -23,3 +56,294 @@ class TestDocker:
         default_registry = registry_for_project(conf, get_project())
         host_name = f"{default_registry}/repo/project"
         assert ecr_repository_path(host_name, "JOB:pr-392") == "repo/project/job"
+
+    def test_bake_definition_exports_test_reports(self):
+        definition = to_bake_definition(
+            root_path=".",
+            file_path="tests/projects/service/deployment/Dockerfile-mpl",
+            image_tag="nodeservice:pr-123",
+            target="builder",
+            test_target="tester",
+            test_report_path=Path("tests/projects/service/target/test-reports"),
+            build_args={"SOME_ENV": "Test"},
+        )
+        assert definition["group"]["default"]["targets"] == ["test-reports", "image"]
+        targets = definition["target"]
+        assert targets["image"]["target"] == "builder"
+        assert targets["image"]["tags"] == ["nodeservice:pr-123"]
+        assert targets["tester"]["target"] == "tester"
+        assert "output" not in targets["tester"]
+        assert targets["test-reports"]["contexts"] == {"tester": "target:tester"}
+        assert (
+            "COPY --from=tester /tests/projects/service/target/test-reports/ /"
+            in targets["test-reports"]["dockerfile-inline"]
+        )
+        assert targets["test-reports"]["output"] == [
+            f"type=local,dest={Path('tests/projects/service/target/test-reports').absolute()}"
+        ]
+
+    def test_bake_definition_without_image(self):
+        definition = to_bake_definition(
+            root_path=".",
+            file_path="Dockerfile-mpl",
+            image_tag="image:latest",
+            target="builder",
+            test_target="tester",
+            test_report_path=Path("target/test-reports"),
+            build_args={},
+            include_image=False,
+        )
+        assert definition["group"]["default"]["targets"] == ["test-reports"]
+        assert "image" not in definition["target"]
+
+    def test_build_context_paths(self):
+        conf = dataclasses.replace(
+            DockerConfig.from_dict(get_config_values()),
+            context=DockerContextConfig(minimal=True, shared_folders=["project/"]),
+        )
+        assert build_context_paths(get_project(), conf) == [
+            ".",
+            "project",
+            "test/docker",
+        ]
+
+    def test_docker_ignore_contents(self):
+        assert docker_ignore_contents(["project", "tests/projects/service"]) == (
+            "*\n!project\n!tests/projects/service\n**/target/*\n**/.mpyl/*"
+        )
+        assert docker_ignore_contents([]) == "**/target/*\n**/.mpyl/*"
+        assert docker_ignore_contents([".", "project"]) == "**/target/*\n**/.mpyl/*"
+
+    def test_context_size_skips_ignored_folders(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            (root / "service" / "target").mkdir(parents=True)
+            (root / "service" / "src.py").write_text("12345")
+            (root / "service" / "target" / "app.jar").write_text("1234567890")
+            (root / "shared.txt").write_text("123")
+            (root / "other.txt").write_text("1234567")
+
+            assert context_size(tmp_dir, ["service", "shared.txt"]) == 8
+
+    max_cache_registry = DockerRegistryConfig.from_dict(
+        {
+            "hostName": "registry.io",
+            "userName": "user",
+            "password": "password",
+            "cache": {
+                "cacheFromRegistry": True,
+                "exportMode": "max",
+                "fallbackBranches": ["main"],
+            },
+        }
+    )
+
+    def test_cache_chain_for_pull_request(self):
+        versioning = VersioningProperties(
+            "abc", "feature/branch", 123, None, target_branch="release/1.0"
+        )
+        assert cache_chain(self.max_cache_registry, "service:pr-123", versioning) == [
+            "registry.io/service:cache-pr-123",
+            "registry.io/service:cache-release-1.0",
+            "registry.io/service:cache-main",
+        ]
+
+    def test_cache_chain_for_tag_of_main(self):
+        versioning = VersioningProperties("abc", "main", None, "20230829-1234")
+        assert cache_chain(
+            self.max_cache_registry, "service:20230829-1234", versioning
+        ) == ["registry.io/service:cache-main"]
+
+    def test_cache_chain_for_test_image(self):
+        versioning = VersioningProperties("abc", "feature/branch", 123, None)
+        assert cache_chain(
+            self.max_cache_registry, "service:pr-123-test", versioning
+        ) == [
+            "registry.io/service:cache-pr-123-test",
+            "registry.io/service:cache-main-test",
+            "registry.io/service:cache-pr-123",
+            "registry.io/service:cache-main",
+        ]
+
+    def test_cache_arguments_export_max_to_cache_ref(self):
+        versioning = VersioningProperties("abc", "feature/branch", 123, None)
+        cache_from, cache_to = cache_arguments(
+            self.max_cache_registry, "service:pr-123", versioning
+        )
+        assert cache_from == [
+            {"type": "registry", "ref": "registry.io/service:cache-pr-123"},
+            {"type": "registry", "ref": "registry.io/service:cache-main"},
+        ]
+        assert cache_to == {
+            "type": "registry",
+            "ref": "registry.io/service:cache-pr-123",
+            "mode": "max",
+        }
+        assert cache_arguments(self.max_cache_registry, "service:pr-123") == (
+            None,
+            None,
+        )
+
+    def test_cache_arguments_inline(self):
+        registry = dataclasses.replace(
+            self.max_cache_registry, cache_export_mode=DockerCacheExportMode.INLINE
+        )
+        assert cache_arguments(registry, "service:pr-123") == (
+            "type=registry,ref=registry.io/service:pr-123",
+            "type=inline",
+        )
+
+    def test_content_image_tag(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            repo = Repo.init(tmp_dir)
+            repo.config_writer().set_value("user", "name", "mpyl").release()
+            repo.config_writer().set_value("user", "email", "mpyl@test").release()
+            deployment = Path(tmp_dir, "service", "deployment")
+            deployment.mkdir(parents=True)
+            (deployment / "Dockerfile-mpl").write_text("FROM scratch\nARG TAG_NAME\n")
+            (Path(tmp_dir, "service") / "unchanged.txt").write_text("a")
+            repo.git.add(A=True)
+            repo.index.commit("first")
+
+            project = dataclasses.replace(
+                get_project(), path=str(deployment / "project.yml"), dependencies=None
+            )
+            step_input = Input(
+                dataclasses.replace(get_project_execution(), project=project),
+                RUN_PROPERTIES,
+            )
+            docker_config = dataclasses.replace(
+                DockerConfig.from_dict(get_config_values()),
+                root_folder=tmp_dir,
+                context=DockerContextConfig(minimal=True, shared_folders=[]),
+            )
+
+            def tag(**build_args: str):
+                return content_image_tag(step_input, docker_config, build_args)
+
+            first = tag(TAG_NAME="pr-1")
+            assert first and first.startswith(f"{project.name}:content-")
+            assert tag(TAG_NAME="pr-1", UNDECLARED="x") == first
+            assert tag(TAG_NAME="pr-2") != first
+
+            (Path(tmp_dir, "service") / "unchanged.txt").write_text("b")
+            assert tag(TAG_NAME="pr-1") is None, "uncommitted changes have no tree"
+
+            repo.git.add(A=True)
+            repo.index.commit("second")
+            assert tag(TAG_NAME="pr-1") not in {first, None}
+
+    local_registry = DockerRegistryConfig.from_dict(
+        {"hostName": "localhost:5000", "userName": "user", "password": "password"}
+    )
+
+    @patch("requests.head")
+    def test_manifest_exists(self, mock_head):
+        mock_head.return_value = Mock(status_code=200, headers={})
+        assert manifest_exists(
+            logging.getLogger(), self.local_registry, "service:content-abc"
+        )
+        assert (
+            mock_head.call_args.args[0]
+            == "http://localhost:5000/v2/service/manifests/content-abc"
+        )
+
+        mock_head.return_value = Mock(status_code=404, headers={})
+        assert not manifest_exists(
+            logging.getLogger(), self.local_registry, "service:content-abc"
+        )
+
+    @patch("requests.get")
+    @patch("requests.head")
+    def test_manifest_exists_with_bearer_token(self, mock_head, mock_get):
+        challenge = 'Bearer realm="https://auth.io/token",service="registry.io"'
+        mock_head.side_effect = [
+            Mock(status_code=401, headers={"WWW-Authenticate": challenge}),
+            Mock(status_code=200, headers={}),
+        ]
+        mock_get.return_value.json.return_value = {"token": "secret"}
+        assert manifest_exists(
+            logging.getLogger(), self.max_cache_registry, "service:content-abc"
+        )
+        assert mock_get.call_args.args[0] == "https://auth.io/token"
+        assert mock_get.call_args.kwargs["params"] == {"service": "registry.io"}
+        assert mock_head.call_args.kwargs["headers"]["Authorization"] == "Bearer secret"
+
+    @pytest.mark.skip(
+        reason="meant for local testing against `docker run -p 5000:5000 registry:2`"
+    )
+    def test_retag_in_local_registry(self):
+        logger = logging.getLogger()
+        registry = self.local_registry
+        docker.image.pull("busybox:latest")
+        docker.image.tag("busybox:latest", "localhost:5000/busybox:content-abc")
+        docker.image.push("localhost:5000/busybox:content-abc")
+
+        assert manifest_exists(logger, registry, "busybox:content-abc")
+        assert not manifest_exists(logger, registry, "busybox:pr-123")
+        retag_in_registry(logger, registry, "busybox:content-abc", "busybox:pr-123")
+        assert manifest_exists(logger, registry, "busybox:pr-123")
+
+    @patch.object(docker, "login")
+    def test_login_once_per_registry(self, mock_login):
+        clear_registry_sessions()
+        login(logging.getLogger(), self.local_registry)
+        login(logging.getLogger(), self.local_registry)
+        login(logging.getLogger(), self.max_cache_registry)
+        assert mock_login.call_count == 2
+
+        clear_registry_sessions()
+        login(logging.getLogger(), self.local_registry)
+        assert mock_login.call_count == 3
+
+    ecr_registry = DockerRegistryConfig.from_dict(
+        {
+            "hostName": "123.dkr.ecr.eu-west-1.amazonaws.com/org",
+            "userName": "key",
+            "password": "secret",
+            "provider": "aws",
+            "region": "eu-west-1",
+        }
+    )
+
+    @staticmethod
+    def ecr_token(expires_in: timedelta) -> dict:
+        return {
+            "authorizationData": [
+                {
+                    "authorizationToken": base64.b64encode(b"AWS:token").decode(),
+                    "expiresAt": datetime.now(timezone.utc) + expires_in,
+                }
+            ]
+        }
+
+    @patch.object(docker, "login")
+    @patch("boto3.client")
+    def test_ecr_login_refreshes_expired_token(self, mock_client, mock_login):
+        clear_registry_sessions()
+        ecr_client = mock_client.return_value
+        ecr_client.get_authorization_token.return_value = self.ecr_token(
+            timedelta(minutes=1)
+        )
+        login(logging.getLogger(), self.ecr_registry)
+        mock_login.assert_called_with(
+            server="123.dkr.ecr.eu-west-1.amazonaws.com/org",
+            username="AWS",
+            password="token",
+        )
+
+        ecr_client.get_authorization_token.return_value = self.ecr_token(
+            timedelta(hours=12)
+        )
+        login(logging.getLogger(), self.ecr_registry)
+        login(logging.getLogger(), self.ecr_registry)
+        assert ecr_client.get_authorization_token.call_count == 2
+        assert mock_login.call_count == 2
+        assert mock_client.call_count == 1
+
+    @patch("boto3.client")
+    def test_create_ecr_repo_once(self, mock_client):
+        clear_registry_sessions()
+        for _ in range(3):
+            create_ecr_repo_if_needed(logging.getLogger(), self.ecr_registry, "org/app")
+        assert mock_client.return_value.describe_repositories.call_count == 1
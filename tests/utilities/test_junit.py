@@ -0,0 +1,119 @@
+import shutil
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from unittest.mock import patch
+
+from src.mpyl.utilities.junit import (
+    SUMMARY_FILE_NAME,
+    SuiteSummary,
+    read_suite_timings,
+    record_suite_timings,
+    sum_suites,
+    suite_summaries,
+    summarize_report_file,
+    summarize_test_results,
+    to_shards,
+    to_test_suites,
+)
+from tests import root_test_path
+
+FAILING_REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuite name="without-counts" time="0.5">
+    <testcase classname="a" name="passes"/>
+    <testcase classname="a" name="fails"><failure message="boom"/></testcase>
+    <testcase classname="a" name="errors"><error message="boom"/></testcase>
+    <testcase classname="a" name="skipped"><skipped/></testcase>
+</testsuite>
+"""
+
+
+class TestJunit:
+    test_resource_path = root_test_path / "reporting" / "formatting" / "test_resources"
+
+    def test_streaming_summary_matches_junitparser(self):
+        suites = suite_summaries(self.test_resource_path)
+        parsed = to_test_suites(self.test_resource_path)
+
+        assert [s.name for s in suites] == [s.name for s in parsed]
+        assert sum_suites(suites) == sum_suites(parsed)
+
+    def test_count_test_cases_without_suite_attributes(self, tmp_path: Path):
+        report = tmp_path / "report.xml"
+        report.write_text(FAILING_REPORT)
+
+        suite = summarize_report_file(report)[0]
+        assert (suite.tests, suite.failures, suite.errors, suite.skipped) == (
+            4,
+            1,
+            1,
+            1,
+        )
+        assert suite.time == 0.5
+
+    def test_count_test_cases_of_nested_suites(self, tmp_path: Path):
+        report = tmp_path / "report.xml"
+        report.write_text(
+            '<testsuites><testsuite name="outer">'
+            '<testcase name="a"><failure/></testcase>'
+            '<testsuite name="inner"><testcase name="b"/><testcase name="c"/></testsuite>'
+            '<testcase name="d"/><system-out>output</system-out>'
+            "</testsuite></testsuites>"
+        )
+        parsed = []
+        parse = ET.iterparse
+
+        def iterparse(source, events):
+            for event, element in parse(source, events):
+                parsed.append(element)
+                yield event, element
+
+        with patch("xml.etree.ElementTree.iterparse", side_effect=iterparse):
+            suites = summarize_report_file(report)
+
+        assert [(s.name, s.tests, s.failures) for s in suites] == [
+            ("inner", 2, 0),
+            ("outer", 2, 1),
+        ]
+        assert all(len(element) == 0 for element in parsed if element.tag != "testcase")
+
+    def test_persisted_summaries_are_reused(self, tmp_path: Path):
+        shutil.copy(self.test_resource_path / "test.xml", tmp_path)
+        summary = summarize_test_results(tmp_path)
+        assert (tmp_path / SUMMARY_FILE_NAME).exists()
+
+        with patch(
+            "src.mpyl.utilities.junit.summarize_report_file"
+        ) as summarize_report:
+            assert sum_suites(suite_summaries(tmp_path)) == summary
+            summarize_report.assert_not_called()
+
+            (tmp_path / "report.xml").write_text(FAILING_REPORT)
+            summarize_report.return_value = []
+            suite_summaries(tmp_path)
+            summarize_report.assert_called_once_with(tmp_path / "report.xml")
+
+    def test_shards_are_balanced_on_duration(self):
+        timings = {"a": 10.0, "b": 6.0, "c": 5.0, "d": 4.0, "e": 1.0}
+
+        assert to_shards(timings, 2) == [["a", "d"], ["b", "c", "e"]]
+        assert to_shards(timings, 1) == [["a", "b", "c", "d", "e"]]
+        assert to_shards({}, 3) == [[], [], []]
+
+    def test_timings_of_earlier_runs_are_kept(self, tmp_path: Path):
+        timings_file = tmp_path / "test-timings.json"
+        assert not read_suite_timings(timings_file)
+
+        record_suite_timings(timings_file, [SuiteSummary("a", 1, 0, 0, 0, 2.0)])
+        record_suite_timings(timings_file, [SuiteSummary("b", 1, 0, 0, 0, 3.0)])
+        assert read_suite_timings(timings_file) == {"a": 2.0, "b": 3.0}
+
+    def test_timings_of_removed_suites_are_dropped_after_complete_run(
+        self, tmp_path: Path
+    ):
+        timings_file = tmp_path / "test-timings.json"
+        record_suite_timings(timings_file, [SuiteSummary("a", 1, 0, 0, 0, 2.0)])
+
+        record_suite_timings(
+            timings_file, [SuiteSummary("b", 1, 0, 0, 0, 3.0)], complete=True
+        )
+        assert read_suite_timings(timings_file) == {"b": 3.0}
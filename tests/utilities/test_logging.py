@@ -1,4 +1,12 @@
-from src.mpyl.utilities.logging import try_parse_ansi
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.mpyl.utilities.logging import LogCapture, try_parse_ansi
 
 
 class TestLogging:
@@ -6,3 +14,60 @@ class TestLogging:
         ansi = "\x1b[38;5;196mHello\x1b[0m"
         output = try_parse_ansi(ansi)
         assert output.plain == "Hello"
+
+    def test_log_capture_keeps_tail_and_spills_to_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = Path(tmp_dir) / "build.log"
+            with LogCapture(logging.getLogger(), log_file, tail_size=3) as capture:
+                for i in range(10):
+                    capture.append(f"line {i}\n")
+
+            assert capture.tail == ["line 7", "line 8", "line 9"]
+            assert log_file.read_text(encoding="utf-8").splitlines() == [
+                f"line {i}" for i in range(10)
+            ]
+            assert capture.tail_message(lines=2) == (
+                f"Last 2 of 10 lines, full log in {log_file}:\nline 8\nline 9"
+            )
+
+    def test_log_capture_batches_console_output(self):
+        logger = Mock()
+        with LogCapture(
+            logger, None, batch_size=4, flush_interval_seconds=3600
+        ) as capture:
+            for i in range(10):
+                capture.append(f"line {i}")
+            assert logger.log.call_count == 2
+
+        assert logger.log.call_count == 3
+        assert logger.log.call_args.args[1].plain == "line 8\nline 9"
+
+    def test_log_capture_flushes_quiet_output_after_interval(self):
+        logger = Mock()
+        with LogCapture(logger, None, flush_interval_seconds=0.1) as capture:
+            capture.append("line 0")
+            assert logger.log.call_count == 0
+
+            time.sleep(0.5)
+            assert logger.log.call_count == 1
+            assert logger.log.call_args.args[1].plain == "line 0"
+
+        assert logger.log.call_count == 1
+
+    def test_concurrent_tasks_with_the_same_name_log_to_their_own_file(self):
+        both_running = threading.Barrier(2)
+
+        def log_file(_) -> Path:
+            with LogCapture.for_task(
+                logging.getLogger(), "helm repo update"
+            ) as capture:
+                both_running.wait()
+                capture.append("updated")
+                assert capture.log_file
+                return capture.log_file
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            log_files = set(executor.map(log_file, range(2)))
+
+        assert len(log_files) == 2
+        assert all(f.name.startswith("helm-repo-update-") for f in log_files)
@@ -0,0 +1,79 @@
+import logging
+import threading
+
+from src.mpyl.utilities.docker.push_queue import (
+    PushQueue,
+    close_push_queue,
+    failed_pushes,
+    push_queue,
+    wait_for_pushes,
+)
+
+
+def failing_push():
+    raise ValueError("registry unavailable")
+
+
+class TestPushQueue:
+    logger = logging.getLogger()
+
+    def test_wait_for_own_project_only(self):
+        queue = PushQueue(max_concurrent=2)
+        release = threading.Event()
+
+        def blocked_push():
+            release.wait()
+
+        queue.submit(self.logger, "other", "other:pr-1", blocked_push)
+        queue.submit(self.logger, "service", "service:pr-1", failing_push)
+
+        assert (
+            queue.wait_for("service")
+            == "Failed to push service:pr-1: registry unavailable"
+        )
+        assert queue.wait_for("unknown") is None
+        release.set()
+        assert queue.wait_for("other") is None
+        queue.shutdown()
+
+    def test_wait_for_required_pushes_only(self):
+        queue = PushQueue(max_concurrent=2)
+        release = threading.Event()
+
+        def blocked_push():
+            release.wait()
+            raise ValueError("registry unavailable")
+
+        queue.submit(
+            self.logger, "service", "service:pr-1-test", blocked_push, required=False
+        )
+        queue.submit(self.logger, "service", "service:pr-1", lambda: None)
+
+        assert queue.wait_for("service") is None
+        release.set()
+        assert queue.failures(wait=True) == {
+            "service": "Failed to push service:pr-1-test: registry unavailable"
+        }
+        queue.shutdown()
+
+    def test_failures_are_reported_once(self):
+        queue = PushQueue(max_concurrent=1)
+        queue.submit(self.logger, "service", "service:pr-1", failing_push)
+        queue.submit(self.logger, "service", "service:pr-1-test", lambda: None)
+
+        assert queue.failures(wait=True) == {
+            "service": "Failed to push service:pr-1: registry unavailable"
+        }
+        assert not queue.failures(wait=True)
+        queue.shutdown()
+
+    def test_run_scoped_queue(self):
+        push_queue(max_concurrent=1).submit(
+            self.logger, "service", "service:pr-1", failing_push
+        )
+        assert wait_for_pushes("service") is not None
+        assert failed_pushes() == {
+            "service": "Failed to push service:pr-1: registry unavailable"
+        }
+        assert not close_push_queue()
+        assert wait_for_pushes("service") is None
@@ -0,0 +1,190 @@
+import dataclasses
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.mpyl.run_plan import RunPlan
+from src.mpyl.utilities.sbt import (
+    SbtBatchResult,
+    SbtBatchResults,
+    SbtConfig,
+    SbtServer,
+    failed_sbt_projects,
+    run_sbt,
+    run_sbt_batch,
+    to_batch_command,
+)
+from src.mpyl.utilities.subprocess import CommandResult, run_command
+from tests import root_test_path
+from tests.test_resources import test_data
+
+
+class TestSbt:
+    config = SbtConfig.from_config(config=test_data.get_config_values())
+
+    def test_batch_command(self):
+        assert to_batch_command(
+            ["a", "b"], "docker", ['a / docker / imageNames := Seq(ImageName("a:1"))']
+        ) == [
+            'set a / docker / imageNames := Seq(ImageName("a:1"))',
+            "all a/docker b/docker",
+        ]
+
+    def test_failed_projects_from_error_summary(self):
+        log = [
+            "[info] Tests: succeeded 12, failed 0",
+            "[error] (b / Test / test) sbt.TestsFailedException: Tests unsuccessful",
+            "[error] (c-service / Compile / compileIncremental) Compilation failed",
+            "[error] Total time: 42 s",
+        ]
+        assert failed_sbt_projects(log) == {"b", "c-service"}
+
+    def test_attribute_batch_result(self):
+        result = SbtBatchResult(
+            success=False,
+            failed_projects=frozenset({"b"}),
+            unattributed_failure=False,
+            log_tail="",
+        )
+        assert result.succeeded_for("a")
+        assert not result.succeeded_for("b")
+        assert not dataclasses.replace(result, unattributed_failure=True).succeeded_for(
+            "a"
+        )
+
+    def test_batch_results_are_scoped_to_the_run(self):
+        batch_results = SbtBatchResults()
+        run_plan = RunPlan.empty()
+        batch_results.for_run(run_plan)["a"] = SbtBatchResult(
+            success=False,
+            failed_projects=frozenset({"a"}),
+            unattributed_failure=False,
+            log_tail="",
+        )
+
+        assert "a" in batch_results.for_run(run_plan)
+        assert not batch_results.for_run(RunPlan.empty())
+
+    def test_run_sbt_batch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fake_sbt = Path(tmp_dir) / "sbt"
+            fake_sbt.write_text(
+                "#!/bin/sh\n"
+                'echo "[error] (b / Test / test) sbt.TestsFailedException"\n'
+                "exit 1\n",
+                encoding="utf-8",
+            )
+            os.chmod(fake_sbt, 0o755)
+            config = dataclasses.replace(self.config, sbt_command=str(fake_sbt))
+
+            result = run_sbt_batch(
+                logger=logging.getLogger(),
+                config=config,
+                client_mode=False,
+                project_names=["a", "b"],
+                sbt_commands=to_batch_command(["a", "b"], "test"),
+                task_name=f"sbt test {Path(tmp_dir).name}",
+            )
+
+        assert not result.success
+        assert result.failed_projects == {"b"}
+        assert result.succeeded_for("a")
+        assert not result.succeeded_for("b")
+
+    def test_server_is_alive(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            server = SbtServer(self.config, Path(tmp_dir))
+            assert not server.is_alive()
+
+            socket_path = Path(tmp_dir) / "sbt.sock"
+            server.active_file.parent.mkdir(parents=True)
+            server.active_file.write_text(
+                json.dumps({"uri": f"local://{socket_path}"}), encoding="utf-8"
+            )
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+                listener.bind(str(socket_path))
+                listener.listen()
+                assert server.is_alive()
+            assert not server.is_alive()
+
+    @staticmethod
+    def command_result(success: bool) -> CommandResult:
+        return CommandResult([], 0 if success else 1, 1.0, False, [])
+
+    @patch("src.mpyl.utilities.sbt.run_command")
+    @patch("src.mpyl.utilities.sbt.sbt_server")
+    def test_restart_crashed_server(self, mock_sbt_server, mock_run_command):
+        server = Mock()
+        server.ensure_running.return_value = True
+        server.is_alive.return_value = False
+        mock_sbt_server.return_value = server
+        mock_run_command.side_effect = [
+            self.command_result(False),
+            self.command_result(True),
+        ]
+
+        command = self.config.to_command(True, ["project a", "test"])
+        assert run_sbt(logging.getLogger(), self.config, True, command).success
+        assert server.ensure_running.call_count == 2
+
+    @patch("src.mpyl.utilities.sbt.run_command")
+    @patch("src.mpyl.utilities.sbt.sbt_server")
+    def test_do_not_retry_failure_on_live_server(
+        self, mock_sbt_server, mock_run_command
+    ):
+        mock_sbt_server.return_value.is_alive.return_value = True
+        mock_run_command.return_value = self.command_result(False)
+
+        command = self.config.to_command(True, ["project a", "test"])
+        assert not run_sbt(logging.getLogger(), self.config, True, command).success
+        assert mock_run_command.call_count == 1
+
+    @pytest.mark.skip(reason="benchmark, requires sbt and takes several minutes")
+    def test_benchmark_cold_sbt_against_warm_server(self):
+        number_of_projects = 10
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            fixture = root_test_path / "projects" / "sbt-service" / "src"
+            names = [f"service{i}" for i in range(number_of_projects)]
+            for name in names:
+                shutil.copytree(fixture, root / name / "src")
+            (root / "project").mkdir()
+            (root / "project" / "build.properties").write_text("sbt.version=1.8.2")
+            (root / "build.sbt").write_text(
+                'ThisBuild / scalaVersion := "2.13.10"\n'
+                + "\n".join(
+                    f"lazy val {name} = project.settings("
+                    f'libraryDependencies += "com.lihaoyi" %% "cask" % "0.8.3", '
+                    f'libraryDependencies += "org.scalatest" %% "scalatest" % "3.2.15" % "test")'
+                    for name in names
+                )
+            )
+            config = dataclasses.replace(self.config, verbose=False)
+            logger = logging.getLogger()
+
+            def timed(client_mode: bool) -> float:
+                start = time.monotonic()
+                for name in names:
+                    command = config.to_command(
+                        client_mode, [f"project {name}", "test"]
+                    )
+                    assert run_command(logger, command, cwd=root).success
+                return time.monotonic() - start
+
+            cold = timed(client_mode=False)
+            server = SbtServer(config, root)
+            assert server.ensure_running(logger)
+            warm = timed(client_mode=True)
+            server.shutdown(logger)
+
+            assert (
+                warm < cold
+            ), f"{number_of_projects} projects: cold {cold:.0f}s, warm {warm:.0f}s"
@@ -0,0 +1,96 @@
+import dataclasses
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from src.mpyl.steps.models import VersioningProperties
+from src.mpyl.utilities.junit import TIMINGS_FILE_NAME
+from src.mpyl.utilities.sbt.impact import (
+    IMPACT_FILE_NAME,
+    TestImpactConfig,
+    TestImpactMap,
+    read_scoverage_impact,
+    select_suites,
+)
+from tests.test_resources.test_data import get_project
+
+SOURCE = "projects/service/src/main/scala/nl/service/Invoices.scala"
+COVERAGE_FILE = f"""# Coverage data, format version: 3.0
+# Statement data:
+
+1
+{SOURCE}
+nl.service
+Invoices
+\f
+2
+projects/service/src/main/scala/nl/service/Other.scala
+nl.service
+Other
+\f
+"""
+
+
+class TestSbtImpact:
+    config = TestImpactConfig(enabled=True, full_run_interval=timedelta(hours=24))
+    pull_request = VersioningProperties("revision", "feature/branch", 123, None)
+
+    @staticmethod
+    def _project(path: Path):
+        return dataclasses.replace(
+            get_project(), path=str(path / "deployment" / "project.yml")
+        )
+
+    def _write_map(self, path: Path, recorded_at: datetime) -> None:
+        TestImpactMap(recorded_at, {SOURCE: {"nl.service.InvoicesSpec"}}).write(
+            self._project(path).target_path / IMPACT_FILE_NAME
+        )
+
+    def _select(self, path: Path, changed_files: set[str], versioning=None):
+        return select_suites(
+            self.config,
+            self._project(path),
+            frozenset(changed_files),
+            versioning or self.pull_request,
+            "main",
+        )
+
+    def test_select_impacted_and_changed_suites(self, tmp_path: Path):
+        self._write_map(tmp_path, datetime.now(timezone.utc))
+        changed_test = "projects/service/src/test/scala/nl/service/OtherSpec.scala"
+        (self._project(tmp_path).target_path / TIMINGS_FILE_NAME).write_text(
+            json.dumps({"nl.service.OtherSpec": 1.0})
+        )
+
+        assert self._select(tmp_path, {SOURCE, changed_test}) == [
+            "nl.service.InvoicesSpec",
+            "nl.service.OtherSpec",
+        ]
+        assert self._select(tmp_path, {SOURCE, "projects/service/build.sbt"}) is None
+
+    def test_full_run_when_test_source_is_not_a_known_suite(self, tmp_path: Path):
+        self._write_map(tmp_path, datetime.now(timezone.utc))
+        fixture = "projects/service/src/test/scala/nl/service/TestSupport.scala"
+        changed_suite = "projects/service/src/test/scala/nl/service/InvoicesSpec.scala"
+
+        assert self._select(tmp_path, {fixture}) is None
+        assert self._select(tmp_path, {changed_suite}) == ["nl.service.InvoicesSpec"]
+
+    def test_full_run_outside_pull_requests_and_on_schedule(self, tmp_path: Path):
+        self._write_map(tmp_path, datetime.now(timezone.utc))
+        release = VersioningProperties("revision", "main", None, "1")
+        assert self._select(tmp_path, {SOURCE}, release) is None
+
+        self._write_map(tmp_path, datetime.now(timezone.utc) - timedelta(hours=25))
+        assert self._select(tmp_path, {SOURCE}) is None
+
+    def test_read_suites_per_file_from_scoverage_data(self, tmp_path: Path):
+        (tmp_path / "scoverage.coverage").write_text(COVERAGE_FILE)
+        (tmp_path / "scoverage.measurements.1").write_text(
+            "1 nl.service.InvoicesSpec\n2\n"
+        )
+        (tmp_path / "scoverage.measurements.2").write_text("1 nl.service.ApiSpec\n")
+
+        assert read_scoverage_impact(tmp_path) == {
+            SOURCE: {"nl.service.InvoicesSpec", "nl.service.ApiSpec"}
+        }
@@ -1,6 +1,17 @@
+import asyncio
 import logging
+import tempfile
+import time
+from pathlib import Path
 
-from src.mpyl.utilities.subprocess import custom_check_output
+from src.mpyl.utilities.logging import LogCapture
+from src.mpyl.utilities.parallel import ParallelCommand, run_in_parallel
+from src.mpyl.utilities.subprocess import (
+    CommandResult,
+    custom_check_output,
+    run_command,
+    run_commands_async,
+)
 
 
 class TestSubProcess:
@@ -11,3 +22,75 @@ class TestSubProcess:
     def test_should_handle_invalid_command(self):
         output = custom_check_output(logging.getLogger(), "invalidcommand")
         assert not output.success
+
+    def test_should_report_tail_of_failed_command(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = Path(tmp_dir) / "ls.log"
+            output = custom_check_output(
+                logging.getLogger(), "ls /does-not-exist", log_file=log_file
+            )
+            assert not output.success
+            assert f"full log in {log_file}" in output.message
+            assert "does-not-exist" in log_file.read_text(encoding="utf-8")
+
+    def test_should_capture_stdout(self):
+        output = custom_check_output(
+            logging.getLogger(), "echo captured", capture_stdout=True
+        )
+        assert output.success
+        assert output.message == "captured\n"
+
+    def test_should_drain_stdout_and_stderr(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            capture = LogCapture(logging.getLogger(), Path(tmp_dir) / "sh.log")
+            result = run_command(
+                logging.getLogger(),
+                ["sh", "-c", "echo out; echo err >&2; exit 3"],
+                log_capture=capture,
+            )
+        assert result.exit_code == 3
+        assert not result.success
+        assert sorted(result.output) == ["err", "out"]
+
+    def test_should_kill_process_group_on_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            capture = LogCapture(logging.getLogger(), Path(tmp_dir) / "sleep.log")
+            result = run_command(
+                logging.getLogger(),
+                ["sh", "-c", "sleep 30 & sleep 30"],
+                timeout_seconds=0.5,
+                log_capture=capture,
+            )
+        assert result.timed_out
+        assert result.duration_seconds < 10
+        assert not result.success
+
+    def test_should_run_commands_concurrently(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results: list[CommandResult] = run_in_parallel(
+                [
+                    ParallelCommand(
+                        function=run_command,
+                        parameters={
+                            "logger": logging.getLogger(),
+                            "command": ["sh", "-c", f"sleep 0.5; echo {i}"],
+                            "log_capture": LogCapture(
+                                logging.getLogger(), Path(tmp_dir) / f"{i}.log"
+                            ),
+                        },
+                    )
+                    for i in range(4)
+                ],
+                number_of_threads=4,
+            )
+        assert [r.output for r in results] == [["0"], ["1"], ["2"], ["3"]]
+        assert all(r.success for r in results)
+
+    def test_should_limit_concurrent_commands(self):
+        commands = [["sh", "-c", "sleep 0.3"]] * 4
+        start = time.monotonic()
+        results = asyncio.run(
+            run_commands_async(logging.getLogger(), commands, max_concurrent=2)
+        )
+        assert all(r.success for r in results)
+        assert time.monotonic() - start >= 0.6